@@ -1,4 +1,3 @@
-from dataclasses import dataclass
 from typing import List, Optional, Dict, Callable
 from datetime import datetime
 import os
@@ -7,7 +6,11 @@ from queue import Queue
 from PyQt6.QtWidgets import (QDialog, QProgressBar, QLabel, QVBoxLayout,
                             QMessageBox, QPushButton, QTextEdit, QWidget)
 from PyQt6.QtCore import Qt, pyqtSignal, QObject
-from PyPDF2 import PdfReader, PdfWriter, PdfMerger
+
+from batch.jobs import BatchOperation, run_operation, run_combine, run_split, run_watermark
+from batch.journal import JobJournal
+from batch.parallel import ParallelExecutor
+from batch.validation import PDFValidator
 
 class ProcessSignals(QObject):
     """Signal class for process communication"""
@@ -16,18 +19,6 @@ class ProcessSignals(QObject):
     completed = pyqtSignal()
     file_progress = pyqtSignal(str, int)  # filename, percentage
 
-@dataclass
-class BatchOperation:
-    operation_type: str
-    files: List[str]
-    output_dir: str
-    settings: dict
-    status: str = 'pending'
-    start_time: Optional[datetime] = None
-    end_time: Optional[datetime] = None
-    retry_count: int = 0
-    max_retries: int = 3
-
 class EnhancedProgressDialog(QDialog):
     """Enhanced progress dialog with detailed information"""
     def __init__(self, parent=None):
@@ -74,51 +65,29 @@ class EnhancedProgressDialog(QDialog):
         timestamp = datetime.now().strftime("%H:%M:%S")
         self.log_viewer.append(f"[{timestamp}] {message}")
 
-class PDFValidator:
-    """PDF validation utilities"""
-    @staticmethod
-    def validate_pdf(file_path: str) -> tuple[bool, str]:
-        try:
-            with open(file_path, 'rb') as file:
-                # Check if file starts with PDF signature
-                if not file.read(4) == b'%PDF':
-                    return False, "Not a valid PDF file"
-
-            reader = PdfReader(file_path)
-
-            # Check for encryption
-            if reader.is_encrypted:
-                return False, "PDF is encrypted"
-
-            # Try to access pages to check for corruption
-            try:
-                num_pages = len(reader.pages)
-                _ = reader.pages[0]  # Try to access first page
-            except Exception:
-                return False, "PDF appears to be corrupted"
-
-            return True, "PDF is valid"
-        except Exception as e:
-            return False, f"Validation error: {str(e)}"
-
 class BatchProcessor:
     """Enhanced batch processor with advanced features"""
-    def __init__(self):
+    def __init__(self, parallel: bool = False, max_workers: Optional[int] = None,
+                 journal_path: Optional[str] = None, cache_dir: Optional[str] = None):
         self.queue: List[BatchOperation] = []
         self.current_operation: Optional[BatchOperation] = None
         self.progress_dialog: Optional[EnhancedProgressDialog] = None
         self.signals = ProcessSignals()
         self.operation_thread: Optional[threading.Thread] = None
         self.validator = PDFValidator()
+        # Run independent operations in a process pool instead of one at a time
+        self.parallel = parallel
+        self.max_workers = max_workers
+        # Persist operations and completed work so an interrupted batch can resume
+        self.journal: Optional[JobJournal] = JobJournal(journal_path) if journal_path else None
+        # Reuse outputs of identical earlier runs from this result cache
+        self.cache_dir = cache_dir
 
     def add_operation(self, operation: BatchOperation):
         """Add operation to queue with validation"""
         # Validate all PDF files before adding to queue
-        invalid_files = []
-        for file in operation.files:
-            valid, message = self.validator.validate_pdf(file)
-            if not valid:
-                invalid_files.append((file, message))
+        results = self.validator.validate_many(operation.files)
+        invalid_files = [(file, message) for file, (valid, message) in results.items() if not valid]
 
         if invalid_files:
             error_msg = "\n".join(f"{file}: {msg}" for file, msg in invalid_files)
@@ -130,9 +99,28 @@ class BatchProcessor:
             msg.exec()
             return False
 
+        operation.cache_dir = operation.cache_dir or self.cache_dir
+        if self.journal:
+            self.journal.add(operation)
         self.queue.append(operation)
         return True
 
+    def resume(self) -> int:
+        """
+        Queue the unfinished operations recorded in the journal.
+
+        Completed units of work (outputs, per-file results, split chunks)
+        are skipped when the operations run again.
+
+        Returns:
+            Number of operations queued
+        """
+        if not self.journal:
+            return 0
+        operations = self.journal.unfinished()
+        self.queue.extend(operations)
+        return len(operations)
+
     def start_processing(self, parent: QWidget):
         """Start batch processing in a separate thread"""
         self.progress_dialog = EnhancedProgressDialog(parent)
@@ -145,7 +133,8 @@ class BatchProcessor:
         self.signals.file_progress.connect(self.update_file_progress)
 
         # Start processing thread
-        self.operation_thread = threading.Thread(target=self.process_queue)
+        target = self.process_queue_parallel if self.parallel else self.process_queue
+        self.operation_thread = threading.Thread(target=target)
         self.operation_thread.start()
 
         self.progress_dialog.exec()
@@ -160,6 +149,8 @@ class BatchProcessor:
                     
                     if not success and self.current_operation.retry_count < self.current_operation.max_retries:
                         self.current_operation.retry_count += 1
+                        if self.journal:
+                            self.journal.set_status(self.current_operation, 'pending')
                         self.queue.insert(0, self.current_operation)
                         self.signals.progress.emit(0, f"Retrying operation (attempt {self.current_operation.retry_count + 1})")
                         continue
@@ -177,140 +168,61 @@ class BatchProcessor:
             # Clean up any resources
             self.current_operation = None
 
+    def process_queue_parallel(self):
+        """Process queued operations concurrently in worker processes"""
+        finished = 0
+
+        def on_finished(operation: BatchOperation, success: bool):
+            nonlocal finished
+            finished += 1
+            message = "Processing complete" if success else f"Operation {operation.status}"
+            self.signals.progress.emit(finished, message)
+
+        def on_retry(operation: BatchOperation):
+            if self.journal:
+                self.journal.set_status(operation, 'pending')
+            self.signals.progress.emit(
+                finished, f"Retrying operation (attempt {operation.retry_count + 1})")
+
+        operations, self.queue = self.queue, []
+        try:
+            executor = ParallelExecutor(self.max_workers)
+            # Operations never started because of cancellation stay queued
+            self.queue = executor.run(
+                operations,
+                file_progress=self.signals.file_progress.emit,
+                is_cancelled=self.is_cancelled,
+                on_finished=on_finished,
+                on_retry=on_retry,
+                on_error=self.signals.error.emit
+            )
+        except Exception as e:
+            self.signals.error.emit(f"Parallel processing failed: {str(e)}")
+        finally:
+            self.signals.completed.emit()
+
     def process_operation(self) -> bool:
         """Process single operation with progress updates"""
         try:
-            method = getattr(self, f"process_{self.current_operation.operation_type}")
-            return method()
+            return run_operation(self.current_operation, self.signals.file_progress.emit, self.is_cancelled)
         except Exception as e:
             self.signals.error.emit(str(e))
             return False
 
     def process_combine(self) -> bool:
         """Combine multiple PDFs into a single file"""
-        try:
-            merger = PdfMerger()
-            total_files = len(self.current_operation.files)
-
-            for idx, pdf in enumerate(self.current_operation.files):
-                if self.progress_dialog.cancelled:
-                    return False
-
-                self.signals.file_progress.emit(
-                    os.path.basename(pdf),
-                    int((idx / total_files) * 100)
-                )
-
-                if not os.path.exists(pdf):
-                    raise FileNotFoundError(f"PDF file not found: {pdf}")
-                merger.append(pdf)
-
-            os.makedirs(self.current_operation.output_dir, exist_ok=True)
-            output_path = os.path.join(
-                self.current_operation.output_dir,
-                f"combined_{datetime.now().strftime('%Y%m%d_%H%M%S')}.pdf"
-            )
-
-            merger.write(output_path)
-            merger.close()
-
-            self.current_operation.status = 'completed'
-            return True
-
-        except Exception as e:
-            self.current_operation.status = f'failed: {str(e)}'
-            raise
+        return run_combine(self.current_operation, self.signals.file_progress.emit, self.is_cancelled)
 
     def process_split(self) -> bool:
         """Split PDFs into individual pages"""
-        try:
-            os.makedirs(self.current_operation.output_dir, exist_ok=True)
-            total_files = len(self.current_operation.files)
-
-            for file_idx, pdf in enumerate(self.current_operation.files):
-                if self.progress_dialog.cancelled:
-                    return False
-
-                if not os.path.exists(pdf):
-                    raise FileNotFoundError(f"PDF file not found: {pdf}")
-
-                reader = PdfReader(pdf)
-                total_pages = len(reader.pages)
-
-                for page_idx, page in enumerate(reader.pages):
-                    if self.progress_dialog.cancelled:
-                        return False
-
-                    self.signals.file_progress.emit(
-                        f"{os.path.basename(pdf)} (Page {page_idx + 1}/{total_pages})",
-                        int(((file_idx * total_pages + page_idx) / (total_files * total_pages)) * 100)
-                    )
-
-                    writer = PdfWriter()
-                    writer.add_page(page)
-                    output_path = os.path.join(
-                        self.current_operation.output_dir,
-                        f"{os.path.splitext(os.path.basename(pdf))[0]}_page{page_idx+1}.pdf"
-                    )
-                    with open(output_path, 'wb') as f:
-                        writer.write(f)
-
-            self.current_operation.status = 'completed'
-            return True
-
-        except Exception as e:
-            self.current_operation.status = f'failed: {str(e)}'
-            raise
+        return run_split(self.current_operation, self.signals.file_progress.emit, self.is_cancelled)
 
     def process_watermark(self) -> bool:
         """Add watermark to PDFs"""
-        try:
-            if not self.current_operation.settings.get('watermark_file'):
-                raise ValueError("Watermark file not specified")
-
-            watermark_file = self.current_operation.settings['watermark_file']
-            if not os.path.exists(watermark_file):
-                raise FileNotFoundError(f"Watermark file not found: {watermark_file}")
-
-            watermark_reader = PdfReader(watermark_file)
-            watermark_page = watermark_reader.pages[0]
-
-            os.makedirs(self.current_operation.output_dir, exist_ok=True)
-            total_files = len(self.current_operation.files)
-
-            for idx, pdf in enumerate(self.current_operation.files):
-                if self.progress_dialog.cancelled:
-                    return False
-
-                self.signals.file_progress.emit(
-                    os.path.basename(pdf),
-                    int((idx / total_files) * 100)
-                )
-
-                if not os.path.exists(pdf):
-                    raise FileNotFoundError(f"PDF file not found: {pdf}")
+        return run_watermark(self.current_operation, self.signals.file_progress.emit, self.is_cancelled)
 
-                reader = PdfReader(pdf)
-                writer = PdfWriter()
-
-                for page in reader.pages:
-                    page.merge_page(watermark_page)
-                    writer.add_page(page)
-
-                output_path = os.path.join(
-                    self.current_operation.output_dir,
-                    f"watermarked_{os.path.basename(pdf)}"
-                )
-
-                with open(output_path, 'wb') as f:
-                    writer.write(f)
-
-            self.current_operation.status = 'completed'
-            return True
-
-        except Exception as e:
-            self.current_operation.status = f'failed: {str(e)}'
-            raise
+    def is_cancelled(self) -> bool:
+        return self.progress_dialog.cancelled
 
     def update_progress(self, value: int, message: str):
         """Update progress dialog"""
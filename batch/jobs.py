@@ -0,0 +1,581 @@
+"""Qt-free batch job runners shared by the sequential and parallel paths"""
+from dataclasses import dataclass, field
+from typing import List, Optional, Callable, Set, Tuple
+from datetime import datetime
+import os
+from PyPDF2 import PdfReader
+
+from batch.result_cache import ResultCache, cache_for
+from batch.split import split_pdf
+from operations.append import append_pdfs, compact_pdf, count_updates
+from operations.merge import default_merge_backend, resolve_page_ranges, tree_merge
+from utils.reporter import StatusReporter
+from utils.utils import parse_page_range, atomic_output, OutputCancelled
+
+# Callback signatures used by every runner
+ProgressCallback = Callable[[str, int], None]  # filename, percentage
+CancelCheck = Callable[[], bool]
+
+# Operation types that rewrite their input files instead of writing to output_dir
+IN_PLACE_OPERATIONS = {'compress', 'metadata', 'encrypt', 'redact'}
+
+@dataclass
+class BatchOperation:
+    operation_type: str
+    files: List[str]
+    output_dir: str
+    settings: dict
+    status: str = 'pending'
+    start_time: Optional[datetime] = None
+    end_time: Optional[datetime] = None
+    retry_count: int = 0
+    max_retries: int = 3
+    outputs: List[str] = field(default_factory=list)
+    report: dict = field(default_factory=dict)  # Runner figures, e.g. streaming merge throughput
+    job_id: Optional[str] = None
+    journal_path: Optional[str] = None  # Set by JobJournal.add so workers can checkpoint
+    journal_id: Optional[int] = None
+    cache_dir: Optional[str] = None  # Reuse results from this ResultCache directory
+
+def operation_resources(operation: BatchOperation) -> Tuple[Set[str], Set[str]]:
+    """
+    Get the paths an operation reads and writes.
+
+    Two operations conflict when one writes something the other reads or
+    writes; the parallel executor never runs conflicting operations at the
+    same time.
+
+    Returns:
+        Tuple of (reads, writes) as sets of normalized paths
+    """
+    def norm(path: str) -> str:
+        return os.path.normcase(os.path.realpath(path))
+
+    reads = {norm(f) for f in operation.files}
+    for key in ('watermark_file', 'image'):
+        if operation.settings.get(key):
+            reads.add(norm(operation.settings[key]))
+
+    in_place = (operation.operation_type in IN_PLACE_OPERATIONS or operation.settings.get('in_place')
+                or (operation.operation_type == 'watermark' and not operation.settings.get('watermark_file')))
+    if in_place:
+        return reads, {norm(f) for f in operation.files}
+
+    output_dir = norm(operation.output_dir)
+    if operation.operation_type == 'combine' and operation.settings.get('append_to'):
+        target = norm(os.path.join(operation.output_dir, operation.settings['append_to']))
+        return reads | {target}, {target}
+    if operation.operation_type == 'combine':
+        # Combined outputs are timestamped, so serialize combines sharing a directory
+        writes = {os.path.join(output_dir, 'combined_*')}
+    elif operation.operation_type == 'split':
+        writes = {os.path.join(output_dir, os.path.splitext(os.path.basename(f))[0] + '_*')
+                  for f in operation.files}
+    elif operation.operation_type == 'watermark':
+        writes = {os.path.join(output_dir, f"watermarked_{os.path.basename(f)}")
+                  for f in operation.files}
+    else:
+        writes = {output_dir}
+    return reads, writes
+
+def _checkpoint(operation: BatchOperation):
+    # Imported here because the journal module depends on BatchOperation
+    from batch.journal import checkpoint_for
+    return checkpoint_for(operation)
+
+def run_combine(operation: BatchOperation, progress: ProgressCallback,
+                is_cancelled: CancelCheck) -> bool:
+    """Combine multiple PDFs into a single file"""
+    try:
+        checkpoint = _checkpoint(operation)
+        if checkpoint.is_done('output'):
+            operation.outputs.extend(checkpoint.outputs('output'))
+            operation.status = 'completed'
+            return True
+
+        for pdf in operation.files:
+            if not os.path.exists(pdf):
+                raise FileNotFoundError(f"PDF file not found: {pdf}")
+
+        os.makedirs(operation.output_dir, exist_ok=True)
+        settings = operation.settings
+        if settings.get('append_to'):
+            output_path = os.path.join(operation.output_dir, settings['append_to'])
+            if os.path.exists(output_path):
+                return _append_combined(operation, output_path, checkpoint, progress, is_cancelled)
+        else:
+            output_path = os.path.join(
+                operation.output_dir,
+                f"combined_{datetime.now().strftime('%Y%m%d_%H%M%S')}.pdf"
+            )
+
+        cache = cache_for(operation.cache_dir)
+        key = cache.make_key('combine', operation.files, operation.settings) if cache else None
+        cached = cache.get(key) if cache else None
+        if cached:
+            ResultCache.materialize(cached[0][0], output_path)
+        else:
+            backend = settings.get('merge_backend')
+            if backend is None and (settings.get('streaming') or settings.get('dedup')):
+                backend = 'streaming'
+            options = {'max_open_inputs': int(settings.get('max_open_inputs', 4)),
+                       'dedup': bool(settings.get('dedup'))}
+            with atomic_output(output_path) as temp_path:
+                report = tree_merge(
+                    operation.files, temp_path, backend,
+                    workers=int(settings.get('merge_workers', 1)),
+                    fan_in=int(settings.get('merge_fan_in', 64)),
+                    progress=lambda done, total: progress(
+                        os.path.basename(operation.files[done - 1]), int(done / total * 100)),
+                    is_cancelled=is_cancelled,
+                    pages=resolve_page_ranges(operation.files, settings.get('page_ranges')),
+                    **options
+                )
+                if report is None:
+                    raise OutputCancelled()
+            operation.report = dict(report.to_dict(), backend=backend or default_merge_backend())
+            if cache:
+                cache.put(key, 'combine', [output_path])
+
+        checkpoint.mark('output', output_path)
+        operation.outputs.append(output_path)
+
+        operation.status = 'completed'
+        return True
+
+    except OutputCancelled:
+        operation.status = 'cancelled'
+        return False
+    except Exception as e:
+        operation.status = f'failed: {str(e)}'
+        raise
+
+def _append_combined(operation: BatchOperation, output_path: str, checkpoint,
+                     progress: ProgressCallback, is_cancelled: CancelCheck) -> bool:
+    """Add the inputs to an existing combined PDF as an incremental update"""
+    settings = operation.settings
+    compact_after = int(settings['compact_after']) if settings.get('compact_after') else None
+    report = None
+    # Once the update is journaled as written, compaction may already have
+    # replaced the file, so only the compaction is left to check on resume
+    if not checkpoint.is_done('appended'):
+        # A run interrupted while appending would append twice on resume,
+        # so the original length is recorded and restored first
+        base_units = checkpoint.units('append_base:')
+        if base_units:
+            base_size = int(base_units[0].partition(':')[2])
+            if os.path.getsize(output_path) > base_size:
+                with open(output_path, 'r+b') as f:
+                    f.truncate(base_size)
+        else:
+            checkpoint.mark(f"append_base:{os.path.getsize(output_path)}")
+
+        # Compaction is run below, after the update is journaled
+        report = append_pdfs(
+            output_path, operation.files,
+            progress=lambda done, total: progress(
+                os.path.basename(operation.files[done - 1]), int(done / total * 100)),
+            is_cancelled=is_cancelled,
+            dedup=bool(settings.get('dedup')),
+            pages=resolve_page_ranges(operation.files, settings.get('page_ranges'))
+        )
+        if report is None:
+            raise OutputCancelled()
+        checkpoint.mark('appended')
+
+    compacted = bool(compact_after and count_updates(output_path) >= compact_after)
+    if compacted:
+        compact_pdf(output_path, settings.get('merge_backend'))
+    if report:
+        if compacted:
+            report.incremental_updates = 0
+            report.compacted = True
+        operation.report = dict(report.to_dict(), backend='append')
+    else:
+        operation.report = {'backend': 'append', 'compacted': compacted}
+
+    checkpoint.mark('output', output_path)
+    operation.outputs.append(output_path)
+    operation.status = 'completed'
+    return True
+
+def run_split(operation: BatchOperation, progress: ProgressCallback,
+              is_cancelled: CancelCheck) -> bool:
+    """Split PDFs according to the split settings (one file per page by default)"""
+    try:
+        os.makedirs(operation.output_dir, exist_ok=True)
+        total_files = len(operation.files)
+        max_workers = int(operation.settings.get('split_workers', 1))
+        checkpoint = _checkpoint(operation)
+        cache = cache_for(operation.cache_dir)
+
+        for file_idx, pdf in enumerate(operation.files):
+            if is_cancelled():
+                return False
+
+            # Fully split inputs are not even opened again
+            chunk_prefix = f"chunk:{pdf}:"
+            if checkpoint.is_done(f"file:{pdf}"):
+                operation.outputs.extend(checkpoint.outputs(chunk_prefix))
+                continue
+
+            if not os.path.exists(pdf):
+                raise FileNotFoundError(f"PDF file not found: {pdf}")
+
+            # Output names derive from the input name, so it is part of the key
+            key = cached = None
+            if cache:
+                key = cache.make_key('split', [pdf], dict(operation.settings,
+                                                          source_name=os.path.basename(pdf)))
+                cached = cache.get(key)
+            if cached:
+                for stored_path, name in cached:
+                    output_path = os.path.join(operation.output_dir, name)
+                    ResultCache.materialize(stored_path, output_path)
+                    checkpoint.mark(f"{chunk_prefix}{output_path}", output_path)
+                    operation.outputs.append(output_path)
+                checkpoint.mark(f"file:{pdf}")
+                progress(os.path.basename(pdf), int(((file_idx + 1) / total_files) * 100))
+                continue
+
+            reader = PdfReader(pdf)
+            total_pages = len(reader.pages)
+            done = 0
+
+            def page_progress(pages: int):
+                nonlocal done
+                done += pages
+                # Each file is an equal share of the operation, whatever its page count
+                progress(
+                    f"{os.path.basename(pdf)} (Page {done}/{total_pages})",
+                    int(((file_idx + done / max(total_pages, 1)) / total_files) * 100)
+                )
+
+            completed = {path for path in checkpoint.outputs(chunk_prefix) if os.path.exists(path)}
+            outputs = split_pdf(
+                pdf, operation.output_dir, operation.settings,
+                progress=page_progress, is_cancelled=is_cancelled,
+                max_workers=max_workers, reader=reader, completed=completed,
+                on_output=lambda path: checkpoint.mark(f"{chunk_prefix}{path}", path)
+            )
+            operation.outputs.extend(outputs)
+
+            if is_cancelled():
+                return False
+            checkpoint.mark(f"file:{pdf}")
+            if cache:
+                cache.put(key, 'split', outputs)
+
+        operation.status = 'completed'
+        return True
+
+    except Exception as e:
+        operation.status = f'failed: {str(e)}'
+        raise
+
+def run_watermark(operation: BatchOperation, progress: ProgressCallback,
+                  is_cancelled: CancelCheck) -> bool:
+    """
+    Add watermark to PDFs.
+
+    With settings['watermark_file'] the first page of that PDF is stamped on
+    copies written to output_dir; otherwise settings['text'] or
+    settings['image'] is stamped on the files in place.
+    """
+    from operations.stamp import PdfPageStamp, StampEngine
+    try:
+        if (operation.settings.get('text') or operation.settings.get('image')) \
+                and not operation.settings.get('watermark_file'):
+            return _run_inplace_watermark(operation, progress, is_cancelled)
+
+        if not operation.settings.get('watermark_file'):
+            raise ValueError("Watermark file not specified")
+
+        # The watermark is parsed once and embedded once per output as a shared XObject
+        engine = StampEngine(PdfPageStamp(operation.settings['watermark_file'],
+                                          fit=bool(operation.settings.get('fit'))))
+
+        os.makedirs(operation.output_dir, exist_ok=True)
+        total_files = len(operation.files)
+        checkpoint = _checkpoint(operation)
+        cache = cache_for(operation.cache_dir)
+
+        for idx, pdf in enumerate(operation.files):
+            if is_cancelled():
+                raise OutputCancelled()
+
+            if checkpoint.is_done(f"file:{pdf}"):
+                operation.outputs.extend(checkpoint.outputs(f"file:{pdf}"))
+                continue
+
+            progress(os.path.basename(pdf), int((idx / total_files) * 100))
+
+            if not os.path.exists(pdf):
+                raise FileNotFoundError(f"PDF file not found: {pdf}")
+
+            output_path = os.path.join(
+                operation.output_dir,
+                f"watermarked_{os.path.basename(pdf)}"
+            )
+
+            key = cache.make_key('watermark', [pdf], operation.settings) if cache else None
+            cached = cache.get(key) if cache else None
+            if cached:
+                ResultCache.materialize(cached[0][0], output_path)
+            else:
+                with atomic_output(output_path) as temp_path:
+                    if not engine.stamp_pdf(pdf, temp_path, is_cancelled=is_cancelled):
+                        raise OutputCancelled()
+                if cache:
+                    cache.put(key, 'watermark', [output_path])
+            checkpoint.mark(f"file:{pdf}", output_path)
+            operation.outputs.append(output_path)
+
+        operation.status = 'completed'
+        return True
+
+    except OutputCancelled:
+        operation.status = 'cancelled'
+        return False
+    except Exception as e:
+        operation.status = f'failed: {str(e)}'
+        raise
+
+def _run_per_file(operation: BatchOperation, progress: ProgressCallback,
+                  is_cancelled: CancelCheck, action: Callable[[str, StatusReporter], Optional[str]],
+                  cache_output: Optional[Callable[[str], str]] = None,
+                  cache_settings: Optional[dict] = None) -> bool:
+    """
+    Apply an operation-class action to each file with a headless reporter.
+
+    The action returns the output path it produced (or None) and signals
+    failure by returning False or raising; the operation classes report the
+    reason through the reporter, which becomes the failure status.
+
+    Passing cache_output (input path -> output path) marks the action as
+    cacheable: results are keyed on the input content and cache_settings
+    (the operation settings by default). In-place results are copied over
+    the input rather than hardlinked to the cached object.
+    """
+    try:
+        total_files = len(operation.files)
+        checkpoint = _checkpoint(operation)
+        cache = cache_for(operation.cache_dir) if cache_output else None
+        for idx, pdf in enumerate(operation.files):
+            if is_cancelled():
+                return False
+
+            if checkpoint.is_done(f"file:{pdf}"):
+                operation.outputs.extend(checkpoint.outputs(f"file:{pdf}"))
+                continue
+
+            progress(os.path.basename(pdf), int((idx / total_files) * 100))
+
+            if not os.path.exists(pdf):
+                raise FileNotFoundError(f"PDF file not found: {pdf}")
+
+            key = None
+            if cache:
+                key = cache.make_key(operation.operation_type, [pdf],
+                                     operation.settings if cache_settings is None else cache_settings)
+                cached = cache.get(key)
+                if cached:
+                    output_path = cache_output(pdf)
+                    ResultCache.materialize(cached[0][0], output_path, link=output_path != pdf)
+                    checkpoint.mark(f"file:{pdf}", output_path)
+                    operation.outputs.append(output_path)
+                    continue
+
+            reporter = StatusReporter(is_cancelled=is_cancelled)
+            result = action(pdf, reporter)
+            if result is False and is_cancelled():
+                return False
+            if result is False:
+                raise RuntimeError(reporter.last_message or f"Failed to process {pdf}")
+            if cache and result:
+                cache.put(key, operation.operation_type, [result])
+            checkpoint.mark(f"file:{pdf}", result or None)
+            if result:
+                operation.outputs.append(result)
+
+        operation.status = 'completed'
+        return True
+
+    except Exception as e:
+        operation.status = f'failed: {str(e)}'
+        raise
+
+def _run_inplace_watermark(operation: BatchOperation, progress: ProgressCallback,
+                           is_cancelled: CancelCheck) -> bool:
+    """Stamp settings['text'] or settings['image'] on each file in place"""
+    from operations.stamp import ImageStamp, StampEngine, TextStamp
+    from operations.watermark import Watermark
+    settings = operation.settings
+
+    try:
+        if settings.get('text'):
+            stamp = TextStamp(
+                settings['text'],
+                settings.get('font_size', 48),
+                settings.get('opacity', 0.5),
+                settings.get('rotation', 45),
+                tuple(settings.get('color', (0.5, 0.5, 0.5))),
+                settings.get('position', 'Center')
+            )
+        else:
+            stamp = ImageStamp(
+                settings['image'],
+                settings.get('opacity', 0.5),
+                settings.get('scale', 0.5),
+                settings.get('rotation', 0),
+                settings.get('position', 'Center')
+            )
+    except Exception as e:
+        operation.status = f'failed: {str(e)}'
+        raise
+    # One engine for all files keeps the rendered overlays across them
+    engine = StampEngine(stamp)
+
+    def action(pdf: str, reporter: StatusReporter):
+        Watermark(reporter).apply_stamp(pdf, engine)
+        return pdf
+
+    return _run_per_file(operation, progress, is_cancelled, action, cache_output=lambda pdf: pdf)
+
+def run_compress(operation: BatchOperation, progress: ProgressCallback,
+                 is_cancelled: CancelCheck) -> bool:
+    """Compress PDFs in place"""
+    from operations.compression import PDFCompressor
+    quality_level = int(operation.settings.get('quality_level', 2))
+
+    def action(pdf: str, reporter: StatusReporter):
+        return PDFCompressor(reporter).compress_pdf(pdf, quality_level) and pdf
+
+    return _run_per_file(operation, progress, is_cancelled, action, cache_output=lambda pdf: pdf)
+
+def run_metadata(operation: BatchOperation, progress: ProgressCallback,
+                 is_cancelled: CancelCheck) -> bool:
+    """Write settings['metadata'] into PDFs in place"""
+    from operations.metadata import Metadata
+
+    def action(pdf: str, reporter: StatusReporter):
+        return Metadata(reporter).edit_metadata(pdf, dict(operation.settings.get('metadata', {}))) and pdf
+
+    return _run_per_file(operation, progress, is_cancelled, action)
+
+def run_encrypt(operation: BatchOperation, progress: ProgressCallback,
+                is_cancelled: CancelCheck) -> bool:
+    """Encrypt PDFs in place with settings['password']"""
+    from operations.security import Security
+
+    def action(pdf: str, reporter: StatusReporter):
+        return Security(reporter).encrypt_pdf(
+            pdf, operation.settings.get('password'), operation.settings.get('permissions_flag')
+        ) and pdf
+
+    return _run_per_file(operation, progress, is_cancelled, action)
+
+def run_redact(operation: BatchOperation, progress: ProgressCallback,
+               is_cancelled: CancelCheck) -> bool:
+    """Apply settings['redactions'] ([page_num, [x1, y1, x2, y2]] pairs) in place"""
+    from operations.redaction import Redaction
+    redactions = [(int(page_num), tuple(rect))
+                  for page_num, rect in operation.settings.get('redactions', [])]
+
+    def action(pdf: str, reporter: StatusReporter):
+        return Redaction(reporter).redact_pdf(pdf, redactions) and pdf
+
+    return _run_per_file(operation, progress, is_cancelled, action, cache_output=lambda pdf: pdf)
+
+def run_ocr(operation: BatchOperation, progress: ProgressCallback,
+            is_cancelled: CancelCheck) -> bool:
+    """
+    OCR PDFs and write <name>_ocr.txt files to output_dir.
+
+    Settings 'output' picks another ocr.sinks format: 'jsonl', 'hocr',
+    'alto', or 'pdf' for copies with an invisible text layer over their
+    scanned pages. Pages are written as they complete; a file interrupted
+    by cancellation or a crash resumes at its first missing page.
+    """
+    from ocr.adaptive import TierStats, tier_report
+    from ocr.ocr_processor import OCRProcessor
+    from ocr.pipeline import PipelineMetrics
+    from ocr.sinks import SINKS
+    settings = operation.settings
+    tiers = {}
+    pipeline = PipelineMetrics()
+    os.makedirs(operation.output_dir, exist_ok=True)
+
+    def configure(processor: OCRProcessor) -> OCRProcessor:
+        # Settings use the OCRProcessor attribute names without the ocr_ prefix
+        for key in ('language', 'quality', 'deskew', 'clean', 'psm', 'oem', 'dpi',
+                    'contrast', 'brightness', 'threshold', 'workers', 'engine', 'hybrid', 'adaptive'):
+            if key in settings:
+                setattr(processor, f'ocr_{key}', settings[key])
+        if settings.get('page_range'):
+            processor.ocr_page_range = parse_page_range(settings['page_range'])
+        if operation.cache_dir:
+            processor.ocr_cache_dir = os.path.join(operation.cache_dir, 'ocr_pages')
+        return processor
+
+    output_format = settings.get('output', 'text')
+    if output_format not in SINKS:
+        raise ValueError(f"Unknown OCR output format: {output_format}")
+
+    def output_for(pdf: str) -> str:
+        return os.path.join(operation.output_dir,
+                            f"{os.path.splitext(os.path.basename(pdf))[0]}_ocr.{SINKS[output_format].extension}")
+
+    def record_metrics(processor: OCRProcessor):
+        # Stage throughput, and for adaptive runs the work done at each DPI tier, add up across files
+        pipeline.add(processor.pipeline_metrics)
+        if pipeline.render.pages:
+            operation.report['pipeline'] = pipeline.to_dict()
+        for dpi, stats in processor.dpi_tiers.items():
+            tiers.setdefault(dpi, TierStats()).add(stats)
+        if tiers:
+            operation.report['dpi_tiers'] = tier_report(tiers)
+
+    def action(pdf: str, reporter: StatusReporter):
+        processor = configure(OCRProcessor(reporter))
+        output_path = processor.write_output(pdf, output_for(pdf), output_format)
+        record_metrics(processor)
+        return output_path or False
+
+    # Keyed on the effective OCR parameters, including defaults not given in settings
+    cache_settings = None
+    if operation.cache_dir:
+        cache_settings = dict(configure(OCRProcessor()).get_cache_settings(),
+                              output=output_format)
+    return _run_per_file(operation, progress, is_cancelled, action,
+                         cache_output=output_for, cache_settings=cache_settings)
+
+JOB_RUNNERS = {
+    'combine': run_combine,
+    'split': run_split,
+    'watermark': run_watermark,
+    'compress': run_compress,
+    'metadata': run_metadata,
+    'encrypt': run_encrypt,
+    'redact': run_redact,
+    'ocr': run_ocr,
+}
+
+def run_operation(operation: BatchOperation, progress: ProgressCallback,
+                  is_cancelled: CancelCheck) -> bool:
+    """Run a single operation with the runner registered for its type"""
+    runner = JOB_RUNNERS.get(operation.operation_type)
+    if runner is None:
+        raise ValueError(f"Unsupported operation type: {operation.operation_type}")
+    operation.start_time = datetime.now()
+    operation.outputs = []  # Completed units re-report their outputs when skipped
+    operation.report = {}
+    journal = _checkpoint(operation).journal
+    if journal:
+        journal.set_status(operation, 'running')
+    try:
+        return runner(operation, progress, is_cancelled)
+    finally:
+        operation.end_time = datetime.now()
+        if journal:
+            journal.set_status(operation)
@@ -0,0 +1,187 @@
+"""Crash-safe SQLite journal of batch operations and their completed units of work"""
+from dataclasses import asdict
+from datetime import datetime
+from typing import List, Optional, Dict
+import json
+import os
+import sqlite3
+import threading
+
+from batch.jobs import BatchOperation
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS operations (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    payload TEXT NOT NULL,
+    status TEXT NOT NULL,
+    retry_count INTEGER NOT NULL DEFAULT 0,
+    updated TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS transitions (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    operation_id INTEGER NOT NULL,
+    status TEXT NOT NULL,
+    at TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS units (
+    operation_id INTEGER NOT NULL,
+    unit TEXT NOT NULL,
+    output TEXT,
+    completed_at TEXT NOT NULL,
+    PRIMARY KEY (operation_id, unit)
+);
+"""
+
+# Fields of BatchOperation that are persisted; journal bookkeeping is excluded
+PERSISTED_FIELDS = ('operation_type', 'files', 'output_dir', 'settings', 'max_retries', 'job_id',
+                    'cache_dir')
+
+class JobJournal:
+    """
+    Persistent record of queued operations.
+
+    Every status transition and every completed unit of work (an output
+    file, an input file of a per-file operation, a split chunk) is
+    committed immediately, so after a crash the unfinished operations can
+    be reloaded and resume after their last completed unit. The database
+    runs in WAL mode so worker processes can record units concurrently.
+    """
+    def __init__(self, path: str):
+        self.path = os.path.abspath(path)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+        self._conn.commit()
+        _journals.setdefault(self.path, self)
+
+    def _execute(self, sql: str, params: tuple = ()) -> sqlite3.Cursor:
+        with self._lock:
+            cursor = self._conn.execute(sql, params)
+            self._conn.commit()
+            return cursor
+
+    def add(self, operation: BatchOperation) -> int:
+        """Record a new operation and attach the journal to it"""
+        payload = json.dumps({key: asdict(operation)[key] for key in PERSISTED_FIELDS})
+        now = datetime.now().isoformat()
+        cursor = self._execute(
+            "INSERT INTO operations (payload, status, retry_count, updated) VALUES (?, ?, ?, ?)",
+            (payload, operation.status, operation.retry_count, now)
+        )
+        operation.journal_path = self.path
+        operation.journal_id = cursor.lastrowid
+        self._execute(
+            "INSERT INTO transitions (operation_id, status, at) VALUES (?, ?, ?)",
+            (operation.journal_id, operation.status, now)
+        )
+        return operation.journal_id
+
+    def set_status(self, operation: BatchOperation, status: Optional[str] = None):
+        """Record a status transition (defaults to the operation's current status)"""
+        if operation.journal_id is None:
+            return
+        status = status or operation.status
+        now = datetime.now().isoformat()
+        self._execute(
+            "UPDATE operations SET status = ?, retry_count = ?, updated = ? WHERE id = ?",
+            (status, operation.retry_count, now, operation.journal_id)
+        )
+        self._execute(
+            "INSERT INTO transitions (operation_id, status, at) VALUES (?, ?, ?)",
+            (operation.journal_id, status, now)
+        )
+
+    def unfinished(self, include_failed: bool = True) -> List[BatchOperation]:
+        """
+        Load operations that have not completed, in the order they were added.
+
+        Args:
+            include_failed: Also return operations that exhausted their retries
+
+        Returns:
+            Operations attached to this journal, ready to be queued again
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id, payload, status FROM operations ORDER BY id"
+            ).fetchall()
+
+        operations = []
+        for operation_id, payload, status in rows:
+            if status == 'completed' or (status.startswith('failed') and not include_failed):
+                continue
+            operation = BatchOperation(**json.loads(payload))
+            operation.journal_path = self.path
+            operation.journal_id = operation_id
+            operation.outputs = [output for output in self.completed_units(operation_id).values()
+                                 if output]
+            operations.append(operation)
+        return operations
+
+    def completed_units(self, operation_id: int) -> Dict[str, Optional[str]]:
+        """Get completed units of an operation as {unit: output path}"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT unit, output FROM units WHERE operation_id = ? ORDER BY completed_at",
+                (operation_id,)
+            ).fetchall()
+        return dict(rows)
+
+    def mark_unit(self, operation_id: int, unit: str, output: Optional[str] = None):
+        """Record a completed unit of work"""
+        self._execute(
+            "INSERT OR REPLACE INTO units (operation_id, unit, output, completed_at) VALUES (?, ?, ?, ?)",
+            (operation_id, unit, output, datetime.now().isoformat())
+        )
+
+    def close(self):
+        if _journals.get(self.path) is self:
+            del _journals[self.path]
+        with self._lock:
+            self._conn.close()
+
+class Checkpoint:
+    """
+    Unit-of-work tracker used by the job runners.
+
+    A unit is skipped when the journal says it is complete and its output
+    still exists on disk. Without a journal every unit runs.
+    """
+    def __init__(self, journal: Optional[JobJournal] = None, operation_id: Optional[int] = None):
+        self.journal = journal
+        self.operation_id = operation_id
+        self._done = journal.completed_units(operation_id) if journal else {}
+
+    def is_done(self, unit: str) -> bool:
+        if unit not in self._done:
+            return False
+        output = self._done[unit]
+        return output is None or os.path.exists(output)
+
+    def outputs(self, prefix: str) -> List[str]:
+        """Get the recorded outputs of completed units whose name starts with prefix"""
+        return [output for unit, output in self._done.items()
+                if unit.startswith(prefix) and output]
+
+    def units(self, prefix: str) -> List[str]:
+        """Get the names of completed units starting with prefix"""
+        return [unit for unit in self._done if unit.startswith(prefix)]
+
+    def mark(self, unit: str, output: Optional[str] = None):
+        self._done[unit] = output
+        if self.journal:
+            self.journal.mark_unit(self.operation_id, unit, output)
+
+# One connection per journal per process; workers open their own lazily
+_journals: Dict[str, JobJournal] = {}
+
+def checkpoint_for(operation: BatchOperation) -> Checkpoint:
+    """Get the checkpoint for an operation, opening its journal in this process if needed"""
+    if not operation.journal_path or operation.journal_id is None:
+        return Checkpoint()
+    journal = _journals.get(operation.journal_path)
+    if journal is None:
+        journal = _journals[operation.journal_path] = JobJournal(operation.journal_path)
+    return Checkpoint(journal, operation.journal_id)
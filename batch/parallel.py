@@ -0,0 +1,169 @@
+"""Process-pool execution of independent batch operations"""
+from concurrent.futures import ProcessPoolExecutor, Future, wait, FIRST_COMPLETED
+from typing import List, Optional, Dict, Callable, Set, Tuple
+import multiprocessing
+import queue
+import signal
+import threading
+import os
+
+from batch.jobs import (BatchOperation, ProgressCallback, CancelCheck,
+                        operation_resources, run_operation)
+
+# Worker-side handles, installed once per worker process by _init_worker
+_progress_queue = None
+_cancel_event = None
+
+def _init_worker(progress_queue, cancel_event):
+    global _progress_queue, _cancel_event
+    # Cancellation goes through cancel_event; a terminal Ctrl+C must not kill workers mid-write
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    _progress_queue = progress_queue
+    _cancel_event = cancel_event
+
+def _execute(operation: BatchOperation) -> Tuple[bool, BatchOperation, Optional[str]]:
+    """
+    Run one operation inside a worker process.
+
+    Returns:
+        Tuple of (success, the worker's copy of the operation, error message or None)
+    """
+    def progress(filename: str, percentage: int):
+        _progress_queue.put((filename, percentage))
+
+    try:
+        success = run_operation(operation, progress, _cancel_event.is_set)
+        return success, operation, None
+    except Exception as e:
+        return False, operation, str(e)
+
+class ParallelExecutor:
+    """
+    Run batch operations across a pool of worker processes.
+
+    Operations are started in queue order. An operation that conflicts with
+    a running or earlier pending operation (see operation_resources) waits
+    until that operation has finished, so in-place edits of the same file
+    never overlap.
+    """
+    def __init__(self, max_workers: Optional[int] = None, mp_context=None):
+        self.max_workers = max_workers or os.cpu_count() or 1
+        # Forking a process that owns a running Qt event loop is unsafe
+        self.mp_context = mp_context or multiprocessing.get_context('spawn')
+
+    def run(self,
+            operations: List[BatchOperation],
+            file_progress: ProgressCallback,
+            is_cancelled: CancelCheck,
+            on_finished: Callable[[BatchOperation, bool], None],
+            on_retry: Callable[[BatchOperation], None],
+            on_error: Callable[[str], None]) -> List[BatchOperation]:
+        """
+        Process operations until all have finished or cancellation is requested.
+
+        Args:
+            operations: Operations to run, in queue order
+            file_progress: Receives (filename, percentage) from any worker
+            is_cancelled: Polled to detect cancellation
+            on_finished: Called with (operation, success) once an operation is final
+            on_retry: Called when a failed operation is re-queued
+            on_error: Called with the error message of a failed attempt
+
+        Returns:
+            Operations that were never started because of cancellation
+        """
+        pending = list(operations)
+        running: Dict[Future, BatchOperation] = {}
+        progress_queue = self.mp_context.Queue()
+        cancel_event = self.mp_context.Event()
+
+        pump = threading.Thread(target=self._pump_progress,
+                                args=(progress_queue, file_progress), daemon=True)
+        pump.start()
+
+        executor = ProcessPoolExecutor(
+            max_workers=self.max_workers,
+            mp_context=self.mp_context,
+            initializer=_init_worker,
+            initargs=(progress_queue, cancel_event)
+        )
+        try:
+            while pending or running:
+                if is_cancelled():
+                    cancel_event.set()
+                else:
+                    self._submit_ready(executor, pending, running)
+
+                if not running:
+                    break
+
+                done, _ = wait(list(running), timeout=0.2, return_when=FIRST_COMPLETED)
+                for future in done:
+                    operation = running.pop(future)
+                    try:
+                        success, result, error = future.result()
+                        operation.status = result.status
+                        operation.outputs = result.outputs
+                        operation.report = result.report
+                        operation.start_time = result.start_time
+                        operation.end_time = result.end_time
+                    except Exception as e:
+                        success, error = False, str(e)
+                        operation.status = f'failed: {error}'
+                    if error:
+                        on_error(f"Operation failed: {error}")
+
+                    if (not success and not cancel_event.is_set()
+                            and operation.retry_count < operation.max_retries):
+                        operation.retry_count += 1
+                        pending.insert(0, operation)
+                        on_retry(operation)
+                        continue
+
+                    on_finished(operation, success)
+        finally:
+            executor.shutdown(wait=True, cancel_futures=True)
+            progress_queue.put(None)
+            pump.join()
+
+        return pending
+
+    def _submit_ready(self, executor: ProcessPoolExecutor,
+                      pending: List[BatchOperation], running: Dict[Future, BatchOperation]):
+        """Submit pending operations that do not conflict with earlier ones"""
+        held_reads: Set[str] = set()
+        held_writes: Set[str] = set()
+        for operation in running.values():
+            reads, writes = operation_resources(operation)
+            held_reads |= reads
+            held_writes |= writes
+
+        for operation in list(pending):
+            if len(running) >= self.max_workers:
+                break
+
+            reads, writes = operation_resources(operation)
+            conflict = (writes & (held_reads | held_writes)) or (reads & held_writes)
+
+            # Blocked operations still hold their paths so later ones cannot overtake them
+            held_reads |= reads
+            held_writes |= writes
+            if conflict:
+                continue
+
+            pending.remove(operation)
+            future = executor.submit(_execute, operation)
+            running[future] = operation
+
+    @staticmethod
+    def _pump_progress(progress_queue, file_progress: ProgressCallback):
+        """Forward worker progress messages until the sentinel arrives"""
+        while True:
+            try:
+                message = progress_queue.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            if message is None:
+                break
+            filename, percentage = message
+            file_progress(filename, percentage)
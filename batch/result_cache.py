@@ -0,0 +1,294 @@
+"""Content-addressed cache of operation results"""
+from datetime import datetime
+from typing import List, Optional, Dict, Tuple, Iterable
+import hashlib
+import json
+import os
+import shutil
+import sqlite3
+import threading
+
+# Bump when a change to an operation makes previously cached outputs invalid
+CACHE_VERSION = 3
+
+DEFAULT_MAX_BYTES = 5 * 1024 ** 3
+
+# Settings that change how a job runs but not what it produces
+VOLATILE_SETTINGS = {'split_workers', 'in_place', 'max_open_inputs', 'merge_workers', 'merge_fan_in',
+                     'append_to', 'compact_after'}
+
+# Settings holding paths whose content, not location, determines the result
+PATH_SETTINGS = {'watermark_file', 'image'}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    key TEXT PRIMARY KEY,
+    operation_type TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    created TEXT NOT NULL,
+    last_access TEXT NOT NULL,
+    hits INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS entry_files (
+    key TEXT NOT NULL,
+    idx INTEGER NOT NULL,
+    name TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    PRIMARY KEY (key, idx)
+);
+CREATE TABLE IF NOT EXISTS digests (
+    path TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    inode INTEGER NOT NULL,
+    digest TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS stats (
+    name TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+"""
+
+def default_cache_dir() -> str:
+    return os.environ.get('PDFCOMBINER_CACHE_DIR',
+                          os.path.join(os.path.expanduser('~'), '.cache', 'pdfcombiner', 'results'))
+
+class ResultCache:
+    """
+    Cache of operation outputs keyed by the content of their inputs.
+
+    A key is the SHA-256 of the operation type, the content hash of every
+    input and the normalized settings, so a re-run on unchanged inputs
+    materializes the stored outputs (by hardlink when possible, otherwise
+    by copy) instead of recomputing them. File digests are memoized by
+    (path, size, mtime, inode) so unchanged inputs are not re-read. The
+    store is bounded by max_bytes with least-recently-used eviction.
+    """
+    def __init__(self, cache_dir: Optional[str] = None, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.cache_dir = os.path.abspath(cache_dir or default_cache_dir())
+        self.max_bytes = max_bytes
+        self.objects_dir = os.path.join(self.cache_dir, 'objects')
+        os.makedirs(self.objects_dir, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(os.path.join(self.cache_dir, 'index.db'),
+                                     timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(SCHEMA)
+        self._conn.commit()
+
+    def _execute(self, sql: str, params: tuple = ()) -> List[tuple]:
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+            self._conn.commit()
+            return rows
+
+    def _count(self, name: str, amount: int = 1):
+        self._execute(
+            "INSERT INTO stats (name, value) VALUES (?, ?) "
+            "ON CONFLICT(name) DO UPDATE SET value = value + excluded.value",
+            (name, amount)
+        )
+
+    def file_digest(self, path: str) -> str:
+        """Get the SHA-256 of a file, reusing the stored digest if the file is unchanged"""
+        path = os.path.abspath(path)
+        st = os.stat(path)
+        rows = self._execute(
+            "SELECT digest FROM digests WHERE path = ? AND size = ? AND mtime_ns = ? AND inode = ?",
+            (path, st.st_size, st.st_mtime_ns, st.st_ino)
+        )
+        if rows:
+            return rows[0][0]
+
+        sha = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(1024 * 1024), b''):
+                sha.update(block)
+        digest = sha.hexdigest()
+        self._execute(
+            "INSERT OR REPLACE INTO digests (path, size, mtime_ns, inode, digest) VALUES (?, ?, ?, ?, ?)",
+            (path, st.st_size, st.st_mtime_ns, st.st_ino, digest)
+        )
+        return digest
+
+    def make_key(self, operation_type: str, inputs: Iterable[str], settings: dict) -> str:
+        """
+        Build the cache key for running an operation on some inputs.
+
+        Args:
+            operation_type: BatchOperation.operation_type
+            inputs: Input file paths, in the order the operation uses them
+            settings: Settings that influence the output
+
+        Returns:
+            Hex SHA-256 key
+        """
+        normalized = {}
+        for key, value in settings.items():
+            if key in VOLATILE_SETTINGS:
+                continue
+            if key in PATH_SETTINGS and value:
+                value = self.file_digest(value)
+            normalized[key] = value
+        payload = {
+            'version': CACHE_VERSION,
+            'type': operation_type,
+            'inputs': [self.file_digest(path) for path in inputs],
+            'settings': normalized,
+        }
+        encoded = json.dumps(payload, sort_keys=True, default=str).encode('utf-8')
+        return hashlib.sha256(encoded).hexdigest()
+
+    def _entry_dir(self, key: str) -> str:
+        return os.path.join(self.objects_dir, key[:2], key)
+
+    def get(self, key: str) -> Optional[List[Tuple[str, str]]]:
+        """
+        Look up a cached result.
+
+        Returns:
+            List of (stored path, original file name) in output order, or None on a miss
+        """
+        rows = self._execute(
+            "SELECT idx, name, size FROM entry_files WHERE key = ? ORDER BY idx", (key,))
+        if rows:
+            entry_dir = self._entry_dir(key)
+            files = [(os.path.join(entry_dir, f"{idx}_{name}"), name, size) for idx, name, size in rows]
+            # A damaged entry is dropped and counted as a miss
+            if all(os.path.exists(path) and os.path.getsize(path) == size for path, _, size in files):
+                self._execute(
+                    "UPDATE entries SET last_access = ?, hits = hits + 1 WHERE key = ?",
+                    (datetime.now().isoformat(), key)
+                )
+                self._count('hits')
+                return [(path, name) for path, name, _ in files]
+            self.remove(key)
+        self._count('misses')
+        return None
+
+    @staticmethod
+    def materialize(stored_path: str, destination: str, link: bool = True):
+        """Place a cached file at destination, by hardlink if possible"""
+        os.makedirs(os.path.dirname(os.path.abspath(destination)), exist_ok=True)
+        temp_path = f"{destination}.part"
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        try:
+            if not link:
+                raise OSError("Linking disabled")
+            os.link(stored_path, temp_path)
+        except OSError:
+            shutil.copyfile(stored_path, temp_path)
+        os.replace(temp_path, destination)
+
+    def put(self, key: str, operation_type: str, outputs: List[str]):
+        """Store the outputs of an operation under key and enforce the size budget"""
+        entry_dir = self._entry_dir(key)
+        staging_dir = f"{entry_dir}.{os.getpid()}.tmp"
+        shutil.rmtree(staging_dir, ignore_errors=True)
+        os.makedirs(staging_dir)
+
+        files = []
+        for idx, output in enumerate(outputs):
+            name = os.path.basename(output)
+            shutil.copyfile(output, os.path.join(staging_dir, f"{idx}_{name}"))
+            files.append((idx, name, os.path.getsize(output)))
+        total = sum(size for _, _, size in files)
+
+        shutil.rmtree(entry_dir, ignore_errors=True)
+        os.replace(staging_dir, entry_dir)
+
+        now = datetime.now().isoformat()
+        with self._lock:
+            self._conn.execute("DELETE FROM entry_files WHERE key = ?", (key,))
+            self._conn.execute(
+                "INSERT OR REPLACE INTO entries (key, operation_type, size, created, last_access, hits) "
+                "VALUES (?, ?, ?, ?, ?, 0)",
+                (key, operation_type, total, now, now)
+            )
+            self._conn.executemany(
+                "INSERT INTO entry_files (key, idx, name, size) VALUES (?, ?, ?, ?)",
+                [(key, idx, name, size) for idx, name, size in files]
+            )
+            self._conn.commit()
+        self._count('stores')
+        self.prune()
+
+    def remove(self, key: str):
+        """Delete one entry"""
+        shutil.rmtree(self._entry_dir(key), ignore_errors=True)
+        with self._lock:
+            self._conn.execute("DELETE FROM entry_files WHERE key = ?", (key,))
+            self._conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+            self._conn.commit()
+
+    def prune(self, max_bytes: Optional[int] = None) -> Tuple[int, int]:
+        """
+        Evict least-recently-used entries until the store fits the budget.
+
+        Returns:
+            Tuple of (entries evicted, bytes freed)
+        """
+        budget = self.max_bytes if max_bytes is None else max_bytes
+        rows = self._execute("SELECT key, size FROM entries ORDER BY last_access")
+        total = sum(size for _, size in rows)
+        evicted = freed = 0
+        for key, size in rows:
+            if total <= budget:
+                break
+            self.remove(key)
+            total -= size
+            evicted += 1
+            freed += size
+        if evicted:
+            self._count('evictions', evicted)
+        return evicted, freed
+
+    def clear(self) -> int:
+        """Delete every entry; returns the number removed"""
+        evicted, _ = self.prune(max_bytes=0)
+        return evicted
+
+    def stats(self) -> Dict[str, object]:
+        """Get hit/miss counters and the current store size"""
+        counters = dict(self._execute("SELECT name, value FROM stats"))
+        entries, size = self._execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries")[0]
+        hits = counters.get('hits', 0)
+        misses = counters.get('misses', 0)
+        return {
+            'cache_dir': self.cache_dir,
+            'entries': entries,
+            'size': size,
+            'max_bytes': self.max_bytes,
+            'hits': hits,
+            'misses': misses,
+            'hit_rate': round(hits / (hits + misses), 4) if hits + misses else 0.0,
+            'stores': counters.get('stores', 0),
+            'evictions': counters.get('evictions', 0),
+        }
+
+    def entries(self) -> List[dict]:
+        """List entries, most recently used first"""
+        rows = self._execute(
+            "SELECT key, operation_type, size, created, last_access, hits FROM entries "
+            "ORDER BY last_access DESC"
+        )
+        return [dict(zip(('key', 'type', 'size', 'created', 'last_access', 'hits'), row))
+                for row in rows]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+# One index connection per cache directory per process
+_caches: Dict[str, ResultCache] = {}
+
+def cache_for(cache_dir: Optional[str]) -> Optional[ResultCache]:
+    """Get the cache for a directory in this process, or None if caching is off"""
+    if not cache_dir:
+        return None
+    cache_dir = os.path.abspath(cache_dir)
+    cache = _caches.get(cache_dir)
+    if cache is None:
+        cache = _caches[cache_dir] = ResultCache(cache_dir)
+    return cache
@@ -0,0 +1,313 @@
+"""Single-parse, multi-process PDF split engine"""
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass
+from typing import List, Optional, Dict, Callable, Iterable, Set
+import logging
+import multiprocessing
+import os
+import re
+
+from PyPDF2 import PdfReader, PdfWriter
+from PyPDF2.generic import DictionaryObject, ArrayObject, IndirectObject, NameObject, StreamObject
+
+from utils.utils import parse_page_range, PageRangeError, atomic_output, page_content
+
+SPLIT_MODES = ('pages', 'every', 'ranges', 'size')
+
+# Resource categories whose entries are only kept when the content stream names them
+PRUNABLE_RESOURCES = ('/XObject', '/Font', '/ExtGState', '/Pattern', '/Shading',
+                      '/ColorSpace', '/Properties')
+
+# Rough serialized size of a non-stream object, used by the size planner
+OBJECT_OVERHEAD = 64
+
+NAME_TOKEN = re.compile(rb'/([^\s/\[\]()<>{}%]+)')
+
+logger = logging.getLogger(__name__)
+
+@dataclass
+class SplitChunk:
+    """Pages written to one output file"""
+    pages: List[int]
+    output_path: str
+
+def _page_label(pages: List[int]) -> str:
+    if len(pages) == 1:
+        return f"page{pages[0] + 1}"
+    if pages == list(range(pages[0], pages[-1] + 1)):
+        return f"pages{pages[0] + 1}-{pages[-1] + 1}"
+    return f"pages{pages[0] + 1}-{pages[-1] + 1}_{len(pages)}p"
+
+def _chunk_path(pdf_path: str, output_dir: str, pages: List[int]) -> str:
+    stem = os.path.splitext(os.path.basename(pdf_path))[0]
+    return os.path.join(output_dir, f"{stem}_{_page_label(pages)}.pdf")
+
+def plan_split(pdf_path: str, output_dir: str, total_pages: int, settings: dict,
+               reader: Optional[PdfReader] = None) -> List[SplitChunk]:
+    """
+    Plan the output files for one input.
+
+    Only size mode looks at the pages, to estimate the size of each output;
+    the plan never depends on how many workers write it.
+
+    Args:
+        pdf_path: Input PDF path
+        output_dir: Directory for the output files
+        total_pages: Number of pages in the input
+        settings: Operation settings (split_mode, split_every, split_ranges, split_max_mb)
+        reader: Already-open reader for pdf_path, used by size mode
+
+    Returns:
+        List of planned chunks in page order
+
+    Raises:
+        ValueError: If the split settings are invalid
+    """
+    mode = settings.get('split_mode', 'pages')
+    if mode not in SPLIT_MODES:
+        raise ValueError(f"Unknown split mode: {mode}")
+
+    if mode in ('pages', 'every'):
+        every = 1 if mode == 'pages' else int(settings.get('split_every', 1))
+        if every < 1:
+            raise ValueError("split_every must be at least 1")
+        groups = [list(range(start, min(start + every, total_pages)))
+                  for start in range(0, total_pages, every)]
+        return [SplitChunk(group, _chunk_path(pdf_path, output_dir, group)) for group in groups]
+
+    if mode == 'ranges':
+        ranges = settings.get('split_ranges')
+        if not ranges:
+            raise ValueError("split_ranges not specified")
+        # "1-3,4-10,11" produces three outputs; a list gives full range strings per output
+        if isinstance(ranges, str):
+            ranges = ranges.split(',')
+        chunks = []
+        for part in ranges:
+            try:
+                group = parse_page_range(part, total_pages)
+            except PageRangeError as e:
+                raise ValueError(f"Invalid page range '{part}': {str(e)}")
+            chunks.append(SplitChunk(group, _chunk_path(pdf_path, output_dir, group)))
+        return chunks
+
+    max_mb = float(settings.get('split_max_mb', 0))
+    if max_mb <= 0:
+        raise ValueError("split_max_mb must be greater than 0")
+    return _pack_by_size(reader or PdfReader(pdf_path), pdf_path, output_dir,
+                         range(total_pages), int(max_mb * 1024 * 1024))
+
+def _used_names(page) -> Optional[Set[bytes]]:
+    """Collect every name token in the page content, or None if it cannot be decoded"""
+    try:
+        return set(NAME_TOKEN.findall(page_content(page)))
+    except Exception as e:
+        # The page is still copied whole, just without pruning its resources
+        logger.warning("Could not read page content, keeping all its resources: %s", e)
+        return None
+
+def _pruned_resources(page) -> Optional[DictionaryObject]:
+    """
+    Build a copy of the page resources without entries the content never names.
+
+    Only the resource dictionaries are copied; the objects they reference
+    are shared, so the writer clones just the fonts, images and forms the
+    page actually draws.
+    """
+    resources = page.get('/Resources')
+    if resources is None:
+        return None
+    resources = resources.get_object()
+    used = _used_names(page)
+    if used is None:
+        return None
+
+    pruned = DictionaryObject()
+    for category, value in resources.items():
+        entries = value.get_object()
+        if category in PRUNABLE_RESOURCES and isinstance(entries, DictionaryObject):
+            kept = DictionaryObject()
+            for key, value in entries.items():
+                # Keep escaped names (#xx) rather than trying to match them
+                if key[1:].encode('latin-1', 'replace') in used or '#' in key:
+                    kept[NameObject(key)] = value
+            pruned[NameObject(category)] = kept
+        else:
+            pruned[NameObject(category)] = value
+    return pruned
+
+def _add_pruned_page(writer: PdfWriter, page):
+    """Add a page to the writer, cloning only the resources it references"""
+    pruned = _pruned_resources(page)
+    if pruned is None:
+        writer.add_page(page)
+        return
+    original = page.raw_get('/Resources')
+    page[NameObject('/Resources')] = pruned
+    try:
+        writer.add_page(page)
+    finally:
+        page[NameObject('/Resources')] = original
+
+def _page_object_sizes(page) -> Dict[int, int]:
+    """Estimate the serialized size of every indirect object a page needs"""
+    sizes: Dict[int, int] = {}
+    pruned = _pruned_resources(page)
+    stack = [pruned if pruned is not None else page.get('/Resources'), page.get('/Contents')]
+    while stack:
+        obj = stack.pop()
+        if obj is None:
+            continue
+        if isinstance(obj, IndirectObject):
+            if obj.idnum in sizes:
+                continue
+            resolved = obj.get_object()
+            data = getattr(resolved, '_data', None) if isinstance(resolved, StreamObject) else None
+            sizes[obj.idnum] = OBJECT_OVERHEAD + (len(data) if data else 0)
+            stack.append(resolved)
+        elif isinstance(obj, DictionaryObject):
+            stack.extend(value for key, value in obj.items() if key not in ('/Parent', '/P'))
+        elif isinstance(obj, ArrayObject):
+            stack.extend(obj)
+    return sizes
+
+def _pack_by_size(reader: PdfReader, pdf_path: str, output_dir: str,
+                  pages: Iterable[int], max_bytes: int) -> List[SplitChunk]:
+    """Greedily pack pages, in order, into outputs no larger than max_bytes"""
+    packed: List[SplitChunk] = []
+    current: List[int] = []
+    current_sizes: Dict[int, int] = {}
+    current_total = 0
+
+    for page_idx in pages:
+        sizes = _page_object_sizes(reader.pages[page_idx])
+        # Objects shared with pages already in the chunk cost nothing extra
+        added = sum(size for idnum, size in sizes.items() if idnum not in current_sizes)
+        if current and current_total + added > max_bytes:
+            packed.append(SplitChunk(current, _chunk_path(pdf_path, output_dir, current)))
+            current, current_sizes, current_total = [], {}, 0
+            added = sum(sizes.values())
+        current.append(page_idx)
+        current_sizes.update(sizes)
+        current_total += added
+
+    if current:
+        packed.append(SplitChunk(current, _chunk_path(pdf_path, output_dir, current)))
+    return packed
+
+def _write_chunks(reader: PdfReader, pdf_path: str, output_dir: str,
+                  chunks: List[SplitChunk],
+                  is_cancelled: Optional[Callable[[], bool]] = None,
+                  completed: Optional[Set[str]] = None,
+                  on_output: Optional[Callable[[str], None]] = None) -> List[str]:
+    """Write planned chunks from an already-open reader, skipping completed outputs"""
+    outputs = []
+    for chunk in chunks:
+        if is_cancelled and is_cancelled():
+            return outputs
+        if completed and chunk.output_path in completed:
+            outputs.append(chunk.output_path)
+            continue
+        writer = PdfWriter()
+        for page_idx in chunk.pages:
+            _add_pruned_page(writer, reader.pages[page_idx])
+        with atomic_output(chunk.output_path) as temp_path:
+            with open(temp_path, 'wb') as f:
+                writer.write(f)
+        outputs.append(chunk.output_path)
+        if on_output:
+            on_output(chunk.output_path)
+    return outputs
+
+def _write_shard(pdf_path: str, output_dir: str, chunks: List[SplitChunk],
+                 completed: Set[str]) -> List[str]:
+    """Worker entry point: parse the input once and write a contiguous group of chunks"""
+    return _write_chunks(PdfReader(pdf_path), pdf_path, output_dir, chunks, completed=completed)
+
+def _shard_chunks(chunks: List[SplitChunk], shards: int) -> List[List[SplitChunk]]:
+    """Group consecutive chunks into shards of roughly equal page count"""
+    total = sum(len(chunk.pages) for chunk in chunks)
+    target = max(1, -(-total // shards))
+    groups: List[List[SplitChunk]] = [[]]
+    count = 0
+    for chunk in chunks:
+        if groups[-1] and count >= target:
+            groups.append([])
+            count = 0
+        groups[-1].append(chunk)
+        count += len(chunk.pages)
+    return [group for group in groups if group]
+
+def split_pdf(pdf_path: str, output_dir: str, settings: dict,
+              progress: Optional[Callable[[int], None]] = None,
+              is_cancelled: Optional[Callable[[], bool]] = None,
+              max_workers: int = 1,
+              reader: Optional[PdfReader] = None,
+              completed: Optional[Set[str]] = None,
+              on_output: Optional[Callable[[str], None]] = None) -> List[str]:
+    """
+    Split one PDF according to the split settings.
+
+    With max_workers > 1 the planned outputs are sharded into contiguous
+    page ranges and each worker process parses the input once for its
+    whole shard.
+
+    Args:
+        pdf_path: Input PDF path
+        output_dir: Directory for the output files
+        settings: Operation settings (see plan_split)
+        progress: Called with the number of pages finished since the last call
+        is_cancelled: Polled between outputs
+        max_workers: Number of worker processes
+        reader: Already-open reader for pdf_path, reused when splitting in-process
+        completed: Output paths written by an earlier run, which are not rewritten
+        on_output: Called with each output path once it has been committed
+
+    Returns:
+        List of written output paths in page order
+    """
+    reader = reader or PdfReader(pdf_path)
+    total_pages = len(reader.pages)
+    workers = max(1, min(max_workers, total_pages))
+    chunks = plan_split(pdf_path, output_dir, total_pages, settings, reader=reader)
+    os.makedirs(output_dir, exist_ok=True)
+
+    if workers == 1:
+        outputs = []
+        for chunk in chunks:
+            if is_cancelled and is_cancelled():
+                break
+            outputs.extend(_write_chunks(reader, pdf_path, output_dir, [chunk], is_cancelled,
+                                         completed, on_output))
+            if progress:
+                progress(len(chunk.pages))
+        return outputs
+
+    # Several shards per worker keep the pool busy when shards differ in cost
+    groups = _shard_chunks(chunks, workers * 4)
+    results: Dict[int, List[str]] = {}
+    completed = completed or set()
+    for idx, group in enumerate(groups):
+        # Shards whose outputs all exist from an earlier run need no worker at all
+        if all(chunk.output_path in completed for chunk in group):
+            results[idx] = [chunk.output_path for chunk in group]
+            if progress:
+                progress(sum(len(chunk.pages) for chunk in group))
+    with ProcessPoolExecutor(max_workers=workers,
+                             mp_context=multiprocessing.get_context('spawn')) as executor:
+        futures = {executor.submit(_write_shard, pdf_path, output_dir, group, completed): idx
+                   for idx, group in enumerate(groups) if idx not in results}
+        for future in as_completed(futures):
+            idx = futures[future]
+            results[idx] = future.result()
+            if on_output:
+                for path in results[idx]:
+                    on_output(path)
+            if progress:
+                progress(sum(len(chunk.pages) for chunk in groups[idx]))
+            if is_cancelled and is_cancelled():
+                for pending in futures:
+                    pending.cancel()
+                break
+
+    return [path for idx in sorted(results) for path in results[idx]]
@@ -0,0 +1,193 @@
+"""PDF validation with a fast structural tier, parallel fan-out and a persistent cache"""
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import List, Optional, Dict, Tuple, Iterable
+import os
+import re
+import sqlite3
+import threading
+from PyPDF2 import PdfReader
+
+# (valid, message) as returned by every check
+ValidationResult = Tuple[bool, str]
+
+HEADER_WINDOW = 1024
+TAIL_WINDOW = 4096
+XREF_WINDOW = 4096
+
+STARTXREF = re.compile(rb'startxref\s+(\d+)')
+OBJECT_HEADER = re.compile(rb'\s*\d+\s+\d+\s+obj\b')
+ENCRYPT_KEY = re.compile(rb'/Encrypt(?![A-Za-z])')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS results (
+    path TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    inode INTEGER NOT NULL,
+    valid INTEGER NOT NULL,
+    message TEXT NOT NULL,
+    checked TEXT NOT NULL
+);
+"""
+
+def default_validation_cache() -> str:
+    return os.path.join(os.path.expanduser('~'), '.cache', 'pdfcombiner', 'validation.db')
+
+class ValidationCache:
+    """Validation results keyed by (path, size, mtime, inode); a changed file is a miss"""
+    def __init__(self, path: str):
+        self.path = os.path.abspath(path)
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(SCHEMA)
+        self._conn.commit()
+
+    def get(self, path: str, st: os.stat_result) -> Optional[ValidationResult]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT valid, message FROM results "
+                "WHERE path = ? AND size = ? AND mtime_ns = ? AND inode = ?",
+                (path, st.st_size, st.st_mtime_ns, st.st_ino)
+            ).fetchone()
+        return (bool(row[0]), row[1]) if row else None
+
+    def put(self, path: str, st: os.stat_result, result: ValidationResult):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO results (path, size, mtime_ns, inode, valid, message, checked) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (path, st.st_size, st.st_mtime_ns, st.st_ino, int(result[0]), result[1],
+                 datetime.now().isoformat())
+            )
+            self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+class PDFValidator:
+    """
+    PDF validation utilities.
+
+    The fast tier reads only the header, the tail (startxref and %%EOF),
+    the cross-reference section it points at and the trailer, which is
+    enough to reject non-PDFs and encrypted files and to accept well-formed
+    ones without parsing the document. Files the fast tier cannot decide
+    (damaged tails, unusual layouts) get the full PdfReader parse.
+    """
+    def __init__(self, use_cache: bool = True, cache_path: Optional[str] = None,
+                 max_workers: Optional[int] = None):
+        self.cache: Optional[ValidationCache] = None
+        if use_cache:
+            try:
+                self.cache = ValidationCache(cache_path or default_validation_cache())
+            except (OSError, sqlite3.Error):
+                # An unwritable cache location only costs speed
+                self.cache = None
+        self.max_workers = max_workers or min(32, (os.cpu_count() or 1) * 4)
+
+    @staticmethod
+    def quick_check(file_path: str) -> Optional[ValidationResult]:
+        """
+        Check the file structure without parsing the document.
+
+        Returns:
+            (valid, message), or None if a full parse is needed to decide
+        """
+        size = os.path.getsize(file_path)
+        with open(file_path, 'rb') as file:
+            if not file.read(HEADER_WINDOW).startswith(b'%PDF'):
+                return False, "Not a valid PDF file"
+
+            file.seek(max(0, size - TAIL_WINDOW))
+            tail = file.read()
+            if b'%%EOF' not in tail:
+                return None
+            matches = list(STARTXREF.finditer(tail))
+            if not matches:
+                return None
+            offset = int(matches[-1].group(1))
+            if offset >= size:
+                return None
+
+            file.seek(offset)
+            xref = file.read(XREF_WINDOW)
+
+        if xref.startswith(b'xref'):
+            # A classic trailer sits between the table and startxref
+            start = tail.rfind(b'trailer', 0, matches[-1].start())
+            if start < 0:
+                return None
+            trailer = tail[start:matches[-1].start()]
+        elif OBJECT_HEADER.match(xref) and b'/XRef' in xref:
+            # A cross-reference stream carries the trailer keys in its dictionary
+            end = xref.find(b'stream')
+            if end < 0:
+                return None
+            trailer = xref[:end]
+        else:
+            return None
+
+        if ENCRYPT_KEY.search(trailer):
+            return False, "PDF is encrypted"
+        if b'/Root' not in trailer:
+            return None
+        return True, "PDF is valid"
+
+    @staticmethod
+    def full_check(file_path: str) -> ValidationResult:
+        """Validate by parsing the document and loading its first page"""
+        with open(file_path, 'rb') as file:
+            # Check if file starts with PDF signature
+            if not file.read(4) == b'%PDF':
+                return False, "Not a valid PDF file"
+
+        reader = PdfReader(file_path)
+
+        # Check for encryption
+        if reader.is_encrypted:
+            return False, "PDF is encrypted"
+
+        # Try to access pages to check for corruption
+        try:
+            num_pages = len(reader.pages)
+            _ = reader.pages[0]  # Try to access first page
+        except Exception:
+            return False, "PDF appears to be corrupted"
+
+        return True, "PDF is valid"
+
+    def validate_pdf(self, file_path: str) -> ValidationResult:
+        try:
+            path = os.path.abspath(file_path)
+            st = os.stat(path)
+            if self.cache:
+                cached = self.cache.get(path, st)
+                if cached:
+                    return cached
+
+            result = self.quick_check(path)
+            if result is None:
+                result = self.full_check(path)
+
+            if self.cache:
+                self.cache.put(path, st, result)
+            return result
+        except Exception as e:
+            return False, f"Validation error: {str(e)}"
+
+    def validate_many(self, file_paths: Iterable[str]) -> Dict[str, ValidationResult]:
+        """
+        Validate files concurrently.
+
+        Returns:
+            {file path: (valid, message)} for every distinct input path
+        """
+        paths: List[str] = list(dict.fromkeys(file_paths))
+        if len(paths) <= 1:
+            return {path: self.validate_pdf(path) for path in paths}
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(paths))) as executor:
+            return dict(zip(paths, executor.map(self.validate_pdf, paths)))
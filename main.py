@@ -6,27 +6,39 @@ from PyQt6.QtWidgets import (QApplication, QMainWindow, QMenuBar, QMenu, QVBoxLa
                             QWidget, QTabWidget, QListWidget, QListWidgetItem, QMessageBox,
                             QLineEdit, QLabel, QScrollArea, QGridLayout, QPushButton,
                             QDialogButtonBox, QStatusBar, QProgressBar, QDialog, QColorDialog,
-                            QHBoxLayout, QCheckBox, QInputDialog)
+                            QHBoxLayout, QCheckBox, QInputDialog, QFileDialog)
 from PyQt6.QtGui import QColor, QPixmap, QPainter
-from PyQt6.QtCore import Qt, QMimeData, QPoint
+from PyQt6.QtCore import Qt, QMimeData, QPoint, QRect, QTimer
 from PyQt6.QtGui import QPixmap, QMouseEvent, QPainter
 from PyPDF2.constants import UserAccessPermissions
 from PyQt6.QtPrintSupport import QPrintDialog, QPrinter
 from PyQt6.QtPdf import QPdfDocument
 
 import fitz  # PyMuPDF
-import tempfile
 
 from password_dialog import PasswordDialog
 from permissions_dialog import PermissionsDialog
-from ocrsettingsdialog import OCRSettingsDialog
+from ocrsettingsdialog import OCRSettingsDialog, SINK_OUTPUTS
 from draggablethumbnail import DraggableThumbnail
 from pdfpreviewdialog import PDFPreviewDialog
+from searchdialog import SearchDialog
 
 from operations.security import Security
 from operations.compression import PDFCompressor
 from operations.redaction import Redaction
+from utils.utils import validate_page_range
 from operations.pdf_operations import PDFOperations
+from search.index import BackgroundIndexer, SearchIndex
+from ui.thumbnails import ThumbnailLoader
+from ui.thumbnail_store import ThumbnailStore
+
+# Thumbnail tiles created per pass of the event loop, so a large drop does not freeze the window
+TILE_BATCH = 50
+
+def tile_caption(pdf_path, page_range=None):
+    """Caption of a tile: the file name, and its pages when only some are combined"""
+    name = os.path.basename(pdf_path)
+    return f"{name}\n(pages {page_range})" if page_range else name
 
 class PDFCombiner(QMainWindow):
     def __init__(self):
@@ -35,7 +47,25 @@ class PDFCombiner(QMainWindow):
         # Initialize undo stack
         self.undo_stack = []
         self.current_state = []
-        
+
+        # Full-text index of opened files, kept up to date in the background
+        self.search_index = SearchIndex()
+        self.search_indexer = BackgroundIndexer(
+            self.search_index, on_error=lambda path, e: logging.warning(f"Could not index {path}: {e}"))
+        
+        # Thumbnails render in the background; tiles show a placeholder until theirs arrives.
+        # Rendered pages are kept on disk, so reopened files and previews are not rendered again
+        self.thumbnail_store = ThumbnailStore()
+        self.thumbnail_loader = ThumbnailLoader(self, store=self.thumbnail_store)
+        self.thumbnail_loader.loaded.connect(self.show_thumbnail)
+        self.thumbnail_loader.failed.connect(self.thumbnail_failed)
+        self.pending_files = []
+        self.tile_timer = QTimer(self)
+        self.tile_timer.timeout.connect(self.add_pending_tiles)
+        self.priority_timer = QTimer(self)
+        self.priority_timer.setSingleShot(True)
+        self.priority_timer.timeout.connect(self.prioritize_visible_thumbnails)
+
         # Set up status bar
         self.setup_status_bar()
         
@@ -59,8 +89,7 @@ class PDFCombiner(QMainWindow):
         )
         if files:
             self.push_to_undo_stack('open_files', {'files': files})
-            for file_path in files:
-                self.generate_thumbnail(file_path)
+            self.add_files(files)
 
     def save_files(self):
         """Handle save files action"""
@@ -85,24 +114,23 @@ class PDFCombiner(QMainWindow):
                     return
                 
                 # Combine PDFs
-                pdf_ops.combine_pdfs(pdf_paths, file, None)
+                pdf_ops.combine_pdfs(pdf_paths, file, None, page_ranges=self.get_page_ranges())
                 QMessageBox.information(self, "Success", "PDFs combined successfully!")
             except Exception as e:
                 QMessageBox.critical(self, "Error", f"Could not save PDF: {str(e)}")
 
     def save_state(self):
-        """Save current state of PDF files"""
-        self.current_state = [widget.pdf_path for i in range(self.thumbnail_layout.count())
-                            if hasattr(widget := self.thumbnail_layout.itemAt(i).widget(), 'pdf_path')]
+        """Save current state of PDF files, with the files still being added"""
+        self.current_state = self.file_list() + self.pending_files
         
     def push_to_undo_stack(self, action_type: str, data: dict):
-        """Push an action to the undo stack"""
+        """Push an action to the undo stack, before it changes the files"""
+        self.save_state()
         self.undo_stack.append({
             'type': action_type,
             'data': data,
             'previous_state': self.current_state.copy()
         })
-        self.save_state()
 
     def undo_action(self):
         """Handle undo action"""
@@ -113,16 +141,8 @@ class PDFCombiner(QMainWindow):
         # Get last action
         last_action = self.undo_stack.pop()
         
-        # Clear current thumbnails
-        while self.thumbnail_layout.count():
-            item = self.thumbnail_layout.takeAt(0)
-            widget = item.widget()
-            if widget:
-                widget.deleteLater()
-        
         # Restore previous state
-        for pdf_path in last_action['previous_state']:
-            self.generate_thumbnail(pdf_path)
+        self.restore_files(last_action['previous_state'])
         
         # No confirmation message needed
         pass
@@ -173,6 +193,7 @@ class PDFCombiner(QMainWindow):
     def perform_ocr(self):
         """Handle OCR operation"""
         from ocr.ocr_processor import OCRProcessor
+        from ocr.page_cache import default_page_cache_dir
         from PyQt6.QtWidgets import QInputDialog
         
         # Get selected files from thumbnails
@@ -197,19 +218,37 @@ class PDFCombiner(QMainWindow):
         processor.ocr_psm = dialog.psm_combo.currentIndex()
         processor.ocr_deskew = dialog.deskew_check.isChecked()
         processor.ocr_clean = dialog.clean_check.isChecked()
+        processor.ocr_hybrid = dialog.hybrid_check.isChecked()
+        processor.ocr_adaptive = dialog.adaptive_check.isChecked()
         processor.ocr_contrast = dialog.contrast_spin.value()
         processor.ocr_brightness = dialog.brightness_spin.value()
         processor.ocr_threshold = dialog.threshold_spin.value()
+        processor.ocr_cache_dir = default_page_cache_dir()
+        processor.search_index = self.search_index
         
+        output_option = dialog.output_combo.currentText()
         for pdf_path in pdf_paths:
             try:
+                if output_option in SINK_OUTPUTS:
+                    processor.write_output(pdf_path, output_format=SINK_OUTPUTS[output_option])
+                    continue
                 ocr_text = processor.perform_ocr(pdf_path)
                 if ocr_text:
-                    output_option = dialog.output_combo.currentText()
                     processor.handle_ocr_output(ocr_text, pdf_path, output_option)
             except Exception as e:
                 QMessageBox.critical(self, "OCR Error", f"Could not perform OCR on {pdf_path}: {str(e)}")
 
+    def search_documents(self):
+        """Search the text of the open files"""
+        pdf_paths = [widget.pdf_path for i in range(self.thumbnail_layout.count())
+                    if hasattr(widget := self.thumbnail_layout.itemAt(i).widget(), 'pdf_path')]
+
+        # Files edited since they were indexed are picked up again
+        self.search_indexer.enqueue(pdf_paths)
+        dialog = SearchDialog(self.search_index, self.search_indexer, pdf_paths, self,
+                              store=self.thumbnail_store)
+        dialog.exec()
+
     def edit_metadata(self):
         """Handle metadata editing"""
         from operations.metadata import Metadata
@@ -499,9 +538,14 @@ class PDFCombiner(QMainWindow):
         undo_action = edit_menu.addAction("Undo")
         redo_action = edit_menu.addAction("Redo")
         
+        edit_menu.addSeparator()
+        search_action = edit_menu.addAction("Search...")
+        search_action.setShortcut("Ctrl+F")
+
         # Connect actions
         undo_action.triggered.connect(self.undo_action)
         redo_action.triggered.connect(self.redo_action)
+        search_action.triggered.connect(self.search_documents)
         
         # Operations menu
         operations_menu = menu_bar.addMenu("Operations")
@@ -544,6 +588,8 @@ class PDFCombiner(QMainWindow):
         self.thumbnail_layout.setSpacing(20)  # Add spacing between thumbnails
         self.thumbnail_layout.setContentsMargins(20, 20, 20, 20)  # Add margins
         self.thumbnail_scroll.setWidget(self.thumbnail_container)
+        self.thumbnail_scroll.verticalScrollBar().valueChanged.connect(
+            lambda: self.priority_timer.start(50))
         
         main_layout.addWidget(self.thumbnail_scroll)
         
@@ -571,11 +617,8 @@ class PDFCombiner(QMainWindow):
             event.accept()
             
             # Get the list of dropped files
-            for url in event.mimeData().urls():
-                file_path = url.toLocalFile()
-                if file_path.lower().endswith('.pdf'):
-                    # Generate and display thumbnail
-                    self.generate_thumbnail(file_path)
+            files = [url.toLocalFile() for url in event.mimeData().urls()]
+            self.add_files([file_path for file_path in files if file_path.lower().endswith('.pdf')])
         else:
             event.ignore()
             
@@ -591,21 +634,69 @@ class PDFCombiner(QMainWindow):
         # For now, just store the order
         self.pdf_order = pdf_paths
 
-    def generate_thumbnail(self, pdf_path):
-        """Generate and display a thumbnail for the PDF"""
+    def file_list(self):
+        """Get (path, page range) of each tile in order, None meaning every page"""
+        return [(widget.pdf_path, widget.page_range) for i in range(self.thumbnail_layout.count())
+                if hasattr(widget := self.thumbnail_layout.itemAt(i).widget(), 'pdf_path')]
+
+    def add_files(self, pdf_paths, page_ranges=None):
+        """Add tiles for PDFs a batch at a time, keeping the window responsive"""
+        self.pending_files.extend(zip(pdf_paths, page_ranges or [None] * len(pdf_paths)))
+        if self.pending_files and not self.tile_timer.isActive():
+            self.tile_timer.start(0)
+
+    def add_pending_tiles(self):
+        batch, self.pending_files = self.pending_files[:TILE_BATCH], self.pending_files[TILE_BATCH:]
+        for pdf_path, page_range in batch:
+            self.generate_thumbnail(pdf_path, page_range)
+        if self.pending_files:
+            self.update_status_label(f"Adding files ({len(self.pending_files)} left)")
+        else:
+            self.tile_timer.stop()
+            self.update_status_label("Ready")
+        self.priority_timer.start(0)
+
+    def visible_thumbnails(self):
+        """Get the tiles in the scrolled-to part of the view"""
+        viewport = self.thumbnail_scroll.viewport()
+        area = QRect(0, self.thumbnail_scroll.verticalScrollBar().value(), viewport.width(), viewport.height())
+        return [widget for i in range(self.thumbnail_layout.count())
+                if (widget := self.thumbnail_layout.itemAt(i).widget()) and widget.geometry().intersects(area)]
+
+    def prioritize_visible_thumbnails(self):
+        self.thumbnail_loader.prioritize(self.visible_thumbnails())
+
+    def show_thumbnail(self, container, pixmap):
+        """Fill a tile's placeholder with its rendered thumbnail"""
+        container.thumbnail_label.setPixmap(pixmap.scaled(180, 180, Qt.AspectRatioMode.KeepAspectRatio))
+
+    def thumbnail_failed(self, container, message):
+        """Drop the tile of a file that cannot be opened"""
+        self.show_status_message(f"Could not open {os.path.basename(container.pdf_path)}: {message}", 5000)
+        self.thumbnail_layout.removeWidget(container)
+        container.deleteLater()
+        self.update_pdf_order()
+
+    def clear_thumbnails(self):
+        """Remove every tile and drop the renders still waiting for them"""
+        self.pending_files = []
+        self.tile_timer.stop()
+        self.thumbnail_loader.cancel_all()
+        while self.thumbnail_layout.count():
+            item = self.thumbnail_layout.takeAt(0)
+            widget = item.widget()
+            if widget:
+                widget.deleteLater()
+
+    def restore_files(self, files):
+        """Replace the tiles with (path, page range) entries as from file_list()"""
+        files = list(files)
+        self.clear_thumbnails()
+        self.add_files([pdf_path for pdf_path, _ in files], [page_range for _, page_range in files])
+
+    def generate_thumbnail(self, pdf_path, page_range=None):
+        """Add a tile for the PDF and queue its thumbnail"""
         try:
-            # Open the PDF and get the first page
-            doc = fitz.open(pdf_path)
-            page = doc.load_page(0)
-            
-            # Render the page to an image
-            pix = page.get_pixmap(matrix=fitz.Matrix(0.2, 0.2))
-            
-            # Save to a temporary file
-            with tempfile.NamedTemporaryFile(suffix='.png', delete=False) as tmp:
-                pix.save(tmp.name)
-                thumbnail_path = tmp.name
-            
             # Create draggable container widget for thumbnail and filename
             container = DraggableThumbnail(self)
             container_layout = QVBoxLayout()
@@ -621,14 +712,13 @@ class PDFCombiner(QMainWindow):
             container_layout.setSpacing(5)
             container_layout.setContentsMargins(5, 5, 5, 5)
             
-            # Create QLabel with the thumbnail
-            label = QLabel()
-            pixmap = QPixmap(thumbnail_path)
-            label.setPixmap(pixmap.scaled(180, 180, Qt.AspectRatioMode.KeepAspectRatio))
+            # Create QLabel for the thumbnail, a placeholder until it is rendered
+            label = QLabel("Loading...")
+            label.setMinimumSize(180, 180)
             label.setAlignment(Qt.AlignmentFlag.AlignCenter)
             
             # Add filename label with word wrap
-            filename = QLabel(os.path.basename(pdf_path))
+            filename = QLabel(tile_caption(pdf_path, page_range))
             filename.setAlignment(Qt.AlignmentFlag.AlignCenter)
             filename.setWordWrap(True)
             filename.setMaximumWidth(200)
@@ -644,6 +734,8 @@ class PDFCombiner(QMainWindow):
             # Add widgets to container
             container_layout.addWidget(label)
             container_layout.addWidget(filename)
+            container.filename_label = filename
+            container.thumbnail_label = label
             
             # Add container to thumbnail layout in a 3-column grid
             item_count = self.thumbnail_layout.count()
@@ -654,8 +746,13 @@ class PDFCombiner(QMainWindow):
             # Adjust container size
             container.setFixedSize(220, 250)  # Fixed size for consistency
             
-            # Store PDF path in container
+            # Store PDF path and the pages to combine in container
             container.pdf_path = pdf_path
+            container.page_range = page_range
+            self.thumbnail_loader.request(container, pdf_path)
+
+            # Make the file searchable
+            self.search_indexer.enqueue([pdf_path])
             
         except Exception as e:
             print(f"Error generating thumbnail: {e}")
@@ -664,11 +761,45 @@ class PDFCombiner(QMainWindow):
         """Show context menu for removing items"""
         
         menu = QMenu(self)
+        page_range_action = menu.addAction("Set Page Range...")
         remove_action = menu.addAction("Remove")
         action = menu.exec(container.mapToGlobal(pos))
         
-        if action == remove_action:
+        if action == page_range_action:
+            self.set_page_range(container)
+        elif action == remove_action:
             self.remove_thumbnail(container)
+
+    def set_page_range(self, container):
+        """Choose which pages of a file go into the combined PDF"""
+        name = os.path.basename(container.pdf_path)
+        try:
+            with fitz.open(container.pdf_path) as doc:
+                total_pages = doc.page_count
+        except Exception as e:
+            QMessageBox.critical(self, "Error", f"Could not open {name}: {str(e)}")
+            return
+
+        text, ok = QInputDialog.getText(
+            self,
+            "Page Range",
+            f"Pages of {name} to combine (e.g. 1-3,5 or 10-last).\n"
+            f"Leave empty for all {total_pages} pages:",
+            text=container.page_range or ""
+        )
+        if not ok:
+            return
+        text = text.strip()
+        if text and validate_page_range(text, total_pages) is None:
+            return
+
+        self.push_to_undo_stack('set_page_range', {'file': container.pdf_path, 'page_range': text or None})
+        container.page_range = text or None
+        container.filename_label.setText(tile_caption(container.pdf_path, container.page_range))
+
+    def get_page_ranges(self):
+        """Get the page range set on each thumbnail in order, None meaning every page"""
+        return [page_range for _, page_range in self.file_list()]
             
     def remove_thumbnail(self, container):
         """Remove a thumbnail from the layout"""
@@ -676,6 +807,7 @@ class PDFCombiner(QMainWindow):
             self.push_to_undo_stack('remove_thumbnail', {'file': container.pdf_path})
             
         # Remove the widget from the layout
+        self.thumbnail_loader.cancel(container)
         self.thumbnail_layout.removeWidget(container)
         container.deleteLater()
         
@@ -684,7 +816,7 @@ class PDFCombiner(QMainWindow):
 
     def preview_pdf(self, pdf_path):
         # Create and show preview dialog
-        preview = PDFPreviewDialog(pdf_path, self)
+        preview = PDFPreviewDialog(pdf_path, self, store=self.thumbnail_store)
         preview.exec()
         
     def combine_pdfs(self):
@@ -703,11 +835,27 @@ class PDFCombiner(QMainWindow):
             self,
             "Save Combined PDF",
             "",
-            "PDF Files (*.pdf)"
+            "PDF Files (*.pdf)",
+            options=QFileDialog.Option.DontConfirmOverwrite
         )
         
         if not output_file:
             return
+
+        # An existing combined PDF can be extended in place instead of rewritten
+        append = False
+        if os.path.exists(output_file):
+            reply = QMessageBox.question(
+                self,
+                "File Exists",
+                f"{os.path.basename(output_file)} already exists.\n\n"
+                "Append the PDFs to the end of it? Choose No to replace it.",
+                QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No
+                | QMessageBox.StandardButton.Cancel
+            )
+            if reply == QMessageBox.StandardButton.Cancel:
+                return
+            append = reply == QMessageBox.StandardButton.Yes
             
         try:
             # Update status
@@ -722,10 +870,12 @@ class PDFCombiner(QMainWindow):
                 self.show_progress(current)
                 QApplication.processEvents()
                 
-            pdf_ops.combine_pdfs(pdf_paths, output_file, progress_callback)
+            pdf_ops.combine_pdfs(pdf_paths, output_file, progress_callback, append=append,
+                                 page_ranges=self.get_page_ranges())
             
             # Update status when done
-            self.show_status_message("PDFs combined successfully!", 3000)
+            self.show_status_message("PDFs appended successfully!" if append
+                                     else "PDFs combined successfully!", 3000)
             self.update_status_label("Ready")
             self.hide_progress()
             
@@ -772,17 +922,8 @@ class PDFCombiner(QMainWindow):
 
     def update_thumbnails(self):
         """Update all thumbnails based on current file list order"""
-        # Clear existing thumbnails
-        while self.thumbnail_layout.count():
-            item = self.thumbnail_layout.takeAt(0)
-            widget = item.widget()
-            if widget:
-                widget.deleteLater()
-                
-        # Regenerate thumbnails in current order
-        for i in range(self.file_list.count()):
-            file_path = self.file_list.item(i).text()
-            self.generate_thumbnail(file_path)
+        # Regenerate thumbnails in current order, keeping their page ranges
+        self.restore_files(self.file_list() + self.pending_files)
 
 def main():
     """Main application entry point"""
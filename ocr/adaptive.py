@@ -0,0 +1,76 @@
+"""Per-page OCR resolution from the size of the text, with re-runs for low-confidence pages"""
+from dataclasses import asdict, dataclass
+from typing import Dict, Optional
+
+import numpy as np
+
+from ocr.preprocess import preprocess
+from ocr.raster import render_page
+
+# Resolutions a page may be rendered at, lowest first
+DPI_TIERS = (150, 200, 300, 400, 600)
+# Resolution of the cheap render the text size is measured on
+PROBE_DPI = 100
+# x-height in pixels tesseract needs for full accuracy (10pt text at 300 dpi); larger only costs time
+TARGET_X_HEIGHT = 20
+# x-height as a fraction of a text line's ink height (ascenders to descenders)
+X_HEIGHT_RATIO = 0.55
+# Fraction of the page width a row needs in ink to count as part of a text line
+LINE_INK_FRACTION = 0.01
+# Text lines needed for a size estimate
+MIN_LINES = 3
+# Pages whose mean word confidence is below this are OCRed again at the next tier
+MIN_CONFIDENCE = 70.0
+
+@dataclass
+class TierStats:
+    """Work done at one DPI tier"""
+    pages: int = 0             # Pages first OCRed at this resolution
+    reruns: int = 0            # Low-confidence pages OCRed again at this resolution
+    render_seconds: float = 0.0
+    ocr_seconds: float = 0.0
+
+    def add(self, other: 'TierStats'):
+        self.pages += other.pages
+        self.reruns += other.reruns
+        self.render_seconds += other.render_seconds
+        self.ocr_seconds += other.ocr_seconds
+
+def estimate_x_height(dark: np.ndarray) -> Optional[float]:
+    """
+    Estimate the x-height of the text in a mask from its row projection profile.
+
+    Returns:
+        x-height in pixels of the mask, or None without enough text lines
+    """
+    inked = dark.sum(axis=1) > max(1, dark.shape[1] * LINE_INK_FRACTION)
+    edges = np.flatnonzero(np.diff(np.concatenate(([0], inked.astype(np.int8), [0]))))
+    heights = edges[1::2] - edges[::2]
+    heights = heights[heights > 1]
+    if len(heights) < MIN_LINES:
+        return None
+    return float(np.median(heights)) * X_HEIGHT_RATIO
+
+def choose_dpi(page, default: int) -> int:
+    """
+    Pick the lowest tier that brings the page's text up to TARGET_X_HEIGHT.
+
+    The text is measured on a PROBE_DPI render; pages without enough
+    lines to measure get default.
+    """
+    dark = np.asarray(preprocess(render_page(page, PROBE_DPI))) == 0
+    x_height = estimate_x_height(dark)
+    if not x_height:
+        return default
+    needed = PROBE_DPI * TARGET_X_HEIGHT / x_height
+    return next((dpi for dpi in DPI_TIERS if dpi >= needed), DPI_TIERS[-1])
+
+def next_tier(dpi: int) -> Optional[int]:
+    """The next resolution up from dpi, or None at the top"""
+    return next((tier for tier in DPI_TIERS if tier > dpi), None)
+
+def tier_report(tiers: Dict[int, TierStats]) -> Dict[str, dict]:
+    """Report per-tier work as a JSON-ready dict keyed by DPI"""
+    return {str(dpi): {key: round(value, 3) if isinstance(value, float) else value
+                       for key, value in asdict(stats).items()}
+            for dpi, stats in sorted(tiers.items())}
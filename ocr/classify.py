@@ -0,0 +1,93 @@
+"""Page classification for hybrid OCR: use the text layer where there is one, OCR the rest"""
+from dataclasses import dataclass
+from typing import Iterable, List, Optional
+
+import fitz
+
+from ocr.engine import PageData
+from ocr.raster import selected_pages
+
+# Page kinds
+PAGE_TEXT = 'text'    # Born-digital, or a scan that already has a text layer over it
+PAGE_IMAGE = 'image'  # No usable text layer
+PAGE_MIXED = 'mixed'  # Text layer plus images that may hold text it lacks
+PAGE_BLANK = 'blank'  # Nothing drawn that could hold text
+
+# Where a page's text came from
+SOURCE_NATIVE = 'native'
+SOURCE_OCR = 'ocr'
+
+# Pages with images and fewer extractable characters than this are treated as having no text layer
+MIN_TEXT_CHARS = 25
+# Images covering less than this fraction of a text page are ignored
+MIXED_COVERAGE = 0.25
+# When this fraction of a page's text lies over its images, they were already OCRed
+OCR_LAYER_FRACTION = 0.5
+
+@dataclass
+class PageClass:
+    index: int
+    kind: str
+    chars: int
+    image_coverage: float
+    text: str = ''
+
+    @property
+    def needs_ocr(self) -> bool:
+        return self.kind not in (PAGE_TEXT, PAGE_BLANK)
+
+@dataclass
+class PageText:
+    """The text of one page and where it came from"""
+    index: int
+    text: str
+    source: str
+    kind: str = PAGE_IMAGE
+    data: Optional[PageData] = None  # Word boxes, for OCRed pages when layout was asked for
+
+def _inside(x: float, y: float, rects: List['fitz.Rect']) -> bool:
+    return any(rect.x0 <= x <= rect.x1 and rect.y0 <= y <= rect.y1 for rect in rects)
+
+def classify_page(page: 'fitz.Page') -> PageClass:
+    """Classify a page from its text layer and the area its images cover"""
+    page_rect = page.rect
+    area = abs(page_rect) or 1.0
+    image_rects = [fitz.Rect(info['bbox']) & page_rect for info in page.get_image_info()]
+    image_rects = [rect for rect in image_rects if not rect.is_empty]
+    # Overlapping images are counted twice; the clamp keeps that from mattering for full-page scans
+    coverage = min(1.0, sum(abs(rect) for rect in image_rects) / area)
+
+    words = page.get_text('words')
+    chars = sum(len(word[4]) for word in words)
+    if chars < MIN_TEXT_CHARS:
+        if not image_rects:
+            # A page number or a heading alone is still a text layer
+            if chars:
+                return PageClass(page.number, PAGE_TEXT, chars, 0.0, page.get_text('text'))
+            # Vector drawings may be text converted to outlines
+            if not page.get_drawings():
+                return PageClass(page.number, PAGE_BLANK, 0, 0.0)
+        return PageClass(page.number, PAGE_IMAGE, chars, coverage)
+
+    text = page.get_text('text')
+    if coverage < MIXED_COVERAGE:
+        return PageClass(page.number, PAGE_TEXT, chars, coverage, text)
+
+    over_images = sum(len(word[4]) for word in words
+                      if _inside((word[0] + word[2]) / 2, (word[1] + word[3]) / 2, image_rects))
+    kind = PAGE_TEXT if over_images / chars >= OCR_LAYER_FRACTION else PAGE_MIXED
+    return PageClass(page.number, kind, chars, coverage, text)
+
+def classify_pages(pdf_path: str, pages: Optional[Iterable[int]] = None) -> List[PageClass]:
+    """
+    Classify pages of a PDF without rendering them.
+
+    Args:
+        pdf_path: PDF to classify
+        pages: 0-based page indices (default all)
+
+    Returns:
+        One PageClass per page, in the given order; text pages carry their text
+    """
+    with fitz.open(pdf_path) as doc:
+        return [classify_page(doc[index]) for index in selected_pages(doc.page_count, pages)]
@@ -0,0 +1,222 @@
+"""Tesseract engines: a persistent in-process API when tesserocr is installed, pytesseract otherwise"""
+from dataclasses import dataclass, field
+from importlib.util import find_spec
+from typing import Dict, List, NamedTuple, Optional, Tuple, Type
+import json
+import shlex
+import time
+
+# Output kinds every engine can produce for a page image
+OUTPUT_KINDS = ('text', 'pdf', 'data')
+
+class OCRWord(NamedTuple):
+    text: str
+    confidence: float  # 0-100
+    left: int
+    top: int
+    width: int
+    height: int
+    line: Tuple[int, int, int]  # Block, paragraph and line number, for grouping
+
+@dataclass
+class PageData:
+    """Recognized words of one page image, with their boxes in image pixels"""
+    words: List[OCRWord] = field(default_factory=list)
+    size: Tuple[int, int] = (0, 0)
+    seconds: float = 0.0
+
+    @property
+    def confidence(self) -> Optional[float]:
+        """Mean word confidence weighted by word length, or None with no words"""
+        chars = sum(len(word.text) for word in self.words)
+        if not chars:
+            return None
+        return sum(word.confidence * len(word.text) for word in self.words) / chars
+
+    @property
+    def text(self) -> str:
+        """Words joined into lines, with a blank line between paragraphs"""
+        lines: List[List[str]] = []
+        previous = None
+        for word in self.words:
+            if word.line != previous:
+                if previous is not None and word.line[:2] != previous[:2]:
+                    lines.append([])
+                lines.append([])
+                previous = word.line
+            lines[-1].append(word.text)
+        return '\n'.join(' '.join(line) for line in lines) + ('\n' if lines else '')
+
+    def to_json(self) -> str:
+        return json.dumps({'size': self.size, 'words': self.words})
+
+    @classmethod
+    def from_json(cls, text: str) -> 'PageData':
+        data = json.loads(text)
+        words = [OCRWord(*word[:6], tuple(word[6])) for word in data['words']]
+        return cls(words, tuple(data['size']))
+
+def parse_config(config: str) -> Tuple[Optional[int], Optional[int], Dict[str, str]]:
+    """
+    Split a tesseract command line config into (psm, oem, variables).
+
+    Options other than --psm, --oem and -c name=value are dropped; they
+    only mean something to the tesseract executable.
+    """
+    psm = oem = None
+    variables = {}
+    args = shlex.split(config or '')
+    idx = 0
+    while idx < len(args):
+        arg = args[idx]
+        value = args[idx + 1] if idx + 1 < len(args) else None
+        if arg == '--psm' and value is not None:
+            psm = int(value)
+            idx += 1
+        elif arg == '--oem' and value is not None:
+            oem = int(value)
+            idx += 1
+        elif arg == '-c' and value is not None and '=' in value:
+            name, _, setting = value.partition('=')
+            variables[name] = setting
+            idx += 1
+        idx += 1
+    return psm, oem, variables
+
+class OCREngine:
+    """
+    Recognizes page images.
+
+    An engine is created once per worker and reused for every page it is
+    given. Only TesserocrEngine keeps tesseract loaded between pages;
+    PytesseractEngine still starts the tesseract executable for each one.
+    """
+    name = ''
+
+    def __init__(self, language: str = 'eng', config: str = ''):
+        self.language = language
+        self.config = config
+
+    @staticmethod
+    def available() -> bool:
+        return True
+
+    def recognize(self, image, kind: str = 'text'):
+        """Get the OCR result of a PIL image as one of OUTPUT_KINDS"""
+        if kind not in OUTPUT_KINDS:
+            raise ValueError(f"Unknown OCR output kind: {kind}")
+        return getattr(self, kind)(image)
+
+    def text(self, image) -> str:
+        raise NotImplementedError
+
+    def data(self, image) -> PageData:
+        raise NotImplementedError
+
+    def pdf(self, image) -> bytes:
+        """A single-page PDF of the image with an invisible text layer"""
+        import pytesseract
+        return pytesseract.image_to_pdf_or_hocr(image, lang=self.language, config=self.config,
+                                                extension='pdf')
+
+    def close(self):
+        pass
+
+class PytesseractEngine(OCREngine):
+    """Runs the tesseract executable once per page"""
+    name = 'pytesseract'
+
+    @staticmethod
+    def available() -> bool:
+        return find_spec('pytesseract') is not None
+
+    def text(self, image) -> str:
+        import pytesseract
+        return pytesseract.image_to_string(image, lang=self.language, config=self.config)
+
+    def data(self, image) -> PageData:
+        import pytesseract
+        started = time.perf_counter()
+        data = pytesseract.image_to_data(image, lang=self.language, config=self.config,
+                                         output_type=pytesseract.Output.DICT)
+        words = [
+            OCRWord(text.strip(), float(conf), left, top, width, height, (block, par, line))
+            for text, conf, left, top, width, height, block, par, line in zip(
+                data['text'], data['conf'], data['left'], data['top'], data['width'],
+                data['height'], data['block_num'], data['par_num'], data['line_num'])
+            if text.strip() and float(conf) >= 0
+        ]
+        return PageData(words, image.size, time.perf_counter() - started)
+
+class TesserocrEngine(OCREngine):
+    """Keeps one tesseract API loaded in this process, so pages cost no process spawn or model load"""
+    name = 'tesserocr'
+
+    def __init__(self, language: str = 'eng', config: str = ''):
+        super().__init__(language, config)
+        import tesserocr
+        psm, oem, variables = parse_config(config)
+        kwargs = {'lang': language}
+        if psm is not None:
+            kwargs['psm'] = psm
+        if oem is not None:
+            kwargs['oem'] = oem
+        self.api = tesserocr.PyTessBaseAPI(**kwargs)
+        for name, value in variables.items():
+            self.api.SetVariable(name, value)
+
+    @staticmethod
+    def available() -> bool:
+        return find_spec('tesserocr') is not None
+
+    def text(self, image) -> str:
+        self.api.SetImage(image)
+        return self.api.GetUTF8Text()
+
+    def data(self, image) -> PageData:
+        from tesserocr import RIL, iterate_level
+        started = time.perf_counter()
+        self.api.SetImage(image)
+        self.api.Recognize()
+        words = []
+        block = par = line = 0
+        for item in iterate_level(self.api.GetIterator(), RIL.WORD):
+            block += item.IsAtBeginningOf(RIL.BLOCK)
+            par += item.IsAtBeginningOf(RIL.PARA)
+            line += item.IsAtBeginningOf(RIL.TEXTLINE)
+            text = (item.GetUTF8Text(RIL.WORD) or '').strip()
+            box = item.BoundingBox(RIL.WORD)
+            if text and box:
+                left, top, right, bottom = box
+                words.append(OCRWord(text, item.Confidence(RIL.WORD), left, top,
+                                     right - left, bottom - top, (block, par, line)))
+        return PageData(words, image.size, time.perf_counter() - started)
+
+    def close(self):
+        self.api.End()
+
+# In order of preference
+OCR_ENGINES: Dict[str, Type[OCREngine]] = {
+    'tesserocr': TesserocrEngine,
+    'pytesseract': PytesseractEngine,
+}
+
+def preferred_engine() -> str:
+    """Name of the first installed engine in OCR_ENGINES"""
+    return next((key for key, engine in OCR_ENGINES.items() if engine.available()), 'pytesseract')
+
+def create_engine(language: str = 'eng', config: str = '',
+                  name: Optional[str] = None) -> OCREngine:
+    """
+    Create the named engine, or the preferred available one.
+
+    Raises:
+        ValueError: If the engine is unknown or not installed
+    """
+    name = name or preferred_engine()
+    engine = OCR_ENGINES.get(name)
+    if engine is None:
+        raise ValueError(f"Unknown OCR engine: {name}")
+    if not engine.available():
+        raise ValueError(f"OCR engine not installed: {name}")
+    return engine(language, config)
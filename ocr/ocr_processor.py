@@ -1,7 +1,17 @@
+from functools import partial
 import os
 import pytesseract
-from pdf2image import convert_from_path
-from PyQt6.QtWidgets import QMessageBox, QApplication
+
+from ocr.adaptive import MIN_CONFIDENCE, TierStats, choose_dpi, next_tier
+from ocr.classify import PAGE_IMAGE, SOURCE_NATIVE, SOURCE_OCR, PageClass, PageText, classify_pages
+from ocr.engine import PageData
+from ocr.page_cache import PageCache, page_cache_for, page_digests
+from ocr.pipeline import OCRPipeline, PipelineMetrics
+from ocr.pool import OCRPool
+from ocr.preprocess import PREPROCESS_VERSION, preprocess
+from ocr.raster import page_count, render_pages, selected_pages
+from ocr.sinks import SINKS, create_sink, page_header
+from utils.utils import process_events
 
 class OCRProcessor:
     def __init__(self, parent_window=None):
@@ -18,6 +28,14 @@ class OCRProcessor:
         self.ocr_contrast = 1.0    # Contrast adjustment
         self.ocr_brightness = 1.0  # Brightness adjustment
         self.ocr_threshold = 0     # Binarization threshold (0=auto)
+        self.ocr_workers = None    # Pages recognized in parallel (None=one per CPU)
+        self.ocr_engine = None     # ocr.engine.OCR_ENGINES name (None=best available)
+        self.ocr_hybrid = True     # Use existing text layers, OCR only pages without one
+        self.ocr_cache_dir = None  # Per-page OCR cache directory (None=no cache)
+        self.ocr_adaptive = False  # Pick each page's DPI from its text size, re-OCR unsure pages
+        self.dpi_tiers = {}        # DPI -> adaptive.TierStats of the last adaptive run
+        self.pipeline_metrics = PipelineMetrics()  # Stage throughput of the last run
+        self.search_index = None   # search.index.SearchIndex to add OCRed page text to
 
     def perform_ocr(self, pdf_path):
         try:
@@ -27,39 +45,26 @@ class OCRProcessor:
             if not pdf_path.lower().endswith('.pdf'):
                 raise ValueError("File must be a PDF")
 
-            pages = convert_from_path(pdf_path, dpi=self.get_ocr_dpi())
-            total_pages = len(pages)
-
-            if self.ocr_page_range:
-                pages = [pages[i] for i in self.ocr_page_range if i < total_pages]
-                total_pages = len(pages)
-
-            ocr_text = ""
-            for i, page in enumerate(pages):
+            total_pages = len(self.get_page_indices(pdf_path))
+            texts = []
+            native = 0
+            for i, page in enumerate(self.recognize_pages(pdf_path)):
                 if self.parent_window:
                     self.parent_window.show_progress(i + 1, total_pages)
                     self.parent_window.update_status_label(f"Processing page {i+1}/{total_pages}")
-                    QApplication.processEvents()
-
-                # Preprocess image
-                page = self.preprocess_image(page)
-                
-                # Get OCR config
-                config = self.get_ocr_config()
-                
-                # Perform OCR
-                text = pytesseract.image_to_string(
-                    page, 
-                    lang=self.ocr_language, 
-                    config=config
-                )
-                ocr_text += f"--- Page {i+1} ---\n{text}\n\n"
+                    process_events()
+                native += page.source == SOURCE_NATIVE
+                texts.append(f"{page_header(page)}{page.text}\n\n")
+            ocr_text = ''.join(texts)
 
             if not ocr_text.strip():
                 raise ValueError("OCR produced no text - check input file and settings")
                 
             if self.parent_window:
-                self.parent_window.show_status_message("OCR completed successfully", 3000)
+                message = "OCR completed successfully"
+                if native:
+                    message += f" ({native} of {total_pages} pages read from their text layer)"
+                self.parent_window.show_status_message(message, 3000)
                 self.parent_window.hide_progress()
                 
             return ocr_text
@@ -74,6 +79,178 @@ class OCRProcessor:
                 self.parent_window.hide_progress()
             return ""
 
+    def save_searchable_pdf(self, pdf_path, output_path=None, is_cancelled=None):
+        """
+        Write a copy of the PDF with an invisible OCR text layer over its scanned pages.
+
+        The original pages are kept, so the copy stays close to the input
+        size; pages that already have a text layer are left alone.
+
+        Returns:
+            The output path
+        """
+        return self.write_output(pdf_path, output_path, 'pdf', is_cancelled)
+
+    def write_output(self, pdf_path, output_path=None, output_format='text', is_cancelled=None):
+        """
+        Stream page results into an ocr.sinks output as they complete.
+
+        A checkpoint beside the output lets a rerun with the same source
+        and settings resume at the first missing page. On cancellation or
+        error the pages done so far are flushed and the checkpoint kept.
+
+        Args:
+            pdf_path: PDF to OCR
+            output_path: Output file (default <name>_ocr.<extension> beside the PDF)
+            output_format: Key of ocr.sinks.SINKS
+            is_cancelled: Polled between pages (default the parent window's is_cancelled, if any)
+
+        Returns:
+            The output path, or None if cancelled before the last page
+        """
+        if not os.path.exists(pdf_path):
+            raise ValueError("PDF file does not exist")
+        if output_format not in SINKS:
+            raise ValueError(f"Unknown OCR output format: {output_format}")
+        output_path = output_path or f"{os.path.splitext(pdf_path)[0]}_ocr.{SINKS[output_format].extension}"
+        is_cancelled = is_cancelled or getattr(self.parent_window, 'is_cancelled', None)
+        sink = create_sink(output_format, output_path, pdf_path, self.get_cache_settings())
+        done = sink.open()
+        total_pages = len(self.get_page_indices(pdf_path))
+        ocred = 0
+        complete = False
+        try:
+            for i, page in enumerate(self.recognize_pages(pdf_path, layout=sink.layout, skip=done),
+                                     len(done) + 1):
+                if is_cancelled and is_cancelled():
+                    break
+                sink.write(page)
+                ocred += page.source == SOURCE_OCR
+                if self.parent_window:
+                    self.parent_window.show_progress(i, total_pages)
+                    self.parent_window.update_status_label(f"Processing page {i}/{total_pages}")
+                    process_events()
+            else:
+                complete = True
+        finally:
+            sink.close(complete)
+            if self.parent_window:
+                self.parent_window.hide_progress()
+        if self.parent_window:
+            resumed = f", resumed after {len(done)}" if done else ""
+            state = "saved to" if complete else "cancelled; partial output kept in"
+            self.parent_window.show_status_message(
+                f"OCR output {state} {output_path} ({ocred} of {total_pages} pages OCRed{resumed})", 5000)
+        return output_path if complete else None
+
+    def get_page_indices(self, pdf_path):
+        """Get the 0-based indices of the pages to process"""
+        return selected_pages(page_count(pdf_path), self.ocr_page_range or None)
+
+    def recognize_pages(self, pdf_path, layout=False, skip=()):
+        """
+        Get the text of each selected page, in order.
+
+        With ocr_hybrid, pages that already have a text layer are read
+        directly; only the rest are rendered and sent to the OCR pool.
+        With ocr_adaptive, each page is rendered at the lowest DPI tier its
+        text size allows, and pages recognized with low confidence are
+        OCRed again a tier up; the work per tier ends up in dpi_tiers.
+        With layout, OCRed pages also carry their word boxes; pages are
+        then not deskewed, so the boxes line up with the original page.
+        Pages are rendered, preprocessed and recognized by an OCRPipeline,
+        whose per-stage metrics end up in pipeline_metrics. Pages in skip,
+        already done by a resumed run, are left out. OCRed pages are added
+        to search_index when one is set.
+
+        Yields:
+            PageText for each page
+        """
+        indices = [index for index in self.get_page_indices(pdf_path) if index not in skip]
+        if self.ocr_hybrid:
+            pages = classify_pages(pdf_path, indices)
+        else:
+            pages = [PageClass(index, PAGE_IMAGE, 0, 0.0) for index in indices]
+        ocr_indices = [page.index for page in pages if page.needs_ocr]
+
+        # Pages OCRed before with the same settings, wherever they were, come from the cache
+        cache = page_cache_for(self.ocr_cache_dir)
+        keys, cached = {}, {}
+        if cache and ocr_indices:
+            # Layout entries hold PageData JSON rather than text
+            settings = dict(self.get_page_cache_settings(), layout=layout)
+            keys = {index: PageCache.make_key(digest, settings)
+                    for index, digest in page_digests(pdf_path, ocr_indices).items()}
+            cached = {index: text for index, text in
+                      ((index, cache.get(key)) for index, key in keys.items()) if text is not None}
+            ocr_indices = [index for index in ocr_indices if index not in cached]
+
+        pool = None
+        if ocr_indices:
+            workers = min(self.ocr_workers or os.cpu_count() or 1, len(ocr_indices))
+            pool = OCRPool(workers, self.ocr_language, self.get_ocr_config(), self.ocr_engine)
+        self.dpi_tiers = {}
+        self.pipeline_metrics = PipelineMetrics()
+        dpi = partial(choose_dpi, default=self.get_ocr_dpi()) if self.ocr_adaptive else self.get_ocr_dpi()
+
+        ocred = []
+        try:
+            kind = 'data' if self.ocr_adaptive or layout else 'text'
+            results = None
+            if pool:
+                pipeline = OCRPipeline(pool, kind, self.get_preprocess_settings(layout))
+                self.pipeline_metrics = pipeline.metrics
+                results = pipeline.run(pdf_path, ocr_indices, dpi)
+            for page in pages:
+                if page.index in cached:
+                    data = PageData.from_json(cached[page.index]) if layout else None
+                    text = data.text if layout else cached[page.index]
+                    ocred.append(PageText(page.index, text, SOURCE_OCR, page.kind, data))
+                    yield ocred[-1]
+                elif page.needs_ocr:
+                    _, result, info = next(results)
+                    if self.ocr_adaptive:
+                        result = self._rerun_unsure(pool, pdf_path, page.index, info, result, layout)
+                    data = result if layout else None
+                    text = result.text if kind == 'data' else result
+                    if cache:
+                        cache.put(keys[page.index], data.to_json() if layout else text)
+                    ocred.append(PageText(page.index, text, SOURCE_OCR, page.kind, data))
+                    yield ocred[-1]
+                else:
+                    yield PageText(page.index, page.text, SOURCE_NATIVE, page.kind)
+        finally:
+            if results:
+                # Stops the renderer and frees the pages still in flight
+                results.close()
+            if pool:
+                pool.close()
+            if self.search_index and ocred:
+                self.search_index.add_pages(pdf_path, ocred)
+
+    def _rerun_unsure(self, pool, pdf_path, index, info, result, layout=False):
+        """Record an adaptive page and OCR it again at higher tiers while its confidence is low"""
+        dpi = info['dpi'][0]
+        stats = self.dpi_tiers.setdefault(dpi, TierStats())
+        stats.pages += 1
+        stats.render_seconds += info['render_seconds']
+        stats.ocr_seconds += result.seconds
+
+        best = result
+        while best.confidence is not None and best.confidence < MIN_CONFIDENCE:
+            dpi = next_tier(dpi)
+            if dpi is None:
+                break
+            _, image = next(render_pages(pdf_path, dpi, [index]))
+            rerun = next(pool.map([self.preprocess_image(image, layout)], 'data'))
+            stats = self.dpi_tiers.setdefault(dpi, TierStats())
+            stats.reruns += 1
+            stats.render_seconds += image.info['render_seconds']
+            stats.ocr_seconds += rerun.seconds
+            if rerun.confidence is not None and rerun.confidence > best.confidence:
+                best = rerun
+        return best
+
     def handle_ocr_output(self, ocr_text, pdf_path, output_option):
         """Handle OCR output based on selected option"""
         try:
@@ -87,6 +264,7 @@ class OCRProcessor:
                 self.parent_window.show_status_message(f"OCR text saved to {output_path}", 5000)
                 
             elif output_option == "Clipboard":
+                from PyQt6.QtWidgets import QApplication
                 clipboard = QApplication.clipboard()
                 clipboard.setText(ocr_text)
                 if self.parent_window:
@@ -129,12 +307,42 @@ class OCRProcessor:
         # Image processing options
         if self.ocr_threshold > 0:
             config.append(f'--threshold {self.ocr_threshold}')
-            
+
         return ' '.join(config)
 
+    def get_cache_settings(self):
+        """Get every parameter that affects the OCR text, for result cache keys"""
+        try:
+            engine = str(pytesseract.get_tesseract_version())
+        except Exception:
+            engine = None
+        return {
+            'language': self.ocr_language,
+            'dpi': self.get_ocr_dpi(),
+            'config': self.get_ocr_config(),
+            'page_range': list(self.ocr_page_range) if self.ocr_page_range else None,
+            'deskew': self.ocr_deskew,
+            'clean': self.ocr_clean,
+            'contrast': self.ocr_contrast,
+            'brightness': self.ocr_brightness,
+            'threshold': self.ocr_threshold,
+            'hybrid': self.ocr_hybrid,
+            'preprocess': PREPROCESS_VERSION,
+            'adaptive': self.ocr_adaptive,
+            'engine': engine,
+        }
+
+    def get_page_cache_settings(self):
+        """Get the parameters that affect the OCR text of a single page, for page cache keys"""
+        settings = self.get_cache_settings()
+        for key in ('page_range', 'hybrid'):
+            settings.pop(key)
+        settings['engine_name'] = self.ocr_engine
+        return settings
+
     def show_ocr_results(self, text):
         """Display OCR results in a scrollable window"""
-        from PyQt6.QtWidgets import QDialog, QVBoxLayout, QTextEdit, QPushButton
+        from PyQt6.QtWidgets import QApplication, QDialog, QVBoxLayout, QTextEdit, QPushButton
         
         class OCRResultsDialog(QDialog):
             def __init__(self, text, parent=None):
@@ -196,23 +404,16 @@ class OCRProcessor:
         with open(output_path, 'wb') as f:
             f.write(packet.getvalue())
 
-    def preprocess_image(self, image):
-        """Apply preprocessing to image before OCR"""
-        from PIL import ImageEnhance, ImageFilter
-        
-        # Adjust contrast
-        if self.ocr_contrast != 1.0:
-            enhancer = ImageEnhance.Contrast(image)
-            image = enhancer.enhance(self.ocr_contrast)
-            
-        # Adjust brightness
-        if self.ocr_brightness != 1.0:
-            enhancer = ImageEnhance.Brightness(image)
-            image = enhancer.enhance(self.ocr_brightness)
-            
-        # Apply threshold if specified
-        if self.ocr_threshold > 0:
-            image = image.convert('L').point(
-                lambda x: 0 if x < self.ocr_threshold else 255, '1')
-            
-        return image
+    def get_preprocess_settings(self, layout=False):
+        """Get the preprocess() arguments; with layout, keep the page geometry"""
+        return {
+            'contrast': self.ocr_contrast,
+            'brightness': self.ocr_brightness,
+            'threshold': self.ocr_threshold,
+            'deskew': self.ocr_deskew and not layout,
+            'clean': self.ocr_clean,
+        }
+
+    def preprocess_image(self, image, layout=False):
+        """Apply preprocessing to image before OCR; with layout, keep the page geometry"""
+        return preprocess(image, **self.get_preprocess_settings(layout))
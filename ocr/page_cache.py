@@ -0,0 +1,236 @@
+"""Per-page OCR result cache keyed by what the page draws"""
+from datetime import datetime
+from typing import Dict, List, Optional, Set, Tuple
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+
+from PyPDF2 import PdfReader
+from PyPDF2.generic import ArrayObject, DictionaryObject, IndirectObject, StreamObject
+
+# Bump when a change to rendering or recognition makes cached text invalid
+PAGE_CACHE_VERSION = 1
+
+DEFAULT_MAX_BYTES = 512 * 1024 ** 2
+
+# Page attributes that change the rendered image; PdfReader copies inherited ones onto each page
+PAGE_KEYS = ('/Resources', '/MediaBox', '/CropBox', '/Rotate')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS pages (
+    key TEXT PRIMARY KEY,
+    text TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    created TEXT NOT NULL,
+    last_access TEXT NOT NULL,
+    hits INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS stats (
+    name TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+"""
+
+def default_page_cache_dir() -> str:
+    return os.environ.get('PDFCOMBINER_OCR_CACHE_DIR',
+                          os.path.join(os.path.expanduser('~'), '.cache', 'pdfcombiner', 'ocr_pages'))
+
+class PageDigester:
+    """
+    Hashes pages of one document by content rather than by object number.
+
+    A page's digest covers its decompressed content streams and every
+    object reachable from its resources, with dictionary keys in sorted
+    order and references replaced by the digest of the object they point
+    to. The same page copied into another document, under different
+    object numbers, gets the same digest. Objects shared between pages
+    (fonts, images) are hashed once.
+    """
+    def __init__(self, reader: PdfReader):
+        self.reader = reader
+        self._objects: Dict[int, bytes] = {}
+
+    def _object_digest(self, ref: IndirectObject, pending: Set[int]) -> bytes:
+        if ref.idnum in self._objects:
+            return self._objects[ref.idnum]
+        if ref.idnum in pending:
+            # A reference cycle contributes only its position
+            return b'cycle'
+        pending.add(ref.idnum)
+        digest = hashlib.sha256(self._serialize(ref.get_object(), pending)).digest()
+        pending.discard(ref.idnum)
+        self._objects[ref.idnum] = digest
+        return digest
+
+    def _serialize(self, obj, pending: Set[int]) -> bytes:
+        if isinstance(obj, IndirectObject):
+            return self._object_digest(obj, pending).hex().encode('ascii')
+        if isinstance(obj, DictionaryObject):
+            # /Length only describes the stored bytes; /Parent leads back up the page tree
+            parts = [key.encode('latin-1') + b' ' + self._serialize(obj.raw_get(key), pending)
+                     for key in sorted(obj) if key not in ('/Parent', '/Length')]
+            body = b'<<' + b' '.join(parts) + b'>>'
+            if isinstance(obj, StreamObject):
+                body += hashlib.sha256(obj._data).digest()
+            return body
+        if isinstance(obj, ArrayObject):
+            return b'[' + b' '.join(self._serialize(value, pending) for value in obj) + b']'
+        return repr(obj).encode('utf-8')
+
+    def digest(self, page_index: int) -> str:
+        page = self.reader.pages[page_index]
+        contents = page.get('/Contents')
+        streams = contents if isinstance(contents, ArrayObject) else [contents] if contents else []
+        sha = hashlib.sha256()
+        for stream in streams:
+            sha.update(stream.get_object().get_data())
+        for key in PAGE_KEYS:
+            value = page.raw_get(key) if key in page else None
+            sha.update(key.encode('ascii') + b' ' + self._serialize(value, set()))
+        return sha.hexdigest()
+
+class PageCache:
+    """
+    OCR text of single pages, keyed by page content and OCR settings.
+
+    The key is the SHA-256 of a PageDigester digest and the settings
+    that affect recognition, so a page hits the cache wherever it ends up
+    after combining or splitting. The store is bounded by max_bytes of
+    text with least-recently-used eviction.
+    """
+    def __init__(self, cache_dir: Optional[str] = None, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.cache_dir = os.path.abspath(cache_dir or default_page_cache_dir())
+        self.max_bytes = max_bytes
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(os.path.join(self.cache_dir, 'pages.db'),
+                                     timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(SCHEMA)
+        self._conn.commit()
+
+    def _execute(self, sql: str, params: tuple = ()) -> List[tuple]:
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+            self._conn.commit()
+            return rows
+
+    def _count(self, name: str, amount: int = 1):
+        self._execute(
+            "INSERT INTO stats (name, value) VALUES (?, ?) "
+            "ON CONFLICT(name) DO UPDATE SET value = value + excluded.value",
+            (name, amount)
+        )
+
+    @staticmethod
+    def make_key(page_digest: str, settings: dict) -> str:
+        """
+        Build the cache key for one page.
+
+        Args:
+            page_digest: PageDigester.digest of the page
+            settings: OCR settings that influence the text
+        """
+        payload = {'version': PAGE_CACHE_VERSION, 'page': page_digest, 'settings': settings}
+        encoded = json.dumps(payload, sort_keys=True, default=str).encode('utf-8')
+        return hashlib.sha256(encoded).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        """Get the cached text for a key, or None on a miss"""
+        rows = self._execute("SELECT text FROM pages WHERE key = ?", (key,))
+        if rows:
+            self._execute("UPDATE pages SET last_access = ?, hits = hits + 1 WHERE key = ?",
+                          (datetime.now().isoformat(), key))
+            self._count('hits')
+            return rows[0][0]
+        self._count('misses')
+        return None
+
+    def put(self, key: str, text: str):
+        """Store the text of a page and enforce the size budget"""
+        now = datetime.now().isoformat()
+        self._execute(
+            "INSERT OR REPLACE INTO pages (key, text, size, created, last_access, hits) "
+            "VALUES (?, ?, ?, ?, ?, 0)",
+            (key, text, len(text.encode('utf-8')), now, now)
+        )
+        self._count('stores')
+        self.prune()
+
+    def prune(self, max_bytes: Optional[int] = None) -> Tuple[int, int]:
+        """
+        Evict least-recently-used pages until the store fits the budget.
+
+        Returns:
+            Tuple of (pages evicted, bytes freed)
+        """
+        budget = self.max_bytes if max_bytes is None else max_bytes
+        total = self._execute("SELECT COALESCE(SUM(size), 0) FROM pages")[0][0]
+        if total <= budget:
+            return 0, 0
+        evicted = freed = 0
+        for key, size in self._execute("SELECT key, size FROM pages ORDER BY last_access"):
+            if total <= budget:
+                break
+            self._execute("DELETE FROM pages WHERE key = ?", (key,))
+            total -= size
+            evicted += 1
+            freed += size
+        if evicted:
+            self._count('evictions', evicted)
+        return evicted, freed
+
+    def clear(self) -> int:
+        """Delete every page; returns the number removed"""
+        evicted, _ = self.prune(max_bytes=0)
+        return evicted
+
+    def stats(self) -> Dict[str, object]:
+        """Get hit/miss counters and the current store size"""
+        counters = dict(self._execute("SELECT name, value FROM stats"))
+        entries, size = self._execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM pages")[0]
+        hits = counters.get('hits', 0)
+        misses = counters.get('misses', 0)
+        return {
+            'cache_dir': self.cache_dir,
+            'entries': entries,
+            'size': size,
+            'max_bytes': self.max_bytes,
+            'hits': hits,
+            'misses': misses,
+            'hit_rate': round(hits / (hits + misses), 4) if hits + misses else 0.0,
+            'stores': counters.get('stores', 0),
+            'evictions': counters.get('evictions', 0),
+        }
+
+    def entries(self) -> List[dict]:
+        """List pages, most recently used first"""
+        rows = self._execute(
+            "SELECT key, size, created, last_access, hits FROM pages ORDER BY last_access DESC"
+        )
+        return [dict(zip(('key', 'size', 'created', 'last_access', 'hits'), row)) for row in rows]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+# One index connection per cache directory per process
+_caches: Dict[str, PageCache] = {}
+
+def page_cache_for(cache_dir: Optional[str]) -> Optional[PageCache]:
+    """Get the page cache for a directory in this process, or None if caching is off"""
+    if not cache_dir:
+        return None
+    cache_dir = os.path.abspath(cache_dir)
+    cache = _caches.get(cache_dir)
+    if cache is None:
+        cache = _caches[cache_dir] = PageCache(cache_dir)
+    return cache
+
+def page_digests(pdf_path: str, pages: List[int]) -> Dict[int, str]:
+    """Get the PageDigester digest of each of the given 0-based pages"""
+    with open(pdf_path, 'rb') as f:
+        digester = PageDigester(PdfReader(f))
+        return {index: digester.digest(index) for index in pages}
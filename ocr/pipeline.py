@@ -0,0 +1,291 @@
+"""Staged OCR pipeline: render, preprocess, recognize and assemble, with pages handed over in shared memory"""
+from collections import deque
+from dataclasses import dataclass, field
+from multiprocessing.shared_memory import SharedMemory
+from typing import Callable, Dict, Iterable, Iterator, Optional, Tuple, Union
+import queue
+import threading
+import time
+
+import fitz
+import numpy as np
+from PIL import Image
+
+from ocr.pool import OCRPool, _recognize
+from ocr.preprocess import preprocess
+from ocr.raster import render_pixmap, selected_pages
+
+# Rendered pages waiting for a worker; with the pool's own window this bounds the bitmaps alive
+RENDER_QUEUE_DEPTH = 4
+# How often blocked stages look for a stop request, in seconds
+POLL_SECONDS = 0.1
+
+_DONE = object()
+
+@dataclass
+class StageStats:
+    """Work done by one pipeline stage"""
+    pages: int = 0
+    seconds: float = 0.0   # Time spent working, summed over workers
+    waiting: float = 0.0   # Time blocked on the stage before or after it
+
+    def add(self, other: 'StageStats'):
+        self.pages += other.pages
+        self.seconds += other.seconds
+        self.waiting += other.waiting
+
+    def to_dict(self) -> Dict[str, object]:
+        return {
+            'pages': self.pages,
+            'seconds': round(self.seconds, 3),
+            'waiting_seconds': round(self.waiting, 3),
+            'pages_per_second': round(self.pages / self.seconds, 2) if self.seconds else None,
+        }
+
+@dataclass
+class DepthStats:
+    """Depth of a queue between stages, sampled each time a page passes through it"""
+    samples: int = 0
+    total: int = 0
+    peak: int = 0
+
+    def sample(self, depth: int):
+        self.samples += 1
+        self.total += depth
+        self.peak = max(self.peak, depth)
+
+    def add(self, other: 'DepthStats'):
+        self.samples += other.samples
+        self.total += other.total
+        self.peak = max(self.peak, other.peak)
+
+    def to_dict(self) -> Dict[str, object]:
+        return {'mean': round(self.total / self.samples, 2) if self.samples else 0.0, 'peak': self.peak}
+
+@dataclass
+class PipelineMetrics:
+    """Per-stage throughput and queue depths of pipeline runs"""
+    workers: int = 1
+    seconds: float = 0.0
+    render: StageStats = field(default_factory=StageStats)
+    preprocess: StageStats = field(default_factory=StageStats)
+    recognize: StageStats = field(default_factory=StageStats)
+    assemble: StageStats = field(default_factory=StageStats)
+    render_queue: DepthStats = field(default_factory=DepthStats)  # Rendered pages not yet submitted
+    in_flight: DepthStats = field(default_factory=DepthStats)     # Submitted pages not yet assembled
+
+    STAGES = ('render', 'preprocess', 'recognize', 'assemble')
+
+    def add(self, other: 'PipelineMetrics'):
+        self.workers = max(self.workers, other.workers)
+        self.seconds += other.seconds
+        for name in self.STAGES + ('render_queue', 'in_flight'):
+            getattr(self, name).add(getattr(other, name))
+
+    @property
+    def bottleneck(self) -> Optional[str]:
+        """The stage with the most work per page, counting the workers sharing preprocess and recognize"""
+        def cost(name):
+            stats = getattr(self, name)
+            parallel = self.workers if name in ('preprocess', 'recognize') else 1
+            return stats.seconds / parallel
+        if not self.render.pages:
+            return None
+        return max(self.STAGES, key=cost)
+
+    def to_dict(self) -> Dict[str, object]:
+        report = {name: getattr(self, name).to_dict() for name in self.STAGES}
+        report.update(
+            workers=self.workers,
+            seconds=round(self.seconds, 3),
+            pages_per_second=round(self.assemble.pages / self.seconds, 2) if self.seconds else None,
+            bottleneck=self.bottleneck,
+            render_queue=self.render_queue.to_dict(),
+            in_flight=self.in_flight.to_dict(),
+        )
+        return report
+
+@dataclass
+class PageJob:
+    """A rendered page waiting in shared memory; only this is pickled to the worker"""
+    index: int
+    shm_name: str
+    shape: Tuple[int, int]
+
+def _process_page(job: PageJob, kind: str, settings: dict, engine=None) -> Tuple[object, float, float]:
+    """
+    Preprocess and recognize one page on a worker.
+
+    The page is read in place from shared memory through a NumPy view;
+    nothing from the view may outlive the block, so it is closed only
+    once the image built on it is gone.
+
+    Returns:
+        Tuple of (result, preprocess seconds, recognize seconds)
+    """
+    shm = SharedMemory(name=job.shm_name)
+    try:
+        pixels = np.ndarray(job.shape, dtype=np.uint8, buffer=shm.buf)
+        started = time.perf_counter()
+        page = Image.frombuffer('L', (job.shape[1], job.shape[0]), pixels, 'raw', 'L', 0, 1)
+        image = preprocess(page, **settings)
+        del page, pixels
+        prepared = time.perf_counter()
+        result = _recognize(image, kind, engine)
+        return result, prepared - started, time.perf_counter() - prepared
+    finally:
+        shm.close()
+
+def _release(shm: SharedMemory):
+    shm.close()
+    shm.unlink()
+
+class OCRPipeline:
+    """
+    Runs OCR as four stages connected by bounded queues.
+
+    - render: a thread renders each page and copies its pixels into a
+      shared memory block, then queues the page (RENDER_QUEUE_DEPTH)
+    - preprocess and recognize: pool workers attach to the block and work
+      on it in place, so the bitmap is never pickled
+    - assemble: the caller's thread takes results in page order and frees
+      each block
+
+    A full queue blocks the stage feeding it, so at most
+    RENDER_QUEUE_DEPTH + pool.queue_limit + 1 bitmaps exist at once
+    whatever the page count. The time each stage works and waits ends up
+    in metrics.
+    """
+    def __init__(self, pool: OCRPool, kind: str = 'text', settings: Optional[dict] = None):
+        """
+        Args:
+            pool: Pool to preprocess and recognize on
+            kind: OCREngine.recognize output kind
+            settings: preprocess() keyword arguments
+        """
+        self.pool = pool
+        self.kind = kind
+        self.settings = settings or {}
+        self.metrics = PipelineMetrics(workers=pool.workers)
+        self._stop = threading.Event()
+
+    def _put(self, pages: queue.Queue, item) -> bool:
+        while not self._stop.is_set():
+            try:
+                pages.put(item, timeout=POLL_SECONDS)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def _render(self, pdf_path: str, indices: Iterable[int],
+                dpi: Union[int, Callable[['fitz.Page'], int]], pages: queue.Queue):
+        stats = self.metrics.render
+        try:
+            with fitz.open(pdf_path) as doc:
+                for index in selected_pages(doc.page_count, indices):
+                    if self._stop.is_set():
+                        return
+                    started = time.perf_counter()
+                    page = doc[index]
+                    page_dpi = dpi(page) if callable(dpi) else dpi
+                    pix = render_pixmap(page, page_dpi)
+                    shape = (pix.height, pix.width)
+                    shm = SharedMemory(create=True, size=max(1, pix.width * pix.height))
+                    pixels = np.ndarray(shape, dtype=np.uint8, buffer=shm.buf)
+                    pixels[:] = np.frombuffer(pix.samples_mv, dtype=np.uint8).reshape(
+                        pix.height, pix.stride)[:, :pix.width]
+                    del pixels, pix
+                    seconds = time.perf_counter() - started
+                    stats.pages += 1
+                    stats.seconds += seconds
+                    info = {'dpi': (page_dpi, page_dpi), 'render_seconds': seconds}
+                    blocked = time.perf_counter()
+                    queued = self._put(pages, (PageJob(index, shm.name, shape), shm, info))
+                    stats.waiting += time.perf_counter() - blocked
+                    if not queued:
+                        _release(shm)
+                        return
+            self._put(pages, _DONE)
+        except BaseException as e:
+            self._put(pages, e)
+
+    def run(self, pdf_path: str, indices: Iterable[int],
+            dpi: Union[int, Callable[['fitz.Page'], int]] = 300,
+            is_cancelled: Optional[Callable[[], bool]] = None) -> Iterator[Tuple[int, object, dict]]:
+        """
+        Push pages through the pipeline.
+
+        Args:
+            pdf_path: PDF to render
+            indices: 0-based page indices, in the order to yield them
+            dpi: Render resolution, or a function choosing it for each page
+            is_cancelled: Polled before each page is submitted; stops the run when true
+
+        Yields:
+            (page index, result, info) in input order; info holds the
+            'dpi' and 'render_seconds' of the page
+        """
+        started = time.perf_counter()
+        pages = queue.Queue(maxsize=RENDER_QUEUE_DEPTH)
+        renderer = threading.Thread(target=self._render, args=(pdf_path, indices, dpi, pages),
+                                    name='ocr-render', daemon=True)
+        renderer.start()
+        window = deque()
+        limit = self.pool.queue_limit
+        assemble = self.metrics.assemble
+        done = False
+        try:
+            while True:
+                while not done and len(window) < limit:
+                    if is_cancelled and is_cancelled():
+                        done = True
+                        break
+                    # Only wait for the renderer when there is nothing to collect meanwhile
+                    try:
+                        item = pages.get_nowait() if window else None
+                    except queue.Empty:
+                        break
+                    if item is None:
+                        blocked = time.perf_counter()
+                        item = pages.get()
+                        assemble.waiting += time.perf_counter() - blocked
+                    if item is _DONE:
+                        done = True
+                        break
+                    if isinstance(item, BaseException):
+                        raise item
+                    self.metrics.render_queue.sample(pages.qsize())
+                    job, shm, info = item
+                    future = self.pool.submit(_process_page, job, self.kind, self.settings)
+                    window.append((job.index, shm, info, future))
+                    self.metrics.in_flight.sample(len(window))
+                if not window:
+                    break
+                index, shm, info, future = window.popleft()
+                blocked = time.perf_counter()
+                try:
+                    result, prepare_seconds, recognize_seconds = future.result()
+                finally:
+                    assemble.waiting += time.perf_counter() - blocked
+                    _release(shm)
+                for stats, seconds in ((self.metrics.preprocess, prepare_seconds),
+                                       (self.metrics.recognize, recognize_seconds)):
+                    stats.pages += 1
+                    stats.seconds += seconds
+                # The caller's handling of the page is the assemble stage's work
+                assemble.pages += 1
+                handed = time.perf_counter()
+                yield index, result, info
+                assemble.seconds += time.perf_counter() - handed
+        finally:
+            self._stop.set()
+            for _, shm, _, future in window:
+                future.cancel()
+                _release(shm)
+            renderer.join()
+            while not pages.empty():
+                item = pages.get_nowait()
+                if isinstance(item, tuple):
+                    _release(item[1])
+            self.metrics.seconds += time.perf_counter() - started
@@ -0,0 +1,116 @@
+"""Parallel page OCR on a pool of long-lived engine processes"""
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Callable, Iterable, Iterator, Optional
+import logging
+import multiprocessing
+import os
+
+from ocr.engine import OCREngine, create_engine, preferred_engine
+
+# Pages queued per worker beyond the one it is recognizing; bounds memory held in images
+QUEUE_DEPTH = 2
+
+# The engine of a pool worker process, created once by _init_worker
+_engine: Optional[OCREngine] = None
+
+logger = logging.getLogger(__name__)
+
+def threads_per_worker(workers: int) -> int:
+    """Split the cores between workers so tesseract's OpenMP threads do not oversubscribe them"""
+    return max(1, (os.cpu_count() or 1) // max(1, workers))
+
+def _init_worker(language: str, config: str, engine: Optional[str], threads: int):
+    global _engine
+    # Read by tesseract's OpenMP runtime when it starts, in this process and its children
+    os.environ['OMP_THREAD_LIMIT'] = str(threads)
+    _engine = create_engine(language, config, engine)
+
+def _recognize(image, kind: str, engine: Optional[OCREngine] = None):
+    return (engine or _engine).recognize(image, kind)
+
+class OCRPool:
+    """
+    Recognizes pages on worker processes that each keep one engine.
+
+    With workers=1 pages are recognized in this process. Results always
+    come back in input order, and at most QUEUE_DEPTH pages per worker are
+    in flight, so images can be produced lazily.
+
+    The engine only stays loaded between pages with tesserocr. The
+    pytesseract fallback runs the tesseract executable once per page, so
+    the pool then just bounds how many of those run at a time.
+    """
+    def __init__(self, workers: Optional[int] = None, language: str = 'eng', config: str = '',
+                 engine: Optional[str] = None):
+        self.workers = max(1, workers or os.cpu_count() or 1)
+        self.language = language
+        self.config = config
+        self.engine_name = engine
+        self._engine: Optional[OCREngine] = None
+        self._executor: Optional[ProcessPoolExecutor] = None
+        if engine is None and preferred_engine() == 'pytesseract':
+            logger.warning("tesserocr is not installed; pytesseract starts tesseract for every page")
+        if self.workers == 1:
+            self._engine = create_engine(language, config, engine)
+        else:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=_init_worker,
+                initargs=(language, config, engine, threads_per_worker(self.workers))
+            )
+
+    def submit(self, fn: Callable, *args) -> Future:
+        """
+        Run fn(*args) where the engine lives.
+
+        fn runs on a worker process, where it finds the engine in this
+        module, or in this process with engine=<the pool's engine> passed
+        in. It is a module-level function so it can be pickled.
+        """
+        if self._executor:
+            return self._executor.submit(fn, *args)
+        future = Future()
+        try:
+            future.set_result(fn(*args, engine=self._engine))
+        except Exception as e:
+            future.set_exception(e)
+        return future
+
+    @property
+    def queue_limit(self) -> int:
+        """Most pages to have submitted and not yet collected"""
+        return self.workers * (QUEUE_DEPTH + 1) if self._executor else 1
+
+    def map(self, images: Iterable, kind: str = 'text',
+            is_cancelled: Optional[Callable[[], bool]] = None) -> Iterator:
+        """
+        Recognize images, yielding results in order.
+
+        Stops early (after the pages already submitted) once is_cancelled
+        returns True.
+        """
+        window = deque()
+        for image in images:
+            if is_cancelled and is_cancelled():
+                break
+            window.append(self.submit(_recognize, image, kind))
+            while len(window) >= self.queue_limit:
+                yield window.popleft().result()
+        while window:
+            yield window.popleft().result()
+
+    def close(self):
+        if self._executor:
+            self._executor.shutdown(cancel_futures=True)
+            self._executor = None
+        if self._engine:
+            self._engine.close()
+            self._engine = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
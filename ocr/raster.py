@@ -0,0 +1,56 @@
+"""Lazy page rasterization for OCR"""
+from typing import Callable, Iterable, Iterator, Optional, Tuple, Union
+import time
+
+import fitz
+from PIL import Image
+
+def page_count(pdf_path: str) -> int:
+    with fitz.open(pdf_path) as doc:
+        return doc.page_count
+
+def selected_pages(total_pages: int, pages: Optional[Iterable[int]] = None) -> list:
+    """The 0-based page indices to render, in order, dropping those past the end"""
+    if pages is None:
+        return list(range(total_pages))
+    return [index for index in pages if 0 <= index < total_pages]
+
+def render_pixmap(page: 'fitz.Page', dpi: int = 300, grayscale: bool = True) -> 'fitz.Pixmap':
+    """Render one page to raw 8-bit samples without alpha"""
+    colorspace = fitz.csGRAY if grayscale else fitz.csRGB
+    return page.get_pixmap(dpi=dpi, colorspace=colorspace, alpha=False)
+
+def render_page(page: 'fitz.Page', dpi: int = 300, grayscale: bool = True) -> Image.Image:
+    """Render one page straight into a PIL image, without an encode/decode round trip"""
+    pix = render_pixmap(page, dpi, grayscale)
+    mode = 'L' if grayscale else 'RGB'
+    image = Image.frombytes(mode, (pix.width, pix.height), pix.samples)
+    image.info['dpi'] = (dpi, dpi)
+    return image
+
+def render_pages(pdf_path: str, dpi: Union[int, Callable[['fitz.Page'], int]] = 300,
+                 pages: Optional[Iterable[int]] = None,
+                 grayscale: bool = True) -> Iterator[Tuple[int, Image.Image]]:
+    """
+    Render pages one at a time as they are consumed.
+
+    Only the requested pages are rendered, and only one is held here at a
+    time, so memory does not grow with the page count.
+
+    Args:
+        pdf_path: PDF to render
+        dpi: Render resolution, or a function choosing it for each page
+        pages: 0-based page indices, in the order to yield them (default all)
+        grayscale: Render 8-bit grayscale rather than RGB
+
+    Yields:
+        (page index, image) pairs; image.info holds the 'dpi' used and the
+        'render_seconds' it took, including choosing the resolution
+    """
+    with fitz.open(pdf_path) as doc:
+        for index in selected_pages(doc.page_count, pages):
+            started = time.perf_counter()
+            page = doc[index]
+            image = render_page(page, dpi(page) if callable(dpi) else dpi, grayscale)
+            image.info['render_seconds'] = time.perf_counter() - started
+            yield index, image
@@ -0,0 +1,368 @@
+"""Streaming OCR output that is written page by page and resumes from a checkpoint"""
+from html import escape
+from itertools import groupby
+from typing import Dict, List, Optional, Set, Type
+import json
+import os
+
+import fitz
+
+from ocr.classify import PageText
+from ocr.engine import PageData
+from ocr.text_layer import add_text_layer
+
+# Sidecar next to the output recording the pages it holds
+CHECKPOINT_SUFFIX = '.ocr-checkpoint.json'
+CHECKPOINT_VERSION = 1
+
+def page_header(page: PageText) -> str:
+    return f"--- Page {page.index + 1} ({page.source}) ---\n"
+
+def source_fingerprint(path: str) -> Dict[str, int]:
+    """Identify a version of the source file cheaply, by size and modification time"""
+    stat = os.stat(path)
+    return {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+
+class OCRSink:
+    """
+    Writes page results to an output file as they complete.
+
+    After every flush_pages pages the output is flushed and a checkpoint
+    beside it records the pages written and the output's length. Opening
+    a sink whose checkpoint matches the source and settings truncates
+    the output to that length, dropping anything half-written, and
+    reports the pages already there so only the rest are processed.
+    close(complete=False) flushes what was written and keeps the
+    checkpoint; a complete close removes it.
+    """
+    format = ''
+    extension = ''
+    layout = False      # Needs word boxes (PageText.data) for OCRed pages
+    flush_pages = 1
+
+    def __init__(self, output_path: str, source_path: str, settings: Optional[dict] = None):
+        """
+        Args:
+            output_path: File to write
+            source_path: PDF the pages come from
+            settings: OCR settings; a checkpoint made with others is not resumed
+        """
+        self.output_path = output_path
+        self.source_path = source_path
+        self.settings = settings or {}
+        self.checkpoint_path = output_path + CHECKPOINT_SUFFIX
+        self.done: List[int] = []
+        self._pending: List[int] = []
+
+    def _identity(self) -> dict:
+        return {
+            'version': CHECKPOINT_VERSION,
+            'format': self.format,
+            'source': os.path.abspath(self.source_path),
+            'fingerprint': source_fingerprint(self.source_path),
+            'settings': self.settings,
+        }
+
+    def _load_checkpoint(self) -> Optional[dict]:
+        if not os.path.exists(self.output_path):
+            return None
+        try:
+            with open(self.checkpoint_path, 'r', encoding='utf-8') as f:
+                checkpoint = json.load(f)
+        except (OSError, ValueError):
+            return None
+        identity = json.loads(json.dumps(self._identity(), default=str))
+        if checkpoint.get('identity') != identity:
+            return None
+        if os.path.getsize(self.output_path) < checkpoint.get('offset', 0):
+            return None
+        return checkpoint
+
+    def _save_checkpoint(self):
+        checkpoint = {'identity': self._identity(), 'pages': self.done,
+                      'offset': os.path.getsize(self.output_path)}
+        temp_path = self.checkpoint_path + '.tmp'
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(checkpoint, f, default=str)
+        os.replace(temp_path, self.checkpoint_path)
+
+    def open(self) -> Set[int]:
+        """
+        Start the output, or pick it up where a previous run stopped.
+
+        Returns:
+            0-based indices of the pages already written
+        """
+        checkpoint = self._load_checkpoint()
+        if checkpoint:
+            with open(self.output_path, 'r+b') as f:
+                f.truncate(checkpoint['offset'])
+            self.done = list(checkpoint['pages'])
+            self._resume()
+        else:
+            self.done = []
+            self._start()
+            self._save_checkpoint()
+        return set(self.done)
+
+    def write(self, page: PageText):
+        """Add one page's result; pages arrive in output order"""
+        self._write(page)
+        self._pending.append(page.index)
+        if len(self._pending) >= self.flush_pages:
+            self.flush()
+
+    def flush(self):
+        """Make the pages written so far durable and record them in the checkpoint"""
+        if not self._pending:
+            return
+        self._flush()
+        self.done.extend(self._pending)
+        self._pending = []
+        self._save_checkpoint()
+
+    def close(self, complete: bool = True):
+        """
+        Finish the output.
+
+        Args:
+            complete: Every page was written; otherwise the output is left
+                readable with the pages so far and the checkpoint is kept
+        """
+        self.flush()
+        self._finish(complete)
+        if complete and os.path.exists(self.checkpoint_path):
+            os.remove(self.checkpoint_path)
+
+    def _start(self):
+        raise NotImplementedError
+
+    def _resume(self):
+        raise NotImplementedError
+
+    def _write(self, page: PageText):
+        raise NotImplementedError
+
+    def _flush(self):
+        raise NotImplementedError
+
+    def _finish(self, complete: bool):
+        raise NotImplementedError
+
+class StreamSink(OCRSink):
+    """A sink writing a header, one chunk per page and a footer to a UTF-8 file"""
+    def _start(self):
+        self._file = open(self.output_path, 'wb')
+        self._file.write(self.header().encode('utf-8'))
+        self._file.flush()
+
+    def _resume(self):
+        self._file = open(self.output_path, 'ab')
+
+    def _write(self, page: PageText):
+        self._file.write(self.render(page).encode('utf-8'))
+
+    def _flush(self):
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def _finish(self, complete: bool):
+        # The footer goes after the checkpoint offset, so a resumed run writes over it
+        self._file.write(self.footer().encode('utf-8'))
+        self._file.close()
+
+    def header(self) -> str:
+        return ''
+
+    def render(self, page: PageText) -> str:
+        raise NotImplementedError
+
+    def footer(self) -> str:
+        return ''
+
+class TextSink(StreamSink):
+    """Plain text with a header line per page, as perform_ocr returns it"""
+    format = 'text'
+    extension = 'txt'
+
+    def render(self, page: PageText) -> str:
+        return f"{page_header(page)}{page.text}\n\n"
+
+class JSONLSink(StreamSink):
+    """One JSON object per page and line"""
+    format = 'jsonl'
+    extension = 'jsonl'
+
+    def render(self, page: PageText) -> str:
+        record = {
+            'page': page.index + 1,
+            'source': page.source,
+            'kind': page.kind,
+            'text': page.text,
+            'confidence': round(page.data.confidence, 2) if page.data and page.data.confidence else None,
+        }
+        return json.dumps(record, ensure_ascii=False) + '\n'
+
+def _box(words) -> tuple:
+    left = min(word.left for word in words)
+    top = min(word.top for word in words)
+    right = max(word.left + word.width for word in words)
+    bottom = max(word.top + word.height for word in words)
+    return left, top, right, bottom
+
+def _lines(data: PageData):
+    """Group the words of a page by block and paragraph, then line"""
+    for paragraph, words in groupby(data.words, key=lambda word: word.line[:2]):
+        yield paragraph, [list(line) for _, line in groupby(words, key=lambda word: word.line)]
+
+class HOCRSink(StreamSink):
+    """hOCR (XHTML) with page, paragraph, line and word boxes in rendered-image pixels"""
+    format = 'hocr'
+    extension = 'hocr'
+    layout = True
+
+    def header(self) -> str:
+        return ('<?xml version="1.0" encoding="UTF-8"?>\n'
+                '<!DOCTYPE html PUBLIC "-//W3C//DTD XHTML 1.0 Transitional//EN" '
+                '"http://www.w3.org/TR/xhtml1/DTD/xhtml1-transitional.dtd">\n'
+                '<html xmlns="http://www.w3.org/1999/xhtml" xml:lang="en" lang="en">\n<head>\n'
+                f'<title>{escape(os.path.basename(self.source_path))}</title>\n'
+                '<meta http-equiv="Content-Type" content="text/html;charset=utf-8"/>\n'
+                '<meta name="ocr-system" content="pdfcombiner"/>\n'
+                '<meta name="ocr-capabilities" content="ocr_page ocr_par ocr_line ocrx_word"/>\n'
+                '</head>\n<body>\n')
+
+    def render(self, page: PageText) -> str:
+        number = page.index + 1
+        data = page.data
+        if data is None:
+            # Text layer pages have no boxes
+            lines = ''.join(f"<span class='ocr_line'>{escape(line)}</span><br/>\n"
+                            for line in page.text.splitlines() if line.strip())
+            return (f"<div class='ocr_page' id='page_{number}' title='ppageno {page.index}'>\n"
+                    f"<p class='ocr_par'>\n{lines}</p>\n</div>\n")
+        width, height = data.size
+        parts = [f"<div class='ocr_page' id='page_{number}' "
+                 f"title='bbox 0 0 {width} {height}; ppageno {page.index}'>\n"]
+        line_number = word_number = 0
+        for (block, par), lines in _lines(data):
+            words = [word for line in lines for word in line]
+            parts.append(f"<p class='ocr_par' id='par_{number}_{block}_{par}' "
+                         f"title='bbox {' '.join(map(str, _box(words)))}'>\n")
+            for line in lines:
+                line_number += 1
+                parts.append(f"<span class='ocr_line' id='line_{number}_{line_number}' "
+                             f"title='bbox {' '.join(map(str, _box(line)))}'>")
+                for word in line:
+                    word_number += 1
+                    box = (word.left, word.top, word.left + word.width, word.top + word.height)
+                    parts.append(f"<span class='ocrx_word' id='word_{number}_{word_number}' "
+                                 f"title='bbox {' '.join(map(str, box))}; x_wconf {round(word.confidence)}'>"
+                                 f"{escape(word.text)}</span> ")
+                parts.append("</span>\n")
+            parts.append("</p>\n")
+        parts.append("</div>\n")
+        return ''.join(parts)
+
+    def footer(self) -> str:
+        return '</body>\n</html>\n'
+
+class ALTOSink(StreamSink):
+    """ALTO v4 XML with block, line and word positions in rendered-image pixels"""
+    format = 'alto'
+    extension = 'xml'
+    layout = True
+
+    def header(self) -> str:
+        return ('<?xml version="1.0" encoding="UTF-8"?>\n'
+                '<alto xmlns="http://www.loc.gov/standards/alto/ns-v4#">\n'
+                '<Description>\n<MeasurementUnit>pixel</MeasurementUnit>\n'
+                '<sourceImageInformation>\n'
+                f'<fileName>{escape(os.path.basename(self.source_path))}</fileName>\n'
+                '</sourceImageInformation>\n</Description>\n<Layout>\n')
+
+    @staticmethod
+    def _position(left, top, right, bottom) -> str:
+        return f'HPOS="{left}" VPOS="{top}" WIDTH="{right - left}" HEIGHT="{bottom - top}"'
+
+    def render(self, page: PageText) -> str:
+        number = page.index + 1
+        data = page.data
+        if data is None:
+            # Text layer pages have no positions
+            lines = ''.join(f'<TextLine><String CONTENT="{escape(line)}"/></TextLine>\n'
+                            for line in page.text.splitlines() if line.strip())
+            return (f'<Page ID="page_{number}" PHYSICAL_IMG_NR="{number}">\n<PrintSpace>\n'
+                    f'<TextBlock ID="block_{number}_0">\n{lines}</TextBlock>\n</PrintSpace>\n</Page>\n')
+        width, height = data.size
+        parts = [f'<Page ID="page_{number}" PHYSICAL_IMG_NR="{number}" WIDTH="{width}" HEIGHT="{height}">\n'
+                 f'<PrintSpace HPOS="0" VPOS="0" WIDTH="{width}" HEIGHT="{height}">\n']
+        line_number = word_number = 0
+        for (block, par), lines in _lines(data):
+            words = [word for line in lines for word in line]
+            parts.append(f'<TextBlock ID="block_{number}_{block}_{par}" {self._position(*_box(words))}>\n')
+            for line in lines:
+                line_number += 1
+                parts.append(f'<TextLine ID="line_{number}_{line_number}" {self._position(*_box(line))}>\n')
+                for i, word in enumerate(line):
+                    word_number += 1
+                    if i:
+                        parts.append('<SP/>\n')
+                    box = (word.left, word.top, word.left + word.width, word.top + word.height)
+                    parts.append(f'<String ID="word_{number}_{word_number}" CONTENT="{escape(word.text)}" '
+                                 f'{self._position(*box)} WC="{max(0.0, word.confidence) / 100:.2f}"/>\n')
+                parts.append('</TextLine>\n')
+            parts.append('</TextBlock>\n')
+        parts.append('</PrintSpace>\n</Page>\n')
+        return ''.join(parts)
+
+    def footer(self) -> str:
+        return '</Layout>\n</alto>\n'
+
+class SearchablePDFSink(OCRSink):
+    """
+    The original PDF with an invisible text layer over each OCRed page.
+
+    Pages are added in place and appended to the output with incremental
+    saves every flush_pages pages, so a flush writes only what changed.
+    A complete output is rewritten once, compacted.
+    """
+    format = 'pdf'
+    extension = 'pdf'
+    layout = True
+    flush_pages = 10
+
+    def _start(self):
+        with fitz.open(self.source_path) as source:
+            source.save(self.output_path)
+        self._doc = fitz.open(self.output_path)
+
+    def _resume(self):
+        self._doc = fitz.open(self.output_path)
+
+    def _write(self, page: PageText):
+        if page.data is not None:
+            add_text_layer(self._doc[page.index], page.data)
+
+    def _flush(self):
+        self._doc.saveIncr()
+
+    def _finish(self, complete: bool):
+        if not complete:
+            self._doc.close()
+            return
+        temp_path = self.output_path + '.tmp'
+        self._doc.save(temp_path, garbage=1, deflate=True)
+        self._doc.close()
+        os.replace(temp_path, self.output_path)
+
+SINKS: Dict[str, Type[OCRSink]] = {
+    sink.format: sink for sink in (TextSink, JSONLSink, HOCRSink, ALTOSink, SearchablePDFSink)
+}
+
+def create_sink(output_format: str, output_path: str, source_path: str,
+                settings: Optional[dict] = None) -> OCRSink:
+    """Create the sink for an output format in SINKS"""
+    if output_format not in SINKS:
+        raise ValueError(f"Unknown OCR output format: {output_format} (expected one of {', '.join(SINKS)})")
+    return SINKS[output_format](output_path, source_path, settings)
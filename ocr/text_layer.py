@@ -0,0 +1,49 @@
+"""Invisible OCR text layers over the original pages of a PDF"""
+import fitz
+
+from ocr.engine import PageData
+
+FONT = 'helv'
+# Invisible text: neither filled nor stroked, but selectable and searchable
+INVISIBLE = 3
+# Baseline position within a word box, from the top; leaves room for descenders
+BASELINE = 0.8
+
+def add_text_layer(page: 'fitz.Page', data: PageData) -> int:
+    """
+    Draw the recognized words of a page as invisible text over its content.
+
+    Each word is placed at its box, mapped from image pixels to the page,
+    and stretched horizontally to the box width so selection and search
+    highlights line up with the image. The page's own content is left as
+    it is.
+
+    Returns:
+        Number of words written
+    """
+    if not data.words or not data.size[0] or not data.size[1]:
+        return 0
+    rect = page.rect
+    scale_x = rect.width / data.size[0]
+    scale_y = rect.height / data.size[1]
+    # Boxes are in the orientation of the rendered (rotated) page; text is drawn on the unrotated one,
+    # turned with the page and stretched along its own baseline
+    derotate = page.derotation_matrix
+    rotation = fitz.Matrix(page.rotation)
+
+    shape = page.new_shape()
+    written = 0
+    for word in data.words:
+        height = word.height * scale_y
+        width = word.width * scale_x
+        fontsize = max(1.0, height)
+        length = fitz.get_text_length(word.text, fontname=FONT, fontsize=fontsize)
+        if not length or not width:
+            continue
+        origin = fitz.Point(word.left * scale_x, (word.top + word.height * BASELINE) * scale_y) * derotate
+        stretch = ~rotation * fitz.Matrix(width / length, 1) * rotation
+        shape.insert_text(origin, word.text, fontname=FONT, fontsize=fontsize,
+                          render_mode=INVISIBLE, rotate=page.rotation, morph=(origin, stretch))
+        written += 1
+    shape.commit(overlay=True)
+    return written
@@ -8,6 +8,15 @@ from PyQt6.QtWidgets import (
     QDialogButtonBox,
 )
 
+# Output options written page by page through an ocr.sinks format, resumable if interrupted
+SINK_OUTPUTS = {
+    "Text file (auto-named)": 'text',
+    "JSON Lines (one page per line)": 'jsonl',
+    "hOCR (HTML with word boxes)": 'hocr',
+    "ALTO XML": 'alto',
+    "Searchable PDF (text layer)": 'pdf',
+}
+
 class OCRSettingsDialog(QDialog):
     def __init__(self, parent=None):
         super().__init__(parent)
@@ -54,6 +63,14 @@ class OCRSettingsDialog(QDialog):
         self.clean_check.setChecked(True)
         layout.addRow(self.clean_check)
 
+        self.hybrid_check = QCheckBox("Use existing text layer (OCR only scanned pages)")
+        self.hybrid_check.setChecked(True)
+        layout.addRow(self.hybrid_check)
+
+        self.adaptive_check = QCheckBox("Adaptive resolution (re-OCR low-confidence pages)")
+        self.adaptive_check.setChecked(False)
+        layout.addRow(self.adaptive_check)
+
         # Contrast adjustment
         self.contrast_spin = QDoubleSpinBox()
         self.contrast_spin.setRange(0.5, 2.0)
@@ -81,7 +98,11 @@ class OCRSettingsDialog(QDialog):
             "Text file (auto-named)",
             "Clipboard",
             "Text window",
-            "New PDF file"
+            "New PDF file",
+            "Searchable PDF (text layer)",
+            "JSON Lines (one page per line)",
+            "hOCR (HTML with word boxes)",
+            "ALTO XML"
         ])
         layout.addRow("Output Destination:", self.output_combo)
 
@@ -0,0 +1,346 @@
+"""Appending to an existing PDF with incremental updates"""
+from typing import List, Optional, Dict, Callable, Tuple, BinaryIO
+import os
+import re
+import time
+
+from PyPDF2 import PdfReader
+from PyPDF2.generic import ArrayObject, DictionaryObject, IndirectObject, NameObject, NumberObject, \
+    create_string_object
+
+from operations.merge import (MergeReport, PageSelection, ProgressCallback, StreamingPdfWriter, _load,
+                              get_merge_backend)
+from utils.utils import atomic_output
+
+TAIL_WINDOW = 4096
+SECTION_WINDOW = 4096
+
+STARTXREF = re.compile(rb'startxref\s+(\d+)')
+SUBSECTION = re.compile(rb'\s*(\d+)[ \t]+(\d+)[ \t]*\r?\n')
+PREV = re.compile(rb'/Prev\s+(\d+)')
+SIZE = re.compile(rb'/Size\s+(\d+)')
+
+# Page tree nodes never get more children than this from appends
+PAGE_TREE_FAN_OUT = 16
+
+# Page attributes a page tree node passes down to pages that lack them
+INHERITABLE_KEYS = ('/Resources', '/MediaBox', '/CropBox', '/Rotate')
+
+# Offset, whether it is a cross-reference stream, and the /Size of its trailer
+XrefSection = Tuple[int, bool, int]
+
+# (title, page index in the output or None, destination after the page, children)
+OutlineEntry = Tuple[str, Optional[int], list, list]
+
+def xref_sections(pdf_path: str) -> List[XrefSection]:
+    """
+    Follow the cross-reference chain from the end of the file.
+
+    Only the section headers and trailers are read, so this is cheap even
+    for very large files.
+
+    Returns:
+        Every section, newest first; empty if the chain cannot be followed
+    """
+    sections: List[XrefSection] = []
+    with open(pdf_path, 'rb') as f:
+        size = f.seek(0, os.SEEK_END)
+        f.seek(max(0, size - TAIL_WINDOW))
+        matches = list(STARTXREF.finditer(f.read()))
+        offset = int(matches[-1].group(1)) if matches else None
+
+        while offset is not None and offset < size and offset not in (s[0] for s in sections):
+            f.seek(offset)
+            head = f.read(SECTION_WINDOW)
+            if head.startswith(b'xref'):
+                # Skip the table one subsection at a time; entries are 20 bytes each
+                position = offset + 4
+                while True:
+                    f.seek(position)
+                    match = SUBSECTION.match(f.read(64))
+                    if not match:
+                        break
+                    position += match.end() + int(match.group(2)) * 20
+                f.seek(position)
+                trailer = f.read(SECTION_WINDOW)
+                if not trailer.lstrip().startswith(b'trailer'):
+                    break
+                trailer = trailer[:trailer.find(b'startxref')]
+                is_stream = False
+            else:
+                trailer = head[:head.find(b'stream')]
+                if b'/XRef' not in trailer:
+                    break
+                is_stream = True
+            size_match = SIZE.search(trailer)
+            if not size_match:
+                break
+            sections.append((offset, is_stream, int(size_match.group(1))))
+            prev = PREV.search(trailer)
+            offset = int(prev.group(1)) if prev else None
+    return sections
+
+def count_updates(pdf_path: str) -> int:
+    """Get the number of incremental updates stacked on a PDF"""
+    return max(0, len(xref_sections(pdf_path)) - 1)
+
+def _outline_entries(reader: PdfReader, outline: list,
+                     positions: Dict[int, int]) -> List[OutlineEntry]:
+    """
+    Collect the bookmarks of reader for the pages in positions (input page
+    index -> output page index). Bookmarks to other pages are dropped and
+    their children move up a level.
+    """
+    entries: List[OutlineEntry] = []
+    dropped = False
+    for item in outline:
+        if isinstance(item, list):
+            children = _outline_entries(reader, item, positions)
+            (entries if dropped or not entries else entries[-1][3]).extend(children)
+            continue
+        page = reader.get_destination_page_number(item)
+        dropped = page >= 0 and page not in positions
+        if not dropped:
+            entries.append((str(item.title), positions[page] if page >= 0 else None,
+                            list(item.dest_array[1:]), []))
+    return entries
+
+def _ref(object_id: int) -> IndirectObject:
+    return IndirectObject(object_id, 0, None)
+
+def _write_outline(writer: StreamingPdfWriter, entries: List[OutlineEntry], parent: int,
+                   page_ids: List[int], prev: Optional[IndirectObject] = None) -> List[int]:
+    """Write outline items under parent; returns their object numbers"""
+    ids = [writer.reserve() for _ in entries]
+    for idx, (title, page, dest, children) in enumerate(entries):
+        item = DictionaryObject({
+            NameObject('/Title'): create_string_object(title),
+            NameObject('/Parent'): _ref(parent),
+        })
+        if idx > 0 or prev is not None:
+            item[NameObject('/Prev')] = _ref(ids[idx - 1]) if idx > 0 else prev
+        if idx + 1 < len(ids):
+            item[NameObject('/Next')] = _ref(ids[idx + 1])
+        if page is not None:
+            item[NameObject('/Dest')] = ArrayObject([_ref(page_ids[page])] + dest)
+        if children:
+            child_ids = _write_outline(writer, children, ids[idx], page_ids)
+            item[NameObject('/First')] = _ref(child_ids[0])
+            item[NameObject('/Last')] = _ref(child_ids[-1])
+            # Closed, so only the top level counts as visible
+            item[NameObject('/Count')] = NumberObject(-len(children))
+        writer.write_object(ids[idx], item)
+    return ids
+
+def _update_page_tree(writer: StreamingPdfWriter, catalog: DictionaryObject, new_pages: int):
+    """Hang the node holding the new pages off the page tree, under a new root if needed"""
+    pages_ref = catalog.raw_get('/Pages')
+    pages_root = pages_ref.get_object()
+    kids = pages_root.raw_get('/Kids')
+    kid_list = list(kids.get_object() if isinstance(kids, IndirectObject) else kids)
+    count = NumberObject(int(pages_root['/Count']) + new_pages)
+
+    # A wide root would be rewritten in full by every append, and new pages
+    # must not inherit attributes meant for the existing ones; both are
+    # avoided by putting a small root above the old one
+    extend_root = (len(kid_list) < PAGE_TREE_FAN_OUT
+                   and not any(key in pages_root for key in INHERITABLE_KEYS))
+    parent = pages_ref if extend_root else _ref(writer.reserve())
+    node = _ref(writer.pages_id)
+    writer.write_object(writer.pages_id, DictionaryObject({
+        NameObject('/Type'): NameObject('/Pages'),
+        NameObject('/Parent'): parent,
+        NameObject('/Kids'): ArrayObject(_ref(kid) for kid in writer.page_ids),
+        NameObject('/Count'): NumberObject(new_pages),
+    }))
+
+    root = DictionaryObject(pages_root.items())
+    if extend_root:
+        if isinstance(kids, IndirectObject):
+            writer.write_object(kids.idnum, ArrayObject(kid_list + [node]))
+        else:
+            root[NameObject('/Kids')] = ArrayObject(kid_list + [node])
+        root[NameObject('/Count')] = count
+    else:
+        root[NameObject('/Parent')] = parent
+        writer.write_object(parent.idnum, DictionaryObject({
+            NameObject('/Type'): NameObject('/Pages'),
+            NameObject('/Kids'): ArrayObject([pages_ref, node]),
+            NameObject('/Count'): count,
+        }))
+        catalog[NameObject('/Pages')] = parent
+    writer.write_object(pages_ref.idnum, root)
+
+def _update_outline(writer: StreamingPdfWriter, catalog: DictionaryObject,
+                    entries: List[OutlineEntry]):
+    """Add entries after the last top-level bookmark, creating the outline if needed"""
+    outline_ref = catalog.get('/Outlines')
+    page_ids = writer.page_ids
+
+    if isinstance(outline_ref, IndirectObject):
+        outline = outline_ref.get_object()
+        last_ref = outline.get('/Last')
+        ids = _write_outline(writer, entries, outline_ref.idnum, page_ids,
+                             prev=last_ref if isinstance(last_ref, IndirectObject) else None)
+        if isinstance(last_ref, IndirectObject):
+            last = DictionaryObject(last_ref.get_object().items())
+            last[NameObject('/Next')] = _ref(ids[0])
+            writer.write_object(last_ref.idnum, last)
+        root = DictionaryObject(outline.items())
+        if '/First' not in root:
+            root[NameObject('/First')] = _ref(ids[0])
+        root[NameObject('/Last')] = _ref(ids[-1])
+        root[NameObject('/Count')] = NumberObject(abs(int(outline.get('/Count', 0))) + len(ids))
+        writer.write_object(outline_ref.idnum, root)
+        return
+
+    root_id = writer.reserve()
+    ids = _write_outline(writer, entries, root_id, page_ids)
+    writer.write_object(root_id, DictionaryObject({
+        NameObject('/Type'): NameObject('/Outlines'),
+        NameObject('/First'): _ref(ids[0]),
+        NameObject('/Last'): _ref(ids[-1]),
+        NameObject('/Count'): NumberObject(len(ids)),
+    }))
+    catalog[NameObject('/Outlines')] = _ref(root_id)
+
+def compact_pdf(pdf_path: str, backend: Optional[str] = None) -> MergeReport:
+    """
+    Rewrite a PDF in full, dropping the superseded objects and cross-reference
+    sections that incremental updates leave behind.
+
+    Args:
+        pdf_path: PDF to rewrite in place
+        backend: Merge backend used for the rewrite (default backend if None)
+    """
+    with atomic_output(pdf_path) as temp_path:
+        report = get_merge_backend(backend).merge([pdf_path], temp_path)
+    report.incremental_updates = 0
+    report.compacted = True
+    return report
+
+def _write_update(base: PdfReader, f: BinaryIO, prev: XrefSection, pdf_files: List[str],
+                  report: MergeReport, progress: Optional[ProgressCallback],
+                  is_cancelled: Optional[Callable[[], bool]], dedup: bool,
+                  pages: Optional[PageSelection]) -> bool:
+    """Write one incremental update to f, positioned at the end of the file base reads"""
+    trailer = base.trailer
+    catalog_ref = trailer.raw_get('/Root')
+    info_ref = trailer.raw_get('/Info') if '/Info' in trailer else None
+    # PyPDF2 does not keep /Size from cross-reference stream trailers
+    size = prev[2]
+
+    f.seek(-1, os.SEEK_END)
+    if f.read(1) not in (b'\r', b'\n'):
+        f.write(b"\n")
+    # The node holding the new pages takes the first free object number
+    writer = StreamingPdfWriter(
+        f, dedup=dedup, catalog_id=catalog_ref.idnum, pages_id=size,
+        info_id=info_ref.idnum if info_ref else catalog_ref.idnum, next_id=size + 1)
+
+    outline: List[OutlineEntry] = []
+    for idx, path in enumerate(pdf_files):
+        if is_cancelled and is_cancelled():
+            return False
+        reader = _load(path)
+        selected = pages[idx] if pages and pages[idx] is not None else range(len(reader.pages))
+        positions = {page: writer.page_count + position for position, page in enumerate(selected)}
+        outline.extend(_outline_entries(reader, reader.outline, positions))
+        writer.append(reader, pages[idx] if pages else None)
+        reader.stream.close()
+        del reader
+
+        report.inputs += 1
+        report.sample_memory()
+        if progress:
+            progress(report.inputs, len(pdf_files))
+
+    # Both updates may change the catalog, which is then written once
+    catalog = DictionaryObject(catalog_ref.get_object().items())
+    original_catalog = dict(catalog)
+    if writer.page_count:
+        _update_page_tree(writer, catalog, writer.page_count)
+    if outline:
+        _update_outline(writer, catalog, outline)
+    if dict(catalog) != original_catalog:
+        writer.write_object(catalog_ref.idnum, catalog)
+
+    entries = DictionaryObject({NameObject('/Root'): catalog_ref})
+    for key in ('/Info', '/ID'):
+        if key in trailer:
+            entries[NameObject(key)] = trailer.raw_get(key)
+    writer.write_xref(entries, prev=prev[0], as_stream=prev[1])
+
+    report.pages = writer.page_count
+    if dedup:
+        report.dedup_objects = writer.dedup_objects
+        report.dedup_bytes_saved = writer.dedup_bytes_saved
+    return True
+
+def append_pdfs(target_path: str, pdf_files: List[str],
+                progress: Optional[ProgressCallback] = None,
+                is_cancelled: Optional[Callable[[], bool]] = None,
+                dedup: bool = False, compact_after: Optional[int] = None,
+                compact_backend: Optional[str] = None,
+                pages: Optional[PageSelection] = None) -> Optional[MergeReport]:
+    """
+    Add the pages of pdf_files to the end of an existing PDF.
+
+    The new pages, their resources and bookmarks are written after the
+    existing bytes as an incremental update: new objects, a rewritten page
+    tree root (with one new child node holding the new pages), rewritten
+    outline ends and a cross-reference section chained to the previous one.
+    Nothing else already in the file is read or rewritten, so the cost
+    follows the new content and the number of top-level page tree entries,
+    not the file size. A failed or cancelled append truncates the file back
+    to its original length.
+
+    Superseded objects accumulate with every update; compact_after
+    triggers a full rewrite once that many updates are stacked.
+
+    Args:
+        target_path: Existing PDF to extend
+        pdf_files: PDFs to append, in order
+        progress: Called with (inputs done, total inputs)
+        is_cancelled: Polled between inputs
+        dedup: Collapse objects repeated across the new inputs
+        compact_after: Rewrite the file once it carries this many updates
+        compact_backend: Merge backend for the rewrite
+        pages: Pages to take from each input (see resolve_page_ranges)
+
+    Returns:
+        MergeReport for the appended content, or None if cancelled
+    """
+    report = MergeReport(max_open_inputs=1)
+    started = time.perf_counter()
+    sections = xref_sections(target_path)
+    if not sections:
+        raise ValueError(f"Cannot follow the cross-reference chain of {target_path}")
+
+    # Given a path PdfReader loads the whole file; given a file object it reads lazily
+    with open(target_path, 'rb') as source, open(target_path, 'r+b') as f:
+        base = PdfReader(source)
+        if base.is_encrypted:
+            raise ValueError(f"PDF is encrypted: {target_path}")
+        original_size = f.seek(0, os.SEEK_END)
+        try:
+            finished = _write_update(base, f, sections[0], pdf_files, report, progress,
+                                     is_cancelled, dedup, pages)
+            if finished:
+                f.flush()
+                os.fsync(f.fileno())
+        except BaseException:
+            f.truncate(original_size)
+            raise
+        if not finished:
+            f.truncate(original_size)
+            return None
+        appended = f.tell() - original_size
+
+    report.incremental_updates = len(sections)
+    if compact_after and report.incremental_updates >= compact_after:
+        compact_pdf(target_path, compact_backend)
+        report.incremental_updates = 0
+        report.compacted = True
+    report.finish(started, target_path, bytes_written=appended)
+    return report
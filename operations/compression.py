@@ -1,5 +1,4 @@
 from PyPDF2 import PdfReader, PdfWriter
-from PyQt6.QtWidgets import QMessageBox
 import os
 
 class PDFCompressor:
@@ -16,6 +15,9 @@ class PDFCompressor:
                           1: Fast (lower quality)
                           2: Balanced
                           3: Best (higher quality)
+
+        Returns:
+            True if the file was compressed, False on error
         """
         try:
             # Validate input
@@ -63,10 +65,14 @@ class PDFCompressor:
             os.replace(temp_file, pdf_path)
 
             # Update status
-            self.parent_window.show_status_message(
-                f"PDF compressed: {os.path.getsize(pdf_path) / 1024:.1f} KB (was {original_size / 1024:.1f} KB)",
-                5000
-            )
+            if self.parent_window:
+                self.parent_window.show_status_message(
+                    f"PDF compressed: {os.path.getsize(pdf_path) / 1024:.1f} KB (was {original_size / 1024:.1f} KB)",
+                    5000
+                )
+            return True
 
         except Exception as e:
-            self.parent_window.show_status_message(f"Compression error: {str(e)}", 5000)
+            if self.parent_window:
+                self.parent_window.show_status_message(f"Compression error: {str(e)}", 5000)
+            return False
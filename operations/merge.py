@@ -0,0 +1,949 @@
+"""Bounded-memory streaming merge of many PDFs"""
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, FIRST_COMPLETED, wait
+from dataclasses import dataclass, asdict
+from importlib.util import find_spec
+from io import BytesIO
+from typing import List, Optional, Dict, Callable, BinaryIO, Set, Type
+import hashlib
+import math
+import multiprocessing
+import os
+import shutil
+import tempfile
+import time
+
+from PyPDF2 import PdfReader, PdfWriter, PdfMerger
+from PyPDF2.generic import (ArrayObject, DecodedStreamObject, DictionaryObject, IndirectObject, NameObject,
+                            NumberObject, StreamObject, create_string_object)
+
+from utils.utils import parse_page_range
+
+# Object numbers of the objects written last, reserved up front
+CATALOG_ID = 1
+PAGES_ID = 2
+INFO_ID = 3
+
+# Document info entries every backend copies from the first input
+INFO_KEYS = ('/Title', '/Author', '/Subject', '/Keywords', '/Creator')
+
+ProgressCallback = Callable[[int, int], None]  # inputs done, total inputs
+
+# One entry per input: zero-based page indices to take, or None for every page
+PageSelection = List[Optional[List[int]]]
+
+def current_rss() -> Optional[int]:
+    """Get the resident set size of this process in bytes, if the platform exposes it"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError, AttributeError):
+        pass
+    try:
+        import resource
+        # ru_maxrss is the lifetime peak: kilobytes on Linux, bytes on macOS
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if os.uname().sysname == 'Darwin' else peak * 1024
+    except (ImportError, AttributeError):
+        return None
+
+@dataclass
+class MergeReport:
+    """Figures for one merge"""
+    inputs: int = 0
+    pages: int = 0
+    bytes_written: int = 0
+    seconds: float = 0.0
+    pages_per_second: float = 0.0
+    mb_per_second: float = 0.0
+    peak_rss: Optional[int] = None  # Bytes, sampled after each input
+    max_open_inputs: int = 1
+    dedup_objects: Optional[Dict[str, int]] = None  # Duplicates collapsed per object type
+    dedup_bytes_saved: Optional[Dict[str, int]] = None  # Bytes not written per object type
+    workers: int = 1
+    merge_levels: int = 1  # Rounds of a tree merge, including the final concatenation
+    incremental_updates: Optional[int] = None  # Updates stacked on the output after an append
+    compacted: bool = False  # An append ended with a full rewrite
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+    def sample_memory(self):
+        rss = current_rss()
+        if rss is not None:
+            self.peak_rss = max(self.peak_rss or 0, rss)
+
+    def add_chunk(self, chunk: 'MergeReport'):
+        """Fold in the memory and dedup figures of one task of a tree merge"""
+        if chunk.peak_rss:
+            self.peak_rss = max(self.peak_rss or 0, chunk.peak_rss)
+        for field_name in ('dedup_objects', 'dedup_bytes_saved'):
+            counts = getattr(chunk, field_name)
+            if counts is not None:
+                totals = getattr(self, field_name) or {}
+                for kind, count in counts.items():
+                    totals[kind] = totals.get(kind, 0) + count
+                setattr(self, field_name, totals)
+
+    def finish(self, started: float, output_path: str, bytes_written: Optional[int] = None):
+        """Fill in size (the whole output unless given) and throughput once the output is written"""
+        self.bytes_written = os.path.getsize(output_path) if bytes_written is None else bytes_written
+        self.seconds = round(time.perf_counter() - started, 3)
+        if self.seconds:
+            self.pages_per_second = round(self.pages / self.seconds, 1)
+            self.mb_per_second = round(self.bytes_written / self.seconds / 1024 ** 2, 2)
+
+def _document_info(reader: PdfReader) -> Dict[str, str]:
+    metadata = reader.metadata or {}
+    return {key: str(metadata[key]) for key in INFO_KEYS if metadata.get(key)}
+
+def _write_object(obj, stream: BinaryIO, ids: Dict[int, int]):
+    """Serialize obj like PyPDF2 does, renumbering indirect references through ids"""
+    if isinstance(obj, IndirectObject):
+        stream.write(f"{ids[obj.idnum]} 0 R".encode('latin-1'))
+    elif isinstance(obj, StreamObject):
+        stream.write(b"<<\n")
+        for key, value in list(obj.items()):
+            if key == '/Length':
+                continue
+            key.write_to_stream(stream, None)
+            stream.write(b" ")
+            _write_object(value, stream, ids)
+            stream.write(b"\n")
+        stream.write(f"/Length {len(obj._data)}\n>>\nstream\n".encode('latin-1'))
+        stream.write(obj._data)
+        stream.write(b"\nendstream")
+    elif isinstance(obj, DictionaryObject):
+        stream.write(b"<<\n")
+        for key, value in list(obj.items()):
+            key.write_to_stream(stream, None)
+            stream.write(b" ")
+            _write_object(value, stream, ids)
+            stream.write(b"\n")
+        stream.write(b">>")
+    elif isinstance(obj, ArrayObject):
+        stream.write(b"[")
+        for value in obj:
+            stream.write(b" ")
+            _write_object(value, stream, ids)
+        stream.write(b" ]")
+    else:
+        obj.write_to_stream(stream, None)
+
+def _references(obj) -> Set[int]:
+    """Get the object numbers obj refers to directly"""
+    refs = set()
+    todo = [obj]
+    while todo:
+        item = todo.pop()
+        if isinstance(item, IndirectObject):
+            refs.add(item.idnum)
+        elif isinstance(item, DictionaryObject):
+            todo.extend(item.values())
+        elif isinstance(item, ArrayObject):
+            todo.extend(item)
+    return refs
+
+def _object_kind(obj) -> str:
+    """Classify an object for the dedup report"""
+    if not isinstance(obj, DictionaryObject):
+        return 'Other'
+    kind = obj.get('/Type')
+    subtype = obj.get('/Subtype')
+    if isinstance(obj, StreamObject):
+        if subtype == '/Image':
+            return 'Image'
+        if subtype == '/Form':
+            return 'Form'
+        if any(key in obj for key in ('/Length1', '/Length2', '/Length3')) \
+                or subtype in ('/Type1C', '/CIDFontType0C', '/OpenType'):
+            return 'FontFile'
+        if '/N' in obj and kind is None:
+            return 'ICCProfile'
+        return 'Stream'
+    if kind in ('/Font', '/FontDescriptor', '/ExtGState', '/Pattern', '/Annot'):
+        return kind[1:]
+    return 'Other'
+
+class StreamingPdfWriter:
+    """
+    PDF writer that flushes each input's objects as soon as it is appended.
+
+    Pages of one input are cloned into a scratch PdfWriter (so objects
+    shared between its pages are written once), serialized to the output
+    with new object numbers and then dropped, so only one input's objects
+    are ever held in memory. The page tree, catalog and cross-reference
+    table are written by close().
+
+    With dedup=True every object gets a content hash built bottom-up (its
+    serialization with references replaced by the hashes of their
+    targets), and an object identical to one already written - a font,
+    ICC profile or logo repeated across inputs - is replaced by a
+    reference to the first copy. Objects no longer reachable from a page
+    are not written, so object numbers stay dense.
+
+    Given a stream positioned at the end of an existing PDF and object
+    numbers past its /Size, the writer continues that file instead; see
+    operations.append.
+    """
+    def __init__(self, stream: BinaryIO, dedup: bool = False, catalog_id: int = CATALOG_ID,
+                 pages_id: int = PAGES_ID, info_id: int = INFO_ID, next_id: Optional[int] = None):
+        self.stream = stream
+        self.dedup = dedup
+        self.catalog_id = catalog_id
+        self.pages_id = pages_id
+        self.info_id = info_id
+        self._offsets: Dict[int, int] = {}
+        self._next_id = next_id or max(catalog_id, pages_id, info_id) + 1
+        self._kids: List[int] = []
+        self._written: Dict[bytes, int] = {}  # Content hash -> output object number
+        self.dedup_objects: Dict[str, int] = {}
+        self.dedup_bytes_saved: Dict[str, int] = {}
+        # A stream positioned past the start continues an existing file (an incremental update)
+        if self.stream.tell() == 0:
+            self.stream.write(b"%PDF-1.7\n%\xe2\xe3\xcf\xd3\n")
+
+    @property
+    def page_count(self) -> int:
+        return len(self._kids)
+
+    @property
+    def page_ids(self) -> List[int]:
+        """Output object numbers of the pages written so far"""
+        return list(self._kids)
+
+    def reserve(self) -> int:
+        """Allocate an object number for an object written later with write_object"""
+        self._next_id += 1
+        return self._next_id - 1
+
+    def write_object(self, object_id: int, obj):
+        """Write obj, whose references are already output object numbers"""
+        self._begin(object_id)
+        obj.write_to_stream(self.stream, None)
+        self._end()
+
+    def _begin(self, object_id: int):
+        self._offsets[object_id] = self.stream.tell()
+        self.stream.write(f"{object_id} 0 obj\n".encode('latin-1'))
+
+    def _end(self):
+        self.stream.write(b"\nendobj\n")
+
+    def _hashes(self, objects: Dict[int, object], fixed: Dict[int, str],
+                exclude: Set[int]) -> Dict[int, Optional[bytes]]:
+        """
+        Hash objects bottom-up. Excluded objects, objects on a reference
+        cycle and everything referring to them get None and are never collapsed.
+        """
+        hashes: Dict[int, Optional[bytes]] = {idnum: None for idnum in exclude}
+        refs = {idnum: _references(obj) for idnum, obj in objects.items()}
+        for root in objects:
+            if root in hashes:
+                continue
+            path = [root]
+            on_path = {root}
+            iterators = [iter(refs[root])]
+            while path:
+                child = next(iterators[-1], None)
+                if child is not None:
+                    if child in on_path:
+                        # A cycle: nothing from its start to here has a stable hash
+                        for idnum in path[path.index(child):]:
+                            hashes[idnum] = None
+                    elif child in objects and child not in hashes:
+                        path.append(child)
+                        on_path.add(child)
+                        iterators.append(iter(refs[child]))
+                    continue
+
+                idnum = path.pop()
+                on_path.discard(idnum)
+                iterators.pop()
+                if idnum in hashes:
+                    continue
+                children = refs[idnum]
+                if any(child in objects and hashes.get(child) is None for child in children):
+                    hashes[idnum] = None
+                    continue
+                tokens = dict(fixed)
+                tokens.update({child: hashes[child].hex() for child in children if child in objects})
+                buffer = BytesIO()
+                _write_object(objects[idnum], buffer, tokens)
+                hashes[idnum] = hashlib.sha256(buffer.getvalue()).digest()
+        return hashes
+
+    def _record_savings(self, objects: Dict[int, object], page_ids: List[int], kept: Set[int]):
+        """Count the objects reachable from the pages that dedup left out"""
+        reachable = set(page_ids)
+        todo = list(page_ids)
+        while todo:
+            for child in _references(objects[todo.pop()]):
+                if child in objects and child not in reachable:
+                    reachable.add(child)
+                    todo.append(child)
+        for idnum in reachable - kept:
+            obj = objects[idnum]
+            buffer = BytesIO()
+            _write_object(obj, buffer, {ref: 0 for ref in _references(obj)})
+            kind = _object_kind(obj)
+            self.dedup_objects[kind] = self.dedup_objects.get(kind, 0) + 1
+            self.dedup_bytes_saved[kind] = self.dedup_bytes_saved.get(kind, 0) + len(buffer.getvalue())
+
+    def append(self, reader: PdfReader, pages: Optional[List[int]] = None):
+        """Write pages of reader (all by default) to the output"""
+        part = PdfWriter()
+        for idx in (range(len(reader.pages)) if pages is None else pages):
+            part.add_page(reader.pages[idx])
+
+        ids = {part._pages.idnum: self.pages_id, part._root.idnum: self.catalog_id,
+               part._info.idnum: self.info_id}
+        objects = {idnum: obj for idnum, obj in enumerate(part._objects, 1)
+                   if idnum not in ids and obj is not None}
+        page_ids = [page.idnum for page in part._pages.get_object()['/Kids']]
+
+        hashes: Dict[int, Optional[bytes]] = {}
+        if self.dedup:
+            # Identical pages are still separate pages, and whatever points at
+            # a page belongs to this input
+            hashes = self._hashes(objects, {idnum: f"#{target}" for idnum, target in ids.items()},
+                                  set(page_ids))
+
+        # Walk from the pages so only reachable objects are written; a
+        # duplicate's subtree is already in the output and is not visited
+        keep = []
+        seen = set(page_ids)
+        todo = list(page_ids)
+        while todo:
+            idnum = todo.pop()
+            digest = hashes.get(idnum)
+            if digest is not None and digest in self._written:
+                ids[idnum] = self._written[digest]
+                continue
+            ids[idnum] = self._next_id
+            self._next_id += 1
+            if digest is not None:
+                self._written[digest] = ids[idnum]
+            keep.append(idnum)
+            for child in _references(objects[idnum]):
+                if child in objects and child not in seen:
+                    seen.add(child)
+                    todo.append(child)
+
+        if self.dedup:
+            self._record_savings(objects, page_ids, set(keep))
+
+        for idnum in sorted(keep, key=ids.get):
+            self._begin(ids[idnum])
+            _write_object(objects[idnum], self.stream, ids)
+            self._end()
+
+        self._kids.extend(ids[idnum] for idnum in page_ids)
+
+    def close(self, info: Optional[Dict[str, str]] = None):
+        """Write the page tree, catalog, info and cross-reference table"""
+        kids = ' '.join(f"{kid} 0 R" for kid in self._kids)
+        self._begin(self.pages_id)
+        self.stream.write(f"<< /Type /Pages /Count {len(self._kids)} /Kids [ {kids} ] >>".encode('latin-1'))
+        self._end()
+        self._begin(self.catalog_id)
+        self.stream.write(f"<< /Type /Catalog /Pages {self.pages_id} 0 R >>".encode('latin-1'))
+        self._end()
+        info_dict = DictionaryObject({NameObject('/Producer'): create_string_object('PyPDF2')})
+        for key, value in (info or {}).items():
+            info_dict[NameObject(key)] = create_string_object(value)
+        self.write_object(self.info_id, info_dict)
+        self.write_xref(DictionaryObject({
+            NameObject('/Root'): IndirectObject(self.catalog_id, 0, None),
+            NameObject('/Info'): IndirectObject(self.info_id, 0, None),
+        }))
+
+    def write_xref(self, trailer: DictionaryObject, prev: Optional[int] = None,
+                   as_stream: bool = False):
+        """
+        Write the cross-reference section for the objects written by this
+        writer, then startxref and %%EOF.
+
+        Args:
+            trailer: Trailer entries other than /Size and /Prev
+            prev: Offset of the previous cross-reference section, for an incremental update
+            as_stream: Write a cross-reference stream instead of a table
+        """
+        if as_stream:
+            self._write_xref_stream(trailer, prev)
+            return
+        xref_offset = self.stream.tell()
+        self.stream.write(b"xref\n")
+        entries = sorted(self._offsets.items())
+        if prev is None:
+            # A complete file lists every object, starting with the free head of object 0
+            self.stream.write(f"0 {self._next_id}\n0000000000 65535 f \n".encode('latin-1'))
+            for _, offset in entries:
+                self.stream.write(f"{offset:010d} 00000 n \n".encode('latin-1'))
+        else:
+            for run in _runs(entries):
+                self.stream.write(f"{run[0][0]} {len(run)}\n".encode('latin-1'))
+                for _, offset in run:
+                    self.stream.write(f"{offset:010d} 00000 n \n".encode('latin-1'))
+        trailer = DictionaryObject(trailer)
+        trailer[NameObject('/Size')] = NumberObject(self._next_id)
+        if prev is not None:
+            trailer[NameObject('/Prev')] = NumberObject(prev)
+        self.stream.write(b"trailer\n")
+        trailer.write_to_stream(self.stream, None)
+        self.stream.write(f"\nstartxref\n{xref_offset}\n%%EOF\n".encode('latin-1'))
+
+    def _write_xref_stream(self, trailer: DictionaryObject, prev: Optional[int]):
+        object_id = self.reserve()
+        xref_offset = self.stream.tell()
+        self._offsets[object_id] = xref_offset
+        entries = sorted(self._offsets.items())
+        width = max(4, (xref_offset.bit_length() + 7) // 8)
+        data = b''.join(b'\x01' + offset.to_bytes(width, 'big') + b'\x00\x00' for _, offset in entries)
+        xref = DecodedStreamObject()
+        xref.set_data(data)
+        xref = xref.flate_encode()
+        xref.update(trailer)
+        xref.update({
+            NameObject('/Type'): NameObject('/XRef'),
+            NameObject('/Size'): NumberObject(self._next_id),
+            NameObject('/W'): ArrayObject(NumberObject(w) for w in (1, width, 2)),
+            NameObject('/Index'): ArrayObject(NumberObject(n) for run in _runs(entries)
+                                              for n in (run[0][0], len(run))),
+        })
+        if prev is not None:
+            xref[NameObject('/Prev')] = NumberObject(prev)
+        self.write_object(object_id, xref)
+        self.stream.write(f"startxref\n{xref_offset}\n%%EOF\n".encode('latin-1'))
+
+def _runs(entries: List[tuple]) -> List[List[tuple]]:
+    """Group sorted (object number, offset) pairs into runs of consecutive object numbers"""
+    runs: List[List[tuple]] = []
+    for entry in entries:
+        if runs and runs[-1][-1][0] + 1 == entry[0]:
+            runs[-1].append(entry)
+        else:
+            runs.append([entry])
+    return runs
+
+def _load(path: str) -> PdfReader:
+    # A reader over the open file parses only the objects the selected pages use;
+    # given a path PdfReader would read the whole file into memory
+    reader = PdfReader(open(path, 'rb'))
+    if reader.is_encrypted:
+        raise ValueError(f"PDF is encrypted: {path}")
+    len(reader.pages)  # Build the page list off the writer thread
+    return reader
+
+def streaming_merge(pdf_files: List[str], output_path: str, max_open_inputs: int = 4,
+                    progress: Optional[Callable[[int, int], None]] = None,
+                    is_cancelled: Optional[Callable[[], bool]] = None,
+                    dedup: bool = False,
+                    pages: Optional[PageSelection] = None) -> Optional[MergeReport]:
+    """
+    Combine PDFs while holding at most max_open_inputs of them in memory.
+
+    Inputs are parsed ahead of the writer on background threads, up to
+    max_open_inputs at a time including the one being written, so reading
+    overlaps writing while peak memory depends on the window and not on the
+    number of inputs. Bookmarks and named destinations are not carried over.
+
+    Args:
+        pdf_files: Input PDFs in output order
+        output_path: Combined PDF to write
+        max_open_inputs: Maximum number of inputs parsed and held at once
+        progress: Called with (inputs done, total inputs)
+        is_cancelled: Polled between inputs
+        dedup: Collapse objects identical across inputs (see StreamingPdfWriter)
+        pages: Pages to take from each input (see resolve_page_ranges)
+
+    Returns:
+        MergeReport, or None if cancelled (the partial output is removed)
+    """
+    max_open_inputs = max(1, int(max_open_inputs))
+    report = MergeReport(max_open_inputs=max_open_inputs)
+    started = time.perf_counter()
+    pending = iter(pdf_files)
+    window = deque()
+    info = None
+    cancelled = False
+
+    with open(output_path, 'wb') as f, \
+            ThreadPoolExecutor(max_workers=max(1, max_open_inputs - 1)) as pool:
+        writer = StreamingPdfWriter(f, dedup=dedup)
+
+        def fill():
+            while len(window) < max_open_inputs:
+                path = next(pending, None)
+                if path is None:
+                    break
+                window.append(pool.submit(_load, path))
+
+        while True:
+            if is_cancelled and is_cancelled():
+                for future in window:
+                    future.cancel()
+                cancelled = True
+                break
+            fill()
+            if not window:
+                break
+            reader = window.popleft().result()
+            if info is None:
+                info = _document_info(reader)
+            writer.append(reader, pages[report.inputs] if pages else None)
+            reader.stream.close()
+            del reader
+
+            report.inputs += 1
+            report.sample_memory()
+            if progress:
+                progress(report.inputs, len(pdf_files))
+
+        if not cancelled:
+            writer.close(info)
+            report.pages = writer.page_count
+            if dedup:
+                report.dedup_objects = writer.dedup_objects
+                report.dedup_bytes_saved = writer.dedup_bytes_saved
+
+    if cancelled:
+        # Without its cross-reference table the partial output is not a PDF
+        os.remove(output_path)
+        return None
+    report.finish(started, output_path)
+    return report
+
+def resolve_page_ranges(pdf_files: List[str],
+                        page_ranges: Optional[List[Optional[str]]]) -> Optional[PageSelection]:
+    """
+    Turn per-input page range strings into page indices.
+
+    Only inputs with a range are opened, and only to count their pages.
+
+    Args:
+        pdf_files: Input PDFs
+        page_ranges: One range per input ("1-3,5", "last", "10-last"), or
+            None/"" for every page
+
+    Returns:
+        PageSelection, or None when every input is taken whole
+
+    Raises:
+        PageRangeError: If a range is malformed or beyond its document
+    """
+    if not page_ranges or not any(page_ranges):
+        return None
+    if len(page_ranges) != len(pdf_files):
+        raise ValueError(f"Expected one page range per input file, got {len(page_ranges)} "
+                         f"for {len(pdf_files)} files")
+    selection: PageSelection = []
+    for path, page_range in zip(pdf_files, page_ranges):
+        if not page_range:
+            selection.append(None)
+            continue
+        with open(path, 'rb') as f:
+            total_pages = len(PdfReader(f).pages)
+        selection.append(parse_page_range(str(page_range), total_pages))
+    return selection
+
+def _page_runs(pages) -> List[tuple]:
+    """Group sorted page indices into (first, last) runs of consecutive pages"""
+    runs = []
+    for page in pages:
+        if runs and runs[-1][1] + 1 == page:
+            runs[-1] = (runs[-1][0], page)
+        else:
+            runs.append((page, page))
+    return runs
+
+def _trim_toc(toc: list, new_numbers: Dict[int, int]) -> list:
+    """
+    Renumber a PyMuPDF table of contents for the pages in new_numbers
+    (old 1-based page -> new). Entries for other pages are dropped and
+    their children move up a level.
+    """
+    trimmed = []
+    ancestors = []  # (level, kept) of the entries enclosing the current one
+    for level, title, page in toc:
+        while ancestors and ancestors[-1][0] >= level:
+            ancestors.pop()
+        # Entries without a destination (page <= 0) are kept
+        kept = page in new_numbers or page <= 0
+        if kept:
+            depth = sum(1 for _, parent_kept in ancestors if parent_kept) + 1
+            trimmed.append([depth, title, new_numbers.get(page, page)])
+        ancestors.append((level, kept))
+    return trimmed
+
+class MergeBackend:
+    """
+    A way of combining PDFs.
+
+    Every backend keeps page order, page boxes and rotation, copies the
+    document info of the first input and reports its figures in a
+    MergeReport. Backends differ in speed, memory use and what else they
+    carry over; compare_backends checks them against each other.
+    """
+    name = ''
+
+    def __init__(self, max_open_inputs: int = 4, dedup: bool = False):
+        self.max_open_inputs = max_open_inputs
+        self.dedup = dedup
+
+    @staticmethod
+    def available() -> bool:
+        return True
+
+    def merge(self, pdf_files: List[str], output_path: str,
+              progress: Optional[ProgressCallback] = None,
+              is_cancelled: Optional[Callable[[], bool]] = None,
+              pages: Optional[PageSelection] = None) -> Optional[MergeReport]:
+        """
+        Combine pdf_files into output_path; returns None if cancelled.
+
+        pages limits each input to some of its pages; bookmarks to pages
+        left out are dropped.
+        """
+        raise NotImplementedError
+
+def _merger_outline(reader: PdfReader, outline: list, positions: Dict[int, int]) -> list:
+    """
+    Trim a PdfMerger outline to the pages in positions (input page index ->
+    merged page id). Bookmarks to other pages are dropped and their
+    children move up a level, as in FitzBackend; PdfMerger's own trimming
+    keeps such a parent with a dangling destination.
+    """
+    trimmed = []
+    dropped = False
+    for item in outline:
+        if isinstance(item, list):
+            children = _merger_outline(reader, item, positions)
+            if dropped or not trimmed:
+                trimmed.extend(children)
+            elif children:
+                trimmed.append(children)
+            continue
+        page = reader.get_destination_page_number(item)
+        dropped = page >= 0 and page not in positions
+        if not dropped:
+            if page >= 0:
+                item[NameObject('/Page')] = NumberObject(positions[page])
+            trimmed.append(item)
+    return trimmed
+
+class _PdfMerger(PdfMerger):
+    """PdfMerger whose bookmarks point at page objects rather than page indices"""
+    def _write_outline(self, outline=None, parent=None):
+        super()._write_outline(outline, parent)
+        if outline is None:
+            # PyPDF2 3.0 writes GoTo destinations as page numbers, which viewers
+            # (and a later merge of this output) cannot resolve
+            kids = self.output._pages.get_object()['/Kids']
+            outlines = self.output._root_object.get('/Outlines')
+            stack = [outlines.get_object().get('/First')] if outlines else []
+            while stack:
+                item = stack.pop()
+                if item is None:
+                    continue
+                item = item.get_object()
+                stack.extend((item.get('/Next'), item.get('/First')))
+                action = item.get('/A')
+                dest = action.get_object().get('/D') if action is not None else None
+                if isinstance(dest, ArrayObject) and dest and isinstance(dest[0], NumberObject):
+                    dest[0] = kids[int(dest[0])]
+
+class PyPDF2Backend(MergeBackend):
+    """PdfMerger: pure Python, keeps bookmarks, holds every input until written"""
+    name = 'pypdf2'
+
+    def merge(self, pdf_files, output_path, progress=None, is_cancelled=None, pages=None):
+        report = MergeReport(max_open_inputs=len(pdf_files))
+        started = time.perf_counter()
+        merger = _PdfMerger()
+        try:
+            for idx, pdf in enumerate(pdf_files):
+                if is_cancelled and is_cancelled():
+                    return None
+                if pages and pages[idx] is not None:
+                    # Merged pages get consecutive ids, which the outline points at
+                    reader = PdfReader(pdf)
+                    positions = {page: merger.id_count + position for position, page in enumerate(pages[idx])}
+                    merger.outline += _merger_outline(reader, reader.outline, positions)
+                    # PdfMerger takes page lists but mishandles them; runs work
+                    for first, last in _page_runs(pages[idx]):
+                        merger.append(reader, pages=(first, last + 1), import_outline=False)
+                else:
+                    merger.append(pdf)
+                report.inputs += 1
+                report.sample_memory()
+                if progress:
+                    progress(idx + 1, len(pdf_files))
+
+            info = _document_info(PdfReader(pdf_files[0])) if pdf_files else {}
+            if info:
+                merger.add_metadata(info)
+            report.pages = len(merger.pages)
+            merger.write(output_path)
+        finally:
+            merger.close()
+        report.finish(started, output_path)
+        return report
+
+class FitzBackend(MergeBackend):
+    """PyMuPDF insert_pdf: native speed, keeps bookmarks and links"""
+    name = 'fitz'
+
+    @staticmethod
+    def available() -> bool:
+        return find_spec('pymupdf') is not None or find_spec('fitz') is not None
+
+    def merge(self, pdf_files, output_path, progress=None, is_cancelled=None, pages=None):
+        try:
+            import pymupdf as fitz
+        except ImportError:
+            import fitz
+
+        report = MergeReport(max_open_inputs=1)
+        started = time.perf_counter()
+        output = fitz.open()
+        toc = []
+        info = {}
+        try:
+            for idx, pdf in enumerate(pdf_files):
+                if is_cancelled and is_cancelled():
+                    return None
+                with fitz.open(pdf) as source:
+                    if source.needs_pass:
+                        raise ValueError(f"PDF is encrypted: {pdf}")
+                    if idx == 0:
+                        info = {key: source.metadata.get(key[1:].lower()) for key in INFO_KEYS}
+                    offset = output.page_count
+                    selected = pages[idx] if pages and pages[idx] is not None \
+                        else range(source.page_count)
+                    # Bookmarks are rebuilt from the table of contents with new page numbers
+                    new_numbers = {page + 1: offset + position + 1
+                                   for position, page in enumerate(selected)}
+                    toc.extend(_trim_toc(source.get_toc(simple=True), new_numbers))
+                    if pages and pages[idx] is not None:
+                        for first, last in _page_runs(selected):
+                            output.insert_pdf(source, from_page=first, to_page=last)
+                    else:
+                        output.insert_pdf(source)
+                report.inputs += 1
+                report.sample_memory()
+                if progress:
+                    progress(idx + 1, len(pdf_files))
+
+            if toc:
+                output.set_toc(toc)
+            output.set_metadata({key[1:].lower(): value for key, value in info.items() if value})
+            report.pages = output.page_count
+            output.save(output_path, deflate=True)
+        finally:
+            output.close()
+        report.finish(started, output_path)
+        return report
+
+class StreamingBackend(MergeBackend):
+    """StreamingPdfWriter: flat memory, optional dedup, drops bookmarks"""
+    name = 'streaming'
+
+    def merge(self, pdf_files, output_path, progress=None, is_cancelled=None, pages=None):
+        return streaming_merge(pdf_files, output_path, self.max_open_inputs, progress,
+                               is_cancelled, dedup=self.dedup, pages=pages)
+
+# In order of preference for the default backend
+MERGE_BACKENDS: Dict[str, Type[MergeBackend]] = {
+    'fitz': FitzBackend,
+    'pypdf2': PyPDF2Backend,
+    'streaming': StreamingBackend,
+}
+
+def default_merge_backend() -> str:
+    """Get the fastest available backend that keeps bookmarks"""
+    for name in ('fitz', 'pypdf2'):
+        if MERGE_BACKENDS[name].available():
+            return name
+    return 'pypdf2'
+
+def get_merge_backend(name: Optional[str] = None, **options) -> MergeBackend:
+    """
+    Create a merge backend by name (the default backend if None).
+
+    Raises:
+        ValueError: If the backend is unknown or its library is not installed
+    """
+    name = name or default_merge_backend()
+    backend = MERGE_BACKENDS.get(name)
+    if backend is None:
+        raise ValueError(f"Unknown merge backend: {name}")
+    if not backend.available():
+        raise ValueError(f"Merge backend {name!r} is not available")
+    return backend(**options)
+
+def describe_pdf(path: str) -> dict:
+    """Summarize the page tree, outline and document info of a PDF for comparisons"""
+    reader = PdfReader(path)
+    pages = [(round(float(page.mediabox.width), 1), round(float(page.mediabox.height), 1),
+              page.rotation % 360) for page in reader.pages]
+
+    outline = []
+
+    def walk(items, level):
+        for item in items:
+            if isinstance(item, list):
+                walk(item, level + 1)
+            else:
+                # PdfMerger output resolves to page numbers rather than page references
+                page = item.page
+                number = int(page) if isinstance(page, int) else reader.get_destination_page_number(item)
+                outline.append((level, str(item.title), number))
+
+    walk(reader.outline, 1)
+    return {'pages': pages, 'outline': outline, 'metadata': _document_info(reader)}
+
+def compare_backends(pdf_files: List[str], backends: Optional[List[str]] = None,
+                     pages: Optional[PageSelection] = None) -> dict:
+    """
+    Combine the same inputs with several backends and compare the results.
+
+    Args:
+        pdf_files: Inputs to combine
+        backends: Backend names; defaults to every available backend that keeps bookmarks
+        pages: Pages to take from each input (see resolve_page_ranges)
+
+    Returns:
+        Dictionary with each backend's report and the differences from the first backend
+    """
+    backends = backends or [name for name in ('pypdf2', 'fitz') if MERGE_BACKENDS[name].available()]
+    result = {'backends': backends, 'reports': {}, 'differences': []}
+    descriptions = {}
+    with tempfile.TemporaryDirectory() as temp_dir:
+        for name in backends:
+            output_path = os.path.join(temp_dir, f"{name}.pdf")
+            report = get_merge_backend(name).merge(pdf_files, output_path, pages=pages)
+            result['reports'][name] = report.to_dict()
+            descriptions[name] = describe_pdf(output_path)
+
+    reference = backends[0]
+    expected = descriptions[reference]
+    for name in backends[1:]:
+        actual = descriptions[name]
+        if len(actual['pages']) != len(expected['pages']):
+            result['differences'].append(
+                f"{name}: {len(actual['pages'])} pages, {reference}: {len(expected['pages'])}")
+        else:
+            for idx, (a, b) in enumerate(zip(expected['pages'], actual['pages'])):
+                if a != b:
+                    result['differences'].append(f"{name}: page {idx + 1} is {b}, {reference}: {a}")
+        for key in ('outline', 'metadata'):
+            if actual[key] != expected[key]:
+                result['differences'].append(
+                    f"{name}: {key} {actual[key]!r} differs from {reference}: {expected[key]!r}")
+    return result
+
+def _merge_chunk(backend: str, options: dict, pdf_files: List[str], output_path: str,
+                 pages: Optional[PageSelection] = None) -> MergeReport:
+    """Worker entry point for tree_merge"""
+    return get_merge_backend(backend, **options).merge(pdf_files, output_path, pages=pages)
+
+def _chunks(items: list, size: int) -> List[list]:
+    return [items[idx:idx + size] for idx in range(0, len(items), size)]
+
+def tree_merge(pdf_files: List[str], output_path: str, backend: Optional[str] = None,
+               workers: Optional[int] = None, fan_in: int = 64,
+               progress: Optional[ProgressCallback] = None,
+               is_cancelled: Optional[Callable[[], bool]] = None,
+               temp_dir: Optional[str] = None, pages: Optional[PageSelection] = None,
+               **options) -> Optional[MergeReport]:
+    """
+    Combine PDFs in parallel as a merge tree.
+
+    The ordered inputs are cut into consecutive chunks of at most fan_in
+    files (smaller when needed to give every worker a chunk), each chunk is
+    merged into an intermediate PDF in a worker process, and rounds repeat
+    until one round fits in a single final merge. Chunks stay in order, so
+    global page order is preserved, and bookmarks survive whenever the
+    backend keeps them. Intermediates are spilled next to the output (or
+    under temp_dir) and always removed.
+
+    Args:
+        pdf_files: Input PDFs in output order
+        output_path: Combined PDF to write
+        backend: Merge backend name for every round (default backend if None)
+        workers: Worker processes (CPU count if None)
+        fan_in: Maximum number of documents merged by one task
+        progress: Called with (inputs done, total inputs) as leaf chunks finish
+        is_cancelled: Polled while waiting for workers
+        temp_dir: Where to spill intermediates
+        pages: Pages to take from each input (see resolve_page_ranges)
+        options: Passed to the backend (max_open_inputs, dedup)
+
+    Returns:
+        MergeReport, or None if cancelled
+    """
+    backend = backend or default_merge_backend()
+    workers = max(1, workers or os.cpu_count() or 1)
+    fan_in = max(2, int(fan_in))
+    total = len(pdf_files)
+
+    # Too few inputs to be worth a process pool
+    if workers == 1 or (total <= fan_in and total < workers * 2):
+        return get_merge_backend(backend, **options).merge(pdf_files, output_path, progress,
+                                                          is_cancelled, pages)
+
+    get_merge_backend(backend, **options)  # Fail on an unknown backend before spawning workers
+    started = time.perf_counter()
+    report = MergeReport(inputs=total, workers=workers, max_open_inputs=options.get('max_open_inputs', 4))
+    spill_dir = tempfile.mkdtemp(prefix='.merge-', dir=temp_dir or os.path.dirname(os.path.abspath(output_path)))
+    try:
+        level = list(pdf_files)
+        done_inputs = 0
+        with ProcessPoolExecutor(max_workers=workers,
+                                 mp_context=multiprocessing.get_context('spawn')) as executor:
+            while report.merge_levels == 1 or len(level) > fan_in:
+                # Leaf chunks are sized so every worker gets one even for modest inputs
+                size = min(fan_in, max(2, math.ceil(len(level) / workers)))
+                chunks = _chunks(level, size)
+                # Page selections apply to the inputs; intermediates are taken whole
+                selections = _chunks(pages, size) if pages and report.merge_levels == 1 \
+                    else [None] * len(chunks)
+                outputs = [os.path.join(spill_dir, f"{report.merge_levels}_{idx:06d}.pdf")
+                           for idx in range(len(chunks))]
+                futures = {executor.submit(_merge_chunk, backend, options, chunk, out, selection): idx
+                           for idx, (chunk, out, selection) in enumerate(zip(chunks, outputs, selections))}
+                running = set(futures)
+                while running:
+                    if is_cancelled and is_cancelled():
+                        for future in running:
+                            future.cancel()
+                        return None
+                    finished, running = wait(running, timeout=0.2, return_when=FIRST_COMPLETED)
+                    for future in finished:
+                        report.add_chunk(future.result())
+                        if report.merge_levels == 1:
+                            done_inputs += len(chunks[futures[future]])
+                            if progress:
+                                progress(done_inputs, total)
+
+                # Inputs of the previous round are intermediates that are no longer needed
+                if report.merge_levels > 1:
+                    for path in level:
+                        os.remove(path)
+                level = outputs
+                report.merge_levels += 1
+
+        if is_cancelled and is_cancelled():
+            return None
+        final = get_merge_backend(backend, **options).merge(level, output_path)
+        report.sample_memory()
+        report.add_chunk(final)
+        report.pages = final.pages
+        if progress:
+            progress(total, total)
+    finally:
+        shutil.rmtree(spill_dir, ignore_errors=True)
+
+    report.finish(started, output_path)
+    return report
@@ -1,5 +1,4 @@
 from PyPDF2 import PdfReader, PdfWriter
-from PyQt6.QtWidgets import QMessageBox, QLabel
 from typing import Dict, Any
 import os
 from datetime import datetime
@@ -78,7 +77,7 @@ class Metadata:
 
     def show_metadata_dialog(self, pdf_path: str) -> None:
         """Show metadata editing dialog with all standard PDF metadata fields"""
-        from PyQt6.QtWidgets import (QDialog, QFormLayout, QLineEdit, 
+        from PyQt6.QtWidgets import (QDialog, QFormLayout, QLineEdit, QLabel,
                                    QDialogButtonBox, QVBoxLayout)
         
         class MetadataDialog(QDialog):
@@ -157,7 +156,7 @@ class Metadata:
                 5000
             )
 
-    def edit_metadata(self, pdf_path: str, new_metadata: Dict[str, Any]) -> None:
+    def edit_metadata(self, pdf_path: str, new_metadata: Dict[str, Any]) -> bool:
         """
         Edit PDF metadata with validation and backup.
 
@@ -165,6 +164,9 @@ class Metadata:
             pdf_path: Path to the PDF file
             new_metadata: Dictionary of new metadata key-value pairs
 
+        Returns:
+            bool: True if the metadata was written
+
         Raises:
             MetadataError: If metadata editing fails
         """
@@ -205,22 +207,28 @@ class Metadata:
             os.replace(temp_file, pdf_path)
 
             # Update status
-            self.parent_window.show_status_message(
-                f"Metadata updated successfully! Backup created at: {backup_path}", 
-                5000
-            )
+            if self.parent_window:
+                self.parent_window.show_status_message(
+                    f"Metadata updated successfully! Backup created at: {backup_path}", 
+                    5000
+                )
+            return True
 
         except MetadataError as me:
-            self.parent_window.show_status_message(
-                f"Metadata validation error: {str(me)}",
-                5000
-            )
+            if self.parent_window:
+                self.parent_window.show_status_message(
+                    f"Metadata validation error: {str(me)}",
+                    5000
+                )
+            return False
 
         except Exception as e:
-            self.parent_window.show_status_message(
-                f"Metadata error: {str(e)}. Backup at: {backup_path}",
-                5000
-            )
+            if self.parent_window:
+                self.parent_window.show_status_message(
+                    f"Metadata error: {str(e)}. Backup at: {backup_path}",
+                    5000
+                )
+            return False
 
         finally:
             # Clean up temporary file if it exists
@@ -1,16 +1,16 @@
-from PyPDF2 import PdfMerger, PdfReader, PdfWriter
-from PyQt6.QtWidgets import QMessageBox, QApplication
-import pytesseract
-from pdf2image import convert_from_path
-import tempfile
+from PyPDF2 import PdfReader, PdfWriter
 import os
 
+from utils.utils import process_events
+
 class PDFOperations:
     def __init__(self, parent_window=None):
         self.parent_window = parent_window
 
     def perform_ocr(self, pdf_path):
-        """Perform OCR on a PDF file"""
+        """Perform OCR on a PDF file, writing <name>_ocr.pdf with a searchable text layer"""
+        from ocr.ocr_processor import OCRProcessor
+
         try:
             if not os.path.exists(pdf_path):
                 raise ValueError("PDF file does not exist")
@@ -21,65 +21,54 @@ class PDFOperations:
             if self.parent_window:
                 self.parent_window.show_status_message("Starting OCR...")
                 self.parent_window.update_status_label("Performing OCR")
-                self.parent_window.show_progress(0, 100)
-
-            # Convert PDF to images
-            images = convert_from_path(pdf_path)
-            total_pages = len(images)
-            
-            # Create temp directory for OCR output
-            with tempfile.TemporaryDirectory() as temp_dir:
-                output_pdf = os.path.join(temp_dir, "ocr_output.pdf")
-                
-                # Perform OCR on each page
-                for i, image in enumerate(images):
-                    if self.parent_window:
-                        progress = int((i + 1) / total_pages * 100)
-                        self.parent_window.show_progress(progress)
-                        self.parent_window.update_status_label(f"Processing page {i+1}/{total_pages}")
-                        QApplication.processEvents()
 
-                    text = pytesseract.image_to_pdf_or_hocr(image, extension='pdf')
-                    with open(output_pdf if i == 0 else os.path.join(temp_dir, f"page_{i}.pdf"), 'wb') as f:
-                        f.write(text)
-                
-                # Combine OCR pages
-                merger = PdfMerger()
-                for i in range(len(images)):
-                    page_path = output_pdf if i == 0 else os.path.join(temp_dir, f"page_{i}.pdf")
-                    merger.append(page_path)
-                
-                # Save final output
-                output_path = pdf_path.replace('.pdf', '_ocr.pdf')
-                merger.write(output_path)
-                merger.close()
-
-                if self.parent_window:
-                    self.parent_window.show_status_message("OCR completed successfully", 3000)
-                    self.parent_window.hide_progress()
-                
-                return output_path
+            # The original pages are kept and an invisible text layer is added in one pass
+            return OCRProcessor(self.parent_window).save_searchable_pdf(pdf_path)
                 
         except Exception as e:
             if self.parent_window:
                 self.parent_window.show_status_message(f"OCR error: {str(e)}", 5000)
                 self.parent_window.hide_progress()
             raise Exception(f"OCR failed: {str(e)}")
-    def combine_pdfs(self, pdf_files, output_file, progress_callback=None):
-        merger = PdfMerger()
-        
-        try:
-            for i, pdf in enumerate(pdf_files):
-                merger.append(pdf)
-                
-                # Update progress if callback provided
-                if progress_callback:
-                    progress_callback(i + 1, len(pdf_files))
-                    QApplication.processEvents()  # Ensure the UI updates during the operation
 
-            merger.write(output_file)
-            
+    def combine_pdfs(self, pdf_files, output_file, progress_callback=None, streaming=False,
+                     max_open_inputs=4, dedup=False, backend=None, workers=1, fan_in=64,
+                     append=False, compact_after=None, page_ranges=None):
+        """
+        Combine PDFs into output_file and return the MergeReport.
+
+        backend names one of operations.merge.MERGE_BACKENDS; by default the
+        fastest available one is used. streaming=True (or dedup=True, which
+        also collapses objects repeated across inputs) selects the streaming
+        backend, which writes each input out before consuming the next and
+        holds at most max_open_inputs at once but drops bookmarks. With
+        workers > 1 chunks of up to fan_in inputs are merged in parallel
+        processes and then concatenated.
+
+        With append=True and an existing output_file the inputs are added
+        to its end as an incremental update instead of rewriting it; once
+        compact_after updates are stacked the file is rewritten in full.
+
+        page_ranges gives one page range per input ("1-3", "last", None for
+        all pages); only the selected pages and what they use are read.
+        """
+        from operations.append import append_pdfs
+        from operations.merge import resolve_page_ranges, tree_merge
+
+        def progress(done, total):
+            if progress_callback:
+                progress_callback(done, total)
+                process_events()  # Ensure the UI updates during the operation
+
+        try:
+            pages = resolve_page_ranges(pdf_files, page_ranges)
+            if append and os.path.exists(output_file):
+                return append_pdfs(output_file, pdf_files, progress, dedup=dedup,
+                                   compact_after=compact_after, compact_backend=backend, pages=pages)
+            if backend is None and (streaming or dedup):
+                backend = 'streaming'
+            return tree_merge(pdf_files, output_file, backend, workers=workers, fan_in=fan_in,
+                              progress=progress, pages=pages, max_open_inputs=max_open_inputs,
+                              dedup=dedup)
         except Exception as e:
             raise Exception(f"Failed to combine PDFs: {str(e)}")
-        finally:
-            merger.close()
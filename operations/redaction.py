@@ -1,10 +1,11 @@
+import os
 import fitz
-from PyQt6.QtWidgets import QMessageBox, QApplication
 
 class Redaction:
     def __init__(self, parent_window=None):
         self.parent_window = parent_window
     def redact_pdf(self, pdf_path, redactions):
+        """Apply (page_num, rect) redactions in place; returns True on success"""
         try:
             doc = fitz.open(pdf_path)
             for page_num, rect in redactions:
@@ -16,9 +17,12 @@ class Redaction:
             doc.save(temp_file)
             doc.close()
 
-            import os
             os.replace(temp_file, pdf_path)
 
-            self.parent_window.show_status_message("PDF redacted successfully!", 3000)
+            if self.parent_window:
+                self.parent_window.show_status_message("PDF redacted successfully!", 3000)
+            return True
         except Exception as e:
-            self.parent_window.show_status_message(f"Redaction error: {str(e)}", 5000)
+            if self.parent_window:
+                self.parent_window.show_status_message(f"Redaction error: {str(e)}", 5000)
+            return False
@@ -1,5 +1,6 @@
+import os
 from PyPDF2 import PdfWriter, PdfReader
-from PyQt6.QtWidgets import QMessageBox, QApplication, QDialogButtonBox
+from PyPDF2.constants import UserAccessPermissions
 
 class Security:
     def __init__(self, parent_window=None):
@@ -33,14 +34,13 @@ class Security:
             if reader.is_encrypted:
                 raise ValueError("PDF is already encrypted")
 
-            # Set default permissions if none provided
-            if permissions is None:
-                permissions = {
-                    'printing': True,  # Allow printing
-                    'modify': False,   # Prevent modifications
-                    'copy': True,      # Allow copying text
-                    'annot-forms': True  # Allow annotations and form filling
-                }
+            # Set default permissions if none provided: allow printing, copying text,
+            # annotations and form filling, but prevent modifications
+            if permissions_flag is None:
+                permissions_flag = (UserAccessPermissions.PRINT |
+                                    UserAccessPermissions.EXTRACT |
+                                    UserAccessPermissions.ADD_OR_MODIFY |
+                                    UserAccessPermissions.FILL_FORM_FIELDS)
 
             writer = PdfWriter()
             writer.append_pages_from_reader(reader)
@@ -49,21 +49,24 @@ class Security:
             writer.encrypt(
                 user_password=password,
                 owner_password=password + "_owner",  # Different owner password
-                permissions_flag=permissions
+                permissions_flag=permissions_flag
             )
 
             temp_file = pdf_path + '.tmp'
             with open(temp_file, 'wb') as f:
                 writer.write(f)
 
-            import os
             os.replace(temp_file, pdf_path)
 
-            self.parent_window.show_status_message("PDF encrypted successfully!", 3000)
+            if self.parent_window:
+                self.parent_window.show_status_message("PDF encrypted successfully!", 3000)
             return True
             
         except ValueError as e:
-            self.parent_window.show_status_message(f"Encryption error: {str(e)}", 5000)
+            if self.parent_window:
+                self.parent_window.show_status_message(f"Encryption error: {str(e)}", 5000)
             return False
         except Exception as e:
-            self.parent_window.show_status_message(f"Encryption error: {str(e)}", 5000)
+            if self.parent_window:
+                self.parent_window.show_status_message(f"Encryption error: {str(e)}", 5000)
+            return False
@@ -0,0 +1,280 @@
+"""Watermark stamping through shared Form XObjects"""
+from io import BytesIO
+from typing import Optional, Dict, Tuple, Callable
+import os
+
+from PyPDF2 import PdfReader, PdfWriter
+from PyPDF2._page import PageObject
+from PyPDF2.generic import (ArrayObject, DecodedStreamObject, DictionaryObject, FloatObject,
+                            IndirectObject, NameObject)
+
+from utils.utils import page_content
+
+# Distance of corner positions from the page edges, in points
+MARGIN = 50
+
+# Display size of a page after /Rotate, in points
+DisplaySize = Tuple[float, float]
+
+def _place(position: str, width: float, height: float,
+           item_width: float, item_height: float) -> Tuple[float, float]:
+    """Get the lower-left corner of an item placed at a named position"""
+    if position == "Top Left":
+        return MARGIN, height - MARGIN - item_height
+    if position == "Top Right":
+        return width - item_width - MARGIN, height - MARGIN - item_height
+    if position == "Bottom Left":
+        return MARGIN, MARGIN
+    if position == "Bottom Right":
+        return width - item_width - MARGIN, MARGIN
+    return (width - item_width) / 2, (height - item_height) / 2
+
+class Stamp:
+    """
+    Something drawn over (or under) every page.
+
+    Subclasses render the overlay for a display size as a single-page PDF
+    whose MediaBox is (0, 0, width, height) in upright display coordinates;
+    the engine takes care of the page rotation and box origin.
+    """
+    def render(self, size: DisplaySize) -> PageObject:
+        raise NotImplementedError
+
+class _CanvasStamp(Stamp):
+    def render(self, size: DisplaySize) -> PageObject:
+        from reportlab.pdfgen import canvas
+
+        packet = BytesIO()
+        can = canvas.Canvas(packet, pagesize=size)
+        self.draw(can, *size)
+        can.save()
+        packet.seek(0)
+        return PdfReader(packet).pages[0]
+
+    def draw(self, can, width: float, height: float):
+        raise NotImplementedError
+
+class TextStamp(_CanvasStamp):
+    """Text drawn with Helvetica; color is a QColor or an (r, g, b) tuple of 0-1 floats"""
+    def __init__(self, text: str, font_size: float = 48, opacity: float = 0.5,
+                 rotation: float = 45, color=(0.5, 0.5, 0.5), position: str = "Center"):
+        if not text:
+            raise ValueError("Watermark text cannot be empty")
+        if hasattr(color, 'redF'):
+            color = (color.redF(), color.greenF(), color.blueF())
+        self.text = text
+        self.font_size = font_size
+        self.opacity = opacity
+        self.rotation = rotation
+        self.color = tuple(color)
+        self.position = position
+
+    def draw(self, can, width: float, height: float):
+        can.setFont("Helvetica", self.font_size)
+        can.setFillColorRGB(*self.color, self.opacity)
+        text_width = can.stringWidth(self.text, "Helvetica", self.font_size)
+        x, y = _place(self.position, width, height, text_width, 0)
+
+        can.saveState()
+        can.translate(x, y)
+        can.rotate(self.rotation)
+        can.drawString(0, 0, self.text)
+        can.restoreState()
+
+class ImageStamp(_CanvasStamp):
+    """An image scaled to a fraction of the page width, keeping its aspect ratio"""
+    def __init__(self, image_path: str, opacity: float = 0.5, scale: float = 0.5,
+                 rotation: float = 0, position: str = "Center"):
+        if not os.path.exists(image_path):
+            raise FileNotFoundError(f"Image file not found: {image_path}")
+        from reportlab.lib.utils import ImageReader
+        self.image = ImageReader(image_path)
+        self.opacity = opacity
+        self.scale = scale
+        self.rotation = rotation
+        self.position = position
+
+    def draw(self, can, width: float, height: float):
+        image_width, image_height = self.image.getSize()
+        draw_width = width * self.scale
+        draw_height = draw_width * image_height / image_width
+        x, y = _place(self.position, width, height, draw_width, draw_height)
+
+        can.saveState()
+        can.setFillAlpha(self.opacity)
+        # Rotate about the center of the image
+        can.translate(x + draw_width / 2, y + draw_height / 2)
+        can.rotate(self.rotation)
+        can.drawImage(self.image, -draw_width / 2, -draw_height / 2, draw_width, draw_height,
+                      mask='auto')
+        can.restoreState()
+
+class PdfPageStamp(Stamp):
+    """
+    A page of another PDF.
+
+    By default the page is placed at the lower-left corner at its own size,
+    like PageObject.merge_page; with fit=True it is scaled to fit the page
+    and centered.
+    """
+    def __init__(self, pdf_path: str, page_number: int = 0, fit: bool = False):
+        if not os.path.exists(pdf_path):
+            raise FileNotFoundError(f"Watermark file not found: {pdf_path}")
+        self.page = PdfReader(pdf_path).pages[page_number]
+        self.fit = fit
+
+    def render(self, size: DisplaySize) -> PageObject:
+        if not self.fit:
+            return self.page
+        box = self.page.mediabox
+        scale = min(size[0] / float(box.width), size[1] / float(box.height))
+        matrix = (scale, 0, 0, scale,
+                  (size[0] - float(box.width) * scale) / 2 - float(box.left) * scale,
+                  (size[1] - float(box.height) * scale) / 2 - float(box.bottom) * scale)
+        content = DecodedStreamObject()
+        content.set_data(f"q {' '.join(f'{v:g}' for v in matrix)} cm\n".encode('latin-1')
+                         + page_content(self.page) + b"\nQ\n")
+        page = PageObject.create_blank_page(width=size[0], height=size[1])
+        page[NameObject('/Contents')] = content
+        if '/Resources' in self.page:
+            page[NameObject('/Resources')] = self.page['/Resources']
+        return page
+
+class StampEngine:
+    """
+    Applies a Stamp to PDF pages without touching their content streams.
+
+    The overlay is rendered once per distinct display size and embedded in
+    each output as one shared Form XObject. Every page only gets two small
+    content streams appended around its existing ones: a shared "q" and a
+    "Q q <matrix> cm /Name Do Q" shared by all pages with the same box and
+    rotation. Output size therefore grows by a few bytes per page instead of
+    by a copy of the overlay.
+    """
+    def __init__(self, stamp: Stamp, under: bool = False):
+        self.stamp = stamp
+        self.under = under
+        self._overlays: Dict[DisplaySize, PageObject] = {}
+        self._reset()
+
+    def _reset(self):
+        # Objects below belong to the writer currently being stamped
+        self._writer: Optional[PdfWriter] = None
+        self._forms: Dict[DisplaySize, Tuple[NameObject, IndirectObject]] = {}
+        self._placements: Dict[tuple, IndirectObject] = {}
+        self._save_state: Optional[IndirectObject] = None
+
+    def _overlay(self, size: DisplaySize) -> PageObject:
+        if size not in self._overlays:
+            self._overlays[size] = self.stamp.render(size)
+        return self._overlays[size]
+
+    def _stream(self, writer: PdfWriter, data: bytes) -> IndirectObject:
+        stream = DecodedStreamObject()
+        stream.set_data(data)
+        return writer._add_object(stream)
+
+    def _form(self, writer: PdfWriter, size: DisplaySize) -> Tuple[NameObject, IndirectObject]:
+        if size not in self._forms:
+            overlay = self._overlay(size)
+            content = DecodedStreamObject()
+            content.set_data(page_content(overlay))
+            # flate_encode keeps only the filter, so the form keys are added afterwards
+            form = content.flate_encode()
+            form.update({
+                NameObject('/Type'): NameObject('/XObject'),
+                NameObject('/Subtype'): NameObject('/Form'),
+                NameObject('/BBox'): ArrayObject(FloatObject(v) for v in overlay.mediabox),
+            })
+            if '/Resources' in overlay:
+                form[NameObject('/Resources')] = overlay['/Resources'].clone(writer)
+            name = NameObject(f"/PdfcStamp{len(self._forms)}")
+            self._forms[size] = (name, writer._add_object(form))
+        return self._forms[size]
+
+    @staticmethod
+    def _matrix(box, rotation: int) -> Tuple[float, ...]:
+        """Map upright display coordinates onto the page's user space"""
+        x0, y0, x1, y1 = (float(v) for v in (box.left, box.bottom, box.right, box.top))
+        return {
+            0: (1, 0, 0, 1, x0, y0),
+            90: (0, 1, -1, 0, x1, y0),
+            180: (-1, 0, 0, -1, x1, y1),
+            270: (0, -1, 1, 0, x0, y1),
+        }[rotation]
+
+    def stamp_page(self, writer: PdfWriter, page: PageObject):
+        """Stamp a page that has already been added to writer"""
+        if writer is not self._writer:
+            self._reset()
+            self._writer = writer
+
+        box = page.cropbox
+        rotation = (int(page['/Rotate']) if '/Rotate' in page else 0) % 360 // 90 * 90
+        width, height = float(box.width), float(box.height)
+        size = (height, width) if rotation in (90, 270) else (width, height)
+        name, form = self._form(writer, size)
+
+        if '/Resources' not in page:
+            page[NameObject('/Resources')] = DictionaryObject()
+        resources = page['/Resources']
+        if '/XObject' not in resources:
+            resources[NameObject('/XObject')] = DictionaryObject()
+        # Resource dicts may be shared between pages; stamp names never collide with each other
+        resources['/XObject'][name] = form
+
+        placement_key = (tuple(float(v) for v in box), rotation, self.under)
+        if placement_key not in self._placements:
+            matrix = ' '.join(f"{v:g}" for v in self._matrix(box, rotation))
+            draw = f"q {matrix} cm {name} Do Q\n"
+            self._placements[placement_key] = self._stream(
+                writer, draw.encode('latin-1') if self.under else f"Q\n{draw}".encode('latin-1'))
+        if self._save_state is None:
+            self._save_state = self._stream(writer, b"q\n")
+
+        contents = page.get('/Contents')
+        if contents is None:
+            streams = []
+        elif isinstance(contents, ArrayObject):
+            streams = list(contents)
+        elif isinstance(contents, IndirectObject) and isinstance(contents.get_object(), ArrayObject):
+            streams = list(contents.get_object())
+        else:
+            streams = [contents]
+
+        if self.under:
+            streams.insert(0, self._placements[placement_key])
+        else:
+            # Isolate the page's graphics state so the stamp is drawn in default user space
+            streams = [self._save_state] + streams + [self._placements[placement_key]]
+        page[NameObject('/Contents')] = ArrayObject(streams)
+
+    def stamp_pdf(self, input_path: str, output_path: str,
+                  progress: Optional[Callable[[int, int], None]] = None,
+                  is_cancelled: Optional[Callable[[], bool]] = None) -> bool:
+        """
+        Write a stamped copy of input_path to output_path.
+
+        Args:
+            input_path: PDF to stamp
+            output_path: Where to write the result (may equal input_path only via a temp file)
+            progress: Called with (pages done, total pages)
+            is_cancelled: Polled between pages
+
+        Returns:
+            False if cancelled before writing, True otherwise
+        """
+        reader = PdfReader(input_path)
+        writer = PdfWriter()
+        total_pages = len(reader.pages)
+        for idx, page in enumerate(reader.pages):
+            if is_cancelled and is_cancelled():
+                return False
+            self.stamp_page(writer, writer.add_page(page))
+            if progress:
+                progress(idx + 1, total_pages)
+
+        with open(output_path, 'wb') as f:
+            writer.write(f)
+        self._reset()
+        return True
@@ -1,82 +1,61 @@
 import os
-from PyPDF2 import PdfReader, PdfWriter
-from PyQt6.QtWidgets import QMessageBox, QApplication
-from PyQt6.QtGui import QColor
+
+from utils.utils import process_events
 
 class Watermark:
     def __init__(self, parent_window=None):
         self.parent_window = parent_window
     def add_text_watermark(self, pdf_path, text, font_size, opacity, rotation, color, position):
+        """Stamp text on every page in place; color is a QColor or an (r, g, b) tuple of 0-1 floats"""
+        from operations.stamp import TextStamp
+        self.apply_stamp(pdf_path, lambda: TextStamp(text, font_size, opacity, rotation, color, position))
+
+    def add_image_watermark(self, pdf_path, image_path, opacity=0.5, scale=0.5, rotation=0,
+                            position="Center"):
+        """Stamp an image on every page in place, scaled to a fraction of the page width"""
+        from operations.stamp import ImageStamp
+        self.apply_stamp(pdf_path, lambda: ImageStamp(image_path, opacity, scale, rotation, position))
+
+    def add_pdf_watermark(self, pdf_path, watermark_path, page_number=0, fit=False):
+        """Stamp a page of another PDF on every page in place"""
+        from operations.stamp import PdfPageStamp
+        self.apply_stamp(pdf_path, lambda: PdfPageStamp(watermark_path, page_number, fit))
+
+    def apply_stamp(self, pdf_path, stamp):
+        """
+        Stamp every page of a PDF in place.
+
+        Args:
+            pdf_path: PDF to rewrite
+            stamp: A Stamp, a StampEngine to reuse its rendered overlays, or a
+                callable creating a Stamp (so its errors are reported here)
+        """
+        from operations.stamp import Stamp, StampEngine
         try:
             if not os.path.exists(pdf_path):
                 raise ValueError("PDF file does not exist")
                 
             if not pdf_path.lower().endswith('.pdf'):
                 raise ValueError("File must be a PDF")
-                
-            if not text:
-                raise ValueError("Watermark text cannot be empty")
+
+            if isinstance(stamp, StampEngine):
+                engine = stamp
+            else:
+                engine = StampEngine(stamp if isinstance(stamp, Stamp) else stamp())
                 
             if self.parent_window:
                 self.parent_window.show_status_message("Adding watermark...")
                 self.parent_window.update_status_label("Processing watermark")
                 self.parent_window.show_progress(0, 100)
 
-            from reportlab.pdfgen import canvas
-            from reportlab.lib.pagesizes import A4
-            from io import BytesIO
-
-            packet = BytesIO()
-            can = canvas.Canvas(packet, pagesize=A4)
-            can.setFont("Helvetica", font_size)
-            can.setFillColorRGB(color.redF(), color.greenF(), color.blueF(), opacity)
-
-            width, height = A4
-            text_width = can.stringWidth(text, "Helvetica", font_size)
-
-            if position == "Center":
-                x = (width - text_width) / 2
-                y = height / 2
-            elif position == "Top Left":
-                x = 50
-                y = height - 50
-            elif position == "Top Right":
-                x = width - text_width - 50
-                y = height - 50
-            elif position == "Bottom Left":
-                x = 50
-                y = 50
-            elif position == "Bottom Right":
-                x = width - text_width - 50
-                y = 50
-
-            can.saveState()
-            can.translate(x, y)
-            can.rotate(rotation)
-            can.drawString(0, 0, text)
-            can.restoreState()
-            can.save()
-
-            watermark_pdf = PdfReader(packet)
-            original_pdf = PdfReader(pdf_path)
-            output_pdf = PdfWriter()
-
-            total_pages = len(original_pdf.pages)
-            for i in range(total_pages):
+            def progress(done, total_pages):
                 if self.parent_window:
-                    progress = int((i + 1) / total_pages * 100)
-                    self.parent_window.show_progress(progress)
-                    self.parent_window.update_status_label(f"Processing page {i+1}/{total_pages}")
-                    QApplication.processEvents()
-
-                page = original_pdf.pages[i]
-                page.merge_page(watermark_pdf.pages[0])
-                output_pdf.add_page(page)
+                    self.parent_window.show_progress(int(done / total_pages * 100))
+                    self.parent_window.update_status_label(f"Processing page {done}/{total_pages}")
+                    process_events()
 
             temp_file = pdf_path + '.tmp'
-            with open(temp_file, 'wb') as f:
-                output_pdf.write(f)
-
+            engine.stamp_pdf(pdf_path, temp_file, progress)
             os.replace(temp_file, pdf_path)
 
             if self.parent_window:
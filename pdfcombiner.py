@@ -0,0 +1,407 @@
+# pdfcombiner.py
+"""
+Headless command line interface for server batch runs.
+
+    python pdfcombiner.py run jobs.yaml --workers 8 --manifest results.json
+
+A job spec is a JSON or YAML file holding a list of jobs (or a mapping with
+a "jobs" list). Each job mirrors a BatchOperation:
+
+    {"id": "merge", "type": "combine", "files": ["a.pdf", "b.pdf"],
+     "output_dir": "out", "settings": {}, "max_retries": 1}
+
+With --journal every job and its completed units of work are recorded in
+a SQLite journal; after a crash, "pdfcombiner.py resume JOURNAL" finishes
+the unfinished jobs without redoing completed work.
+
+With --cache, results are stored in a content-addressed cache and a job
+whose inputs and settings match an earlier run reuses its outputs; use
+"pdfcombiner.py cache stats|list|prune|clear" to inspect and trim it.
+OCR jobs run with --cache also keep the text of each OCRed page in an
+"ocr_pages" cache beside it, so pages reshuffled into other documents are
+not recognized again ("cache --ocr-pages -d DIR" inspects it). The GUI's
+store of rendered thumbnails and preview pages is "cache --thumbnails".
+
+Combine jobs use the fastest available merge backend unless settings name
+one ("merge_backend": "fitz", "pypdf2" or "streaming"); "pdfcombiner.py
+parity FILES" checks that the backends agree on page trees, outlines and
+metadata for those inputs, or for part of each with one "-r RANGE" per
+file. Very large combines can be split across processes with
+"merge_workers" (and "merge_fan_in", the most inputs merged by one task,
+default 64): chunks are merged in parallel and then concatenated in order.
+With "append_to": "NAME" a combine job adds its inputs to that file in
+output_dir as an incremental update (creating it on the first run) instead
+of writing a new timestamped output;
+"compact_after": N rewrites the file in full once N updates are stacked.
+"page_ranges" takes part of each input, one entry per file in order
+("1-3", null for every page, "last"), e.g. ["1-3", null, "last"].
+
+"pdfcombiner.py index FILES" adds PDFs to the full-text search index the
+GUI uses (text layers only; OCR adds its text as it runs) and
+"pdfcombiner.py search WORDS" lists the matching pages.
+
+Nothing on this path imports PyQt6.
+"""
+import argparse
+import json
+import os
+import signal
+import sys
+import threading
+from datetime import datetime
+from typing import List, Optional
+
+from batch.jobs import BatchOperation, JOB_RUNNERS, run_operation
+from batch.result_cache import default_cache_dir
+
+MANIFEST_VERSION = 1
+
+class SpecError(Exception):
+    """Raised when a job spec cannot be loaded"""
+    pass
+
+def load_job_spec(path: str) -> List[dict]:
+    """
+    Load jobs from a JSON or YAML spec file.
+
+    Args:
+        path: Path to a .json, .yaml or .yml file
+
+    Returns:
+        List of job dictionaries
+
+    Raises:
+        SpecError: If the file cannot be parsed or has no job list
+    """
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            if path.lower().endswith(('.yaml', '.yml')):
+                try:
+                    import yaml
+                except ImportError:
+                    raise SpecError("PyYAML is required for YAML job specs")
+                try:
+                    data = yaml.safe_load(f)
+                except yaml.YAMLError as e:
+                    raise SpecError(f"Could not read job spec {path}: {str(e)}")
+            else:
+                data = json.load(f)
+    except (OSError, ValueError) as e:
+        raise SpecError(f"Could not read job spec {path}: {str(e)}")
+
+    jobs = data.get('jobs') if isinstance(data, dict) else data
+    if not isinstance(jobs, list):
+        raise SpecError(f"Job spec {path} must contain a list of jobs")
+    return jobs
+
+def job_to_operation(job: dict, index: int, base_dir: str,
+                     cache_dir: Optional[str] = None) -> BatchOperation:
+    """Convert a job dictionary to a BatchOperation, resolving paths against the spec"""
+    operation_type = job.get('type')
+    if operation_type not in JOB_RUNNERS:
+        raise SpecError(f"Job {index}: unsupported type {operation_type!r}")
+    if not job.get('files'):
+        raise SpecError(f"Job {index}: no input files")
+
+    def resolve(path: str) -> str:
+        return os.path.normpath(os.path.join(base_dir, os.path.expanduser(path)))
+
+    settings = dict(job.get('settings', {}))
+    for key in ('watermark_file', 'image'):
+        if settings.get(key):
+            settings[key] = resolve(settings[key])
+
+    operation = BatchOperation(
+        operation_type=operation_type,
+        files=[resolve(f) for f in job['files']],
+        output_dir=resolve(job.get('output_dir', '.')),
+        settings=settings,
+        max_retries=int(job.get('max_retries', 0)),
+        job_id=str(job.get('id', index)),
+        cache_dir=cache_dir
+    )
+    return operation
+
+def _manifest_entry(operation: BatchOperation) -> dict:
+    status = operation.status
+    error = None
+    if status.startswith('failed'):
+        error = status.partition(': ')[2] or None
+        status = 'failed'
+    duration = None
+    if operation.start_time and operation.end_time:
+        duration = round((operation.end_time - operation.start_time).total_seconds(), 3)
+    return {
+        'id': operation.job_id,
+        'type': operation.operation_type,
+        'status': status,
+        'files': operation.files,
+        'outputs': operation.outputs,
+        'retries': operation.retry_count,
+        'started': operation.start_time.isoformat() if operation.start_time else None,
+        'finished': operation.end_time.isoformat() if operation.end_time else None,
+        'duration': duration,
+        'error': error,
+        'report': operation.report or None,
+    }
+
+def run_jobs(operations: List[BatchOperation], workers: int, cancel_event: threading.Event,
+             log=None, journal=None) -> None:
+    """Run operations in place, in a worker pool when workers > 1"""
+    def emit(event: dict):
+        if log:
+            log(event)
+
+    def file_progress(filename: str, percentage: int):
+        emit({'event': 'file_progress', 'file': filename, 'percentage': percentage})
+
+    if workers > 1:
+        from batch.parallel import ParallelExecutor
+
+        def on_finished(operation: BatchOperation, success: bool):
+            emit({'event': 'finished', 'id': operation.job_id, 'status': operation.status})
+
+        def on_retry(operation: BatchOperation):
+            if journal:
+                journal.set_status(operation, 'pending')
+            emit({'event': 'retry', 'id': operation.job_id, 'attempt': operation.retry_count + 1})
+
+        def on_error(message: str):
+            emit({'event': 'error', 'message': message})
+
+        for operation in ParallelExecutor(workers).run(
+                operations, file_progress, cancel_event.is_set, on_finished, on_retry, on_error):
+            operation.status = 'cancelled'
+        return
+
+    for operation in operations:
+        if cancel_event.is_set():
+            operation.status = 'cancelled'
+            continue
+        while True:
+            try:
+                success = run_operation(operation, file_progress, cancel_event.is_set)
+            except Exception as e:
+                emit({'event': 'error', 'message': f"Operation failed: {str(e)}"})
+                success = False
+            if success or cancel_event.is_set() or operation.retry_count >= operation.max_retries:
+                break
+            operation.retry_count += 1
+            if journal:
+                journal.set_status(operation, 'pending')
+            emit({'event': 'retry', 'id': operation.job_id, 'attempt': operation.retry_count + 1})
+        emit({'event': 'finished', 'id': operation.job_id, 'status': operation.status})
+
+def command_run(args) -> int:
+    """Run job specs and write the result manifest"""
+    operations = []
+    for spec in args.specs:
+        base_dir = os.path.dirname(os.path.abspath(spec))
+        for job in load_job_spec(spec):
+            operations.append(job_to_operation(job, len(operations), base_dir, args.cache))
+
+    journal = None
+    if args.journal:
+        from batch.journal import JobJournal
+        journal = JobJournal(args.journal)
+        for operation in operations:
+            journal.add(operation)
+
+    return execute(operations, args, journal)
+
+def command_resume(args) -> int:
+    """Finish the unfinished jobs recorded in a journal"""
+    from batch.journal import JobJournal
+    if not os.path.exists(args.journal):
+        raise SpecError(f"Journal not found: {args.journal}")
+    journal = JobJournal(args.journal)
+    return execute(journal.unfinished(), args, journal)
+
+def execute(operations: List[BatchOperation], args, journal=None) -> int:
+    """Run operations and write the result manifest"""
+    def log(event: dict):
+        if not args.quiet:
+            print(json.dumps(event), file=sys.stderr, flush=True)
+
+    cancel_event = threading.Event()
+    # First Ctrl+C cancels cleanly, the second one aborts
+    signal.signal(signal.SIGINT, lambda *_: (cancel_event.set(),
+                                              signal.signal(signal.SIGINT, signal.default_int_handler)))
+
+    started = datetime.now()
+    run_jobs(operations, args.workers, cancel_event, log, journal)
+    finished = datetime.now()
+
+    entries = [_manifest_entry(operation) for operation in operations]
+    summary = {}
+    for entry in entries:
+        summary[entry['status']] = summary.get(entry['status'], 0) + 1
+    manifest = {
+        'version': MANIFEST_VERSION,
+        'started': started.isoformat(),
+        'finished': finished.isoformat(),
+        'duration': round((finished - started).total_seconds(), 3),
+        'summary': summary,
+        'jobs': entries,
+    }
+    cache_dirs = sorted({operation.cache_dir for operation in operations if operation.cache_dir})
+    if cache_dirs:
+        from batch.result_cache import cache_for
+        manifest['cache'] = [cache_for(cache_dir).stats() for cache_dir in cache_dirs]
+
+    text = json.dumps(manifest, indent=2)
+    if args.manifest:
+        with open(args.manifest, 'w', encoding='utf-8') as f:
+            f.write(text + '\n')
+    else:
+        print(text)
+
+    if cancel_event.is_set():
+        return 130
+    return 0 if all(entry['status'] == 'completed' for entry in entries) else 1
+
+def _parse_size(text: str) -> int:
+    """Parse a size such as 500M or 2G into bytes"""
+    units = {'K': 1024, 'M': 1024 ** 2, 'G': 1024 ** 3, 'T': 1024 ** 4}
+    text = text.strip().upper().rstrip('B')
+    try:
+        if text and text[-1] in units:
+            return int(float(text[:-1]) * units[text[-1]])
+        return int(text)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid size: {text!r}")
+
+def command_cache(args) -> int:
+    """Inspect or trim the result cache, the per-page OCR cache or the thumbnail store"""
+    if args.thumbnails:
+        from ui.thumbnail_store import ThumbnailStore, DEFAULT_MAX_BYTES
+        cache = ThumbnailStore(args.dir, max_bytes=args.max_size or DEFAULT_MAX_BYTES)
+    elif args.ocr_pages:
+        from ocr.page_cache import PageCache, DEFAULT_MAX_BYTES
+        cache = PageCache(args.dir, max_bytes=args.max_size or DEFAULT_MAX_BYTES)
+    else:
+        from batch.result_cache import ResultCache, DEFAULT_MAX_BYTES
+        cache = ResultCache(args.dir or default_cache_dir(), max_bytes=args.max_size or DEFAULT_MAX_BYTES)
+    if args.action == 'stats':
+        result = cache.stats()
+    elif args.action == 'list':
+        result = cache.entries()
+    elif args.action == 'prune':
+        evicted, freed = cache.prune()
+        result = {'evicted': evicted, 'freed': freed, **cache.stats()}
+    else:
+        result = {'evicted': cache.clear(), **cache.stats()}
+    cache.close()
+    print(json.dumps(result, indent=2))
+    return 0
+
+def command_parity(args) -> int:
+    """Combine the inputs with several merge backends and report any differences"""
+    from operations.merge import compare_backends, resolve_page_ranges
+    from utils.utils import PageRangeError
+    page_ranges = None
+    if args.page_range:
+        page_ranges = [None if page_range == 'all' else page_range for page_range in args.page_range]
+    try:
+        pages = resolve_page_ranges(args.files, page_ranges)
+    except (PageRangeError, ValueError) as e:
+        raise SpecError(f"Invalid page ranges: {str(e)}")
+    result = compare_backends(args.files, args.backend, pages)
+    print(json.dumps(result, indent=2))
+    return 1 if result['differences'] else 0
+
+def command_index(args) -> int:
+    """Add PDFs to the search index, skipping those indexed as they are"""
+    from search.index import SearchIndex
+    index = SearchIndex(args.index)
+    failed = 0
+    for path in args.files:
+        try:
+            index.index_file(path)
+        except Exception as e:
+            print(f"pdfcombiner: could not index {path}: {str(e)}", file=sys.stderr)
+            failed += 1
+    result = index.stats()
+    index.close()
+    print(json.dumps(result, indent=2))
+    return 1 if failed else 0
+
+def command_search(args) -> int:
+    """Print the pages matching a query, best first"""
+    from search.index import SearchIndex
+    index = SearchIndex(args.index)
+    hits = index.search(' '.join(args.words), limit=args.limit)
+    index.close()
+    print(json.dumps([{'path': hit.path, 'page': hit.page + 1, 'source': hit.source,
+                       'score': round(hit.score, 3), 'snippet': hit.snippet} for hit in hits], indent=2))
+    return 0 if hits else 1
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog='pdfcombiner', description="Headless PDF batch processing")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    run_parser = subparsers.add_parser('run', help="Run JSON/YAML job specs")
+    run_parser.add_argument('specs', nargs='+', help="Job spec files")
+    run_parser.add_argument('-w', '--workers', type=int, default=os.cpu_count() or 1,
+                            help="Worker processes (1 runs jobs in-process)")
+    run_parser.add_argument('-m', '--manifest', help="Write the result manifest here instead of stdout")
+    run_parser.add_argument('-q', '--quiet', action='store_true', help="Do not log progress to stderr")
+    run_parser.add_argument('-j', '--journal', help="Record progress in this journal for resume")
+    run_parser.add_argument('-c', '--cache', nargs='?', const=default_cache_dir(), default=None,
+                            help="Reuse results from a content-addressed cache (default directory "
+                                 "if no path is given)")
+    run_parser.set_defaults(handler=command_run)
+
+    resume_parser = subparsers.add_parser('resume', help="Resume unfinished jobs from a journal")
+    resume_parser.add_argument('journal', help="Journal written by run --journal")
+    resume_parser.add_argument('-w', '--workers', type=int, default=os.cpu_count() or 1,
+                               help="Worker processes (1 runs jobs in-process)")
+    resume_parser.add_argument('-m', '--manifest', help="Write the result manifest here instead of stdout")
+    resume_parser.add_argument('-q', '--quiet', action='store_true', help="Do not log progress to stderr")
+    resume_parser.set_defaults(handler=command_resume)
+
+    cache_parser = subparsers.add_parser('cache', help="Inspect or prune the result cache")
+    cache_parser.add_argument('action', choices=('stats', 'list', 'prune', 'clear'))
+    cache_parser.add_argument('-d', '--dir', help="Cache directory (default depends on --ocr-pages and --thumbnails)")
+    cache_parser.add_argument('-p', '--ocr-pages', action='store_true',
+                              help="Act on the per-page OCR cache instead of the result cache")
+    cache_parser.add_argument('-t', '--thumbnails', action='store_true',
+                              help="Act on the GUI's store of rendered pages instead of the result cache")
+    cache_parser.add_argument('-s', '--max-size', type=_parse_size,
+                              help="Size budget for prune, e.g. 500M or 2G")
+    cache_parser.set_defaults(handler=command_cache)
+
+    parity_parser = subparsers.add_parser(
+        'parity', help="Check that merge backends produce equivalent page trees, outlines and metadata")
+    parity_parser.add_argument('files', nargs='+', help="PDFs to combine")
+    parity_parser.add_argument('-b', '--backend', action='append',
+                               help="Backend to compare (repeatable; default: all that keep bookmarks)")
+    parity_parser.add_argument('-r', '--page-range', action='append',
+                               help="Pages to take from each file, once per file in order "
+                                    "(e.g. 1-3, last; 'all' for every page)")
+    parity_parser.set_defaults(handler=command_parity)
+
+    index_parser = subparsers.add_parser('index', help="Add PDFs to the full-text search index")
+    index_parser.add_argument('files', nargs='+', help="PDFs to index")
+    index_parser.add_argument('-i', '--index', help="Index database (default: the GUI's)")
+    index_parser.set_defaults(handler=command_index)
+
+    search_parser = subparsers.add_parser('search', help="Find indexed pages containing every word")
+    search_parser.add_argument('words', nargs='+', help="Words to find; the last also matches as a prefix")
+    search_parser.add_argument('-i', '--index', help="Index database (default: the GUI's)")
+    search_parser.add_argument('-n', '--limit', type=int, default=20, help="Most hits to list")
+    search_parser.set_defaults(handler=command_search)
+
+    return parser
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Command line entry point"""
+    args = build_parser().parse_args(argv)
+    try:
+        return args.handler(args)
+    except SpecError as e:
+        print(f"pdfcombiner: {str(e)}", file=sys.stderr)
+        return 2
+
+if __name__ == "__main__":
+    sys.exit(main())
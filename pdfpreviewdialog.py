@@ -1,11 +1,25 @@
 """Preview PDF in a separate window"""
-from PyQt6.QtWidgets import QDialog, QVBoxLayout, QScrollArea
-from PyQt6.QtGui import QPixmap
-from PyQt6.QtCore import Qt
+import os
+
+from PyQt6.QtWidgets import QDialog, QVBoxLayout, QScrollArea, QLabel, QWidget, QMessageBox
+from PyQt6.QtGui import QPixmap, QPainter, QColor
+from PyQt6.QtCore import Qt, QRectF, QTimer
 import fitz
 
+from ui.thumbnails import page_image
+
+# Preview render scale (2 = 144 dpi), one of ui.thumbnail_store.ZOOM_LEVELS
+PREVIEW_ZOOM = 2
+
 class PDFPreviewDialog(QDialog):
-    def __init__(self, pdf_path, parent=None):
+    def __init__(self, pdf_path, parent=None, page=None, highlights=None, store=None):
+        """
+        Args:
+            pdf_path: PDF to show
+            page: 0-based page to scroll to
+            highlights: (x0, y0, x1, y1) rectangles in points to mark on that page
+            store: ui.thumbnail_store.ThumbnailStore to reuse rendered pages from
+        """
         super().__init__(parent)
         self.setWindowTitle(f"Preview - {os.path.basename(pdf_path)}")
         self.setMinimumSize(800, 600)
@@ -22,20 +36,26 @@ class PDFPreviewDialog(QDialog):
         self.scroll.setWidget(self.pages_container)
 
         self.setLayout(layout)
-        self.load_pdf(pdf_path)
+        self.store = store
+        self.page_labels = []
+        self.load_pdf(pdf_path, page, highlights or [])
+        if page is not None and page < len(self.page_labels):
+            # Positions are only known once the dialog is laid out
+            QTimer.singleShot(0, lambda: self.scroll.ensureWidgetVisible(self.page_labels[page], 0, 50))
 
-    def load_pdf(self, pdf_path):
+    def load_pdf(self, pdf_path, highlight_page=None, highlights=()):
         """Load and display PDF pages"""
         try:
-            doc = fitz.open(pdf_path)
-            for page_num in range(len(doc)):
-                page = doc.load_page(page_num)
-                pix = page.get_pixmap(matrix=fitz.Matrix(2, 2))  # Higher resolution for preview
+            with fitz.open(pdf_path) as doc:
+                page_count = len(doc)
+            for page_num in range(page_count):
+                # Higher resolution for preview
+                pixmap = QPixmap.fromImage(page_image(pdf_path, page_num, PREVIEW_ZOOM, self.store))
 
                 # Create QLabel for the page
                 label = QLabel()
-                pixmap = QPixmap()
-                pixmap.loadFromData(pix.tobytes())
+                if page_num == highlight_page and highlights:
+                    self.draw_highlights(pixmap, highlights)
                 label.setPixmap(pixmap)
                 label.setAlignment(Qt.AlignmentFlag.AlignCenter)
 
@@ -46,5 +66,16 @@ class PDFPreviewDialog(QDialog):
                 # Add to layout
                 self.pages_layout.addWidget(page_label)
                 self.pages_layout.addWidget(label)
+                self.page_labels.append(page_label)
         except Exception as e:
             QMessageBox.critical(self, "Error", f"Could not load PDF: {str(e)}")
+
+    def draw_highlights(self, pixmap, highlights):
+        """Mark search hits on a rendered page"""
+        painter = QPainter(pixmap)
+        painter.setPen(Qt.PenStyle.NoPen)
+        painter.setBrush(QColor(255, 220, 0, 110))
+        for x0, y0, x1, y1 in highlights:
+            painter.drawRect(QRectF(x0 * PREVIEW_ZOOM, y0 * PREVIEW_ZOOM,
+                                    (x1 - x0) * PREVIEW_ZOOM, (y1 - y0) * PREVIEW_ZOOM))
+        painter.end()
@@ -0,0 +1,333 @@
+"""Full-text search over the text of PDF pages, from their text layers and from OCR"""
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+import hashlib
+import os
+import queue
+import re
+import sqlite3
+import threading
+
+import fitz
+
+from ocr.classify import SOURCE_NATIVE, PageText
+from ocr.engine import PageData
+
+# Bump when a change to extraction makes indexed text stale
+SEARCH_INDEX_VERSION = 1
+
+# FTS rows are numbered document * PAGE_STRIDE + page, so a document's pages are one rowid range
+PAGE_STRIDE = 1 << 20
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS documents (
+    id INTEGER PRIMARY KEY,
+    file_hash TEXT UNIQUE NOT NULL,
+    pages INTEGER NOT NULL,
+    indexed TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY,
+    document INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS files_document ON files (document);
+CREATE TABLE IF NOT EXISTS layouts (
+    document INTEGER NOT NULL,
+    page INTEGER NOT NULL,
+    data TEXT NOT NULL,
+    PRIMARY KEY (document, page)
+);
+CREATE VIRTUAL TABLE IF NOT EXISTS page_text USING fts5(
+    text, source UNINDEXED, tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3 4'
+);
+"""
+
+SNIPPET_TOKENS = 12
+
+def default_search_index_path() -> str:
+    return os.environ.get('PDFCOMBINER_SEARCH_INDEX',
+                          os.path.join(os.path.expanduser('~'), '.cache', 'pdfcombiner', 'search.db'))
+
+def file_hash(path: str) -> str:
+    """SHA-256 of a file's content"""
+    sha = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            sha.update(chunk)
+    return sha.hexdigest()
+
+def query_terms(text: str) -> List[str]:
+    return re.findall(r'\w+', text)
+
+def fts_query(text: str) -> str:
+    """
+    Turn what a user typed into an FTS5 query matching pages with every word.
+
+    Words are quoted so punctuation and FTS operators are taken literally;
+    the last word also matches as a prefix, for search as you type.
+    """
+    terms = [f'"{term}"' for term in query_terms(text)]
+    if terms:
+        terms[-1] += '*'
+    return ' '.join(terms)
+
+@dataclass
+class SearchHit:
+    """A page matching a query"""
+    path: str
+    page: int          # 0-based
+    snippet: str       # Matching text with the terms in [brackets]
+    score: float       # bm25; lower is better
+    source: str        # ocr.classify SOURCE_NATIVE or SOURCE_OCR
+
+class SearchIndex:
+    """
+    SQLite FTS5 index of page text, keyed by file content hash and page.
+
+    Files are mapped to documents by content, so copies and renames share
+    their text, and an edited file is indexed again. Pages get their text
+    layer when a file is indexed and OCR text as OCRProcessor produces it;
+    OCRed pages keep their word boxes for highlights.
+    """
+    def __init__(self, path: Optional[str] = None):
+        self.path = os.path.abspath(path or default_search_index_path())
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(SCHEMA)
+        if self._conn.execute("PRAGMA user_version").fetchone()[0] != SEARCH_INDEX_VERSION:
+            self._conn.executescript(
+                "DELETE FROM documents; DELETE FROM files; DELETE FROM layouts; DELETE FROM page_text;"
+                f"PRAGMA user_version = {SEARCH_INDEX_VERSION};"
+            )
+        self._conn.commit()
+
+    def _execute(self, sql: str, params: tuple = ()) -> List[tuple]:
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+            self._conn.commit()
+            return rows
+
+    def _file(self, path: str) -> Optional[tuple]:
+        rows = self._execute("SELECT document, size, mtime_ns FROM files WHERE path = ?", (path,))
+        return rows[0] if rows else None
+
+    def _drop_if_unused(self, conn: sqlite3.Connection, document: Optional[int]):
+        """Delete a document no file points to any more"""
+        if document is not None and not conn.execute(
+                "SELECT 1 FROM files WHERE document = ? LIMIT 1", (document,)).fetchone():
+            conn.execute("DELETE FROM page_text WHERE rowid BETWEEN ? AND ?",
+                         (document * PAGE_STRIDE, (document + 1) * PAGE_STRIDE - 1))
+            conn.execute("DELETE FROM layouts WHERE document = ?", (document,))
+            conn.execute("DELETE FROM documents WHERE id = ?", (document,))
+
+    def is_current(self, path: str) -> bool:
+        """Whether the file is indexed as it is now on disk"""
+        path = os.path.abspath(path)
+        row = self._file(path)
+        if row is None:
+            return False
+        stat = os.stat(path)
+        return (row[1], row[2]) == (stat.st_size, stat.st_mtime_ns)
+
+    def index_file(self, path: str) -> bool:
+        """
+        Index the text layer of each page of a file, unless it is indexed as it is.
+
+        Files are recognized by size and modification time, then by content
+        hash, so only new content is extracted.
+
+        Returns:
+            Whether anything was extracted
+        """
+        path = os.path.abspath(path)
+        if self.is_current(path):
+            return False
+        previous = self._file(path)
+        stat = os.stat(path)
+        digest = file_hash(path)
+        rows = self._execute("SELECT id FROM documents WHERE file_hash = ?", (digest,))
+        pages = None
+        if not rows:
+            with fitz.open(path) as doc:
+                pages = [page.get_text() for page in doc]
+        with self._lock, self._conn:
+            # Another thread may have added the same content meanwhile
+            rows = rows or self._conn.execute(
+                "SELECT id FROM documents WHERE file_hash = ?", (digest,)).fetchall()
+            if rows:
+                document = rows[0][0]
+            else:
+                document = self._conn.execute(
+                    "INSERT INTO documents (file_hash, pages, indexed) VALUES (?, ?, ?)",
+                    (digest, len(pages), datetime.now().isoformat())
+                ).lastrowid
+                self._conn.executemany(
+                    "INSERT INTO page_text (rowid, text, source) VALUES (?, ?, ?)",
+                    [(document * PAGE_STRIDE + index, text, SOURCE_NATIVE)
+                     for index, text in enumerate(pages) if text.strip()]
+                )
+            self._conn.execute(
+                "INSERT OR REPLACE INTO files (path, document, size, mtime_ns) VALUES (?, ?, ?, ?)",
+                (path, document, stat.st_size, stat.st_mtime_ns)
+            )
+            if previous and previous[0] != document:
+                self._drop_if_unused(self._conn, previous[0])
+        return pages is not None
+
+    def add_pages(self, path: str, pages: Iterable[PageText]):
+        """Store recognized page text, replacing what the index has for those pages"""
+        path = os.path.abspath(path)
+        self.index_file(path)
+        document = self._file(path)[0]
+        with self._lock, self._conn:
+            for page in pages:
+                rowid = document * PAGE_STRIDE + page.index
+                self._conn.execute("DELETE FROM page_text WHERE rowid = ?", (rowid,))
+                self._conn.execute("INSERT INTO page_text (rowid, text, source) VALUES (?, ?, ?)",
+                                   (rowid, page.text, page.source))
+                if page.data is not None:
+                    self._conn.execute(
+                        "INSERT OR REPLACE INTO layouts (document, page, data) VALUES (?, ?, ?)",
+                        (document, page.index, page.data.to_json())
+                    )
+
+    def forget(self, path: str):
+        """Drop a file from the index"""
+        previous = self._file(os.path.abspath(path))
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM files WHERE path = ?", (os.path.abspath(path),))
+            self._drop_if_unused(self._conn, previous and previous[0])
+
+    def search(self, text: str, limit: int = 50, paths: Optional[Iterable[str]] = None) -> List[SearchHit]:
+        """
+        Find the pages matching every word of text, best first.
+
+        Args:
+            text: Words to find; the last may be incomplete
+            limit: Most hits to return
+            paths: Only search these files
+        """
+        query = fts_query(text)
+        if not query:
+            return []
+        files: Dict[int, List[str]] = {}
+        if paths is None:
+            rows = self._execute("SELECT document, path FROM files")
+        else:
+            paths = [os.path.abspath(path) for path in paths]
+            rows = self._execute(
+                f"SELECT document, path FROM files WHERE path IN ({','.join('?' * len(paths))})",
+                tuple(paths)) if paths else []
+        for document, path in rows:
+            files.setdefault(document, []).append(path)
+        if not files:
+            return []
+        sql = ("SELECT rowid, source, snippet(page_text, 0, '[', ']', '...', ?), bm25(page_text) "
+               "FROM page_text WHERE page_text MATCH ?")
+        params = [SNIPPET_TOKENS, query]
+        if paths is not None:
+            sql += f" AND rowid / {PAGE_STRIDE} IN ({','.join('?' * len(files))})"
+            params.extend(files)
+        sql += " ORDER BY rank LIMIT ?"
+        params.append(limit)
+        hits = []
+        for rowid, source, snippet, score in self._execute(sql, tuple(params)):
+            for path in files.get(rowid // PAGE_STRIDE, ()):
+                hits.append(SearchHit(path, rowid % PAGE_STRIDE, ' '.join(snippet.split()), score, source))
+        return hits[:limit]
+
+    def highlights(self, hit: SearchHit, text: str) -> List[Tuple[float, float, float, float]]:
+        """
+        Locate the query's words on a hit's page.
+
+        OCRed pages use their stored word boxes; text layer pages are
+        searched with PyMuPDF.
+
+        Returns:
+            (x0, y0, x1, y1) rectangles in points on the page as displayed
+            (rotation applied, origin top left)
+        """
+        terms = [term.lower() for term in query_terms(text)]
+        if not terms:
+            return []
+        row = self._file(hit.path)
+        layout = row and self._execute("SELECT data FROM layouts WHERE document = ? AND page = ?",
+                                       (row[0], hit.page))
+        with fitz.open(hit.path) as doc:
+            page = doc[hit.page]
+            rect = page.rect
+            if layout:
+                data = PageData.from_json(layout[0][0])
+                scale_x = rect.width / data.size[0]
+                scale_y = rect.height / data.size[1]
+                return [(word.left * scale_x, word.top * scale_y,
+                         (word.left + word.width) * scale_x, (word.top + word.height) * scale_y)
+                        for word in data.words if any(term in word.text.lower() for term in terms)]
+            matrix = page.rotation_matrix
+            return [tuple(found * matrix) for term in terms for found in page.search_for(term)]
+
+    def stats(self) -> Dict[str, object]:
+        documents, = self._execute("SELECT COUNT(*) FROM documents")[0]
+        files, = self._execute("SELECT COUNT(*) FROM files")[0]
+        pages, = self._execute("SELECT COUNT(*) FROM page_text")[0]
+        return {
+            'path': self.path,
+            'documents': documents,
+            'files': files,
+            'pages': pages,
+            'size': os.path.getsize(self.path),
+        }
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+class BackgroundIndexer:
+    """
+    Keeps a SearchIndex up to date from a background thread.
+
+    Queued files are indexed one at a time; files already indexed as they
+    are on disk cost only a stat, so callers can re-queue every open file
+    to pick up edits.
+    """
+    def __init__(self, index: SearchIndex, on_error: Optional[Callable[[str, Exception], None]] = None):
+        self.index = index
+        self.on_error = on_error
+        self._queue: 'queue.Queue[Optional[str]]' = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name='search-indexer', daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while True:
+            path = self._queue.get()
+            try:
+                if path is None:
+                    return
+                self.index.index_file(path)
+            except Exception as e:
+                if self.on_error:
+                    self.on_error(path, e)
+            finally:
+                self._queue.task_done()
+
+    def enqueue(self, paths: Iterable[str]):
+        for path in paths:
+            self._queue.put(path)
+
+    @property
+    def pending(self) -> int:
+        """Files queued or being indexed"""
+        return self._queue.unfinished_tasks
+
+    def wait(self):
+        """Block until the queue is empty"""
+        self._queue.join()
+
+    def stop(self):
+        self._queue.put(None)
+        self._thread.join()
@@ -0,0 +1,105 @@
+"""Search the text of indexed PDFs"""
+import os
+import time
+
+from PyQt6.QtWidgets import (
+    QDialog,
+    QVBoxLayout,
+    QLineEdit,
+    QLabel,
+    QListWidget,
+    QListWidgetItem,
+    QCheckBox,
+)
+from PyQt6.QtCore import Qt, QTimer
+
+from pdfpreviewdialog import PDFPreviewDialog
+
+# Pause after typing before searching, in milliseconds
+SEARCH_DELAY = 150
+# How often to check on background indexing, in milliseconds
+INDEXING_POLL = 500
+
+class SearchDialog(QDialog):
+    def __init__(self, index, indexer, paths, parent=None, store=None):
+        """
+        Args:
+            index: search.index.SearchIndex to query
+            indexer: BackgroundIndexer keeping it current
+            paths: Files open in the main window
+            store: ui.thumbnail_store.ThumbnailStore for previews
+        """
+        super().__init__(parent)
+        self.setWindowTitle("Search PDFs")
+        self.setMinimumSize(600, 450)
+        self.index = index
+        self.indexer = indexer
+        self.paths = paths
+        self.store = store
+
+        layout = QVBoxLayout()
+
+        # Query
+        self.query_edit = QLineEdit()
+        self.query_edit.setPlaceholderText("Words to find")
+        self.query_edit.textChanged.connect(lambda: self.search_timer.start(SEARCH_DELAY))
+        layout.addWidget(self.query_edit)
+
+        self.open_only_check = QCheckBox("Only files open in the window")
+        self.open_only_check.setChecked(True)
+        self.open_only_check.toggled.connect(self.run_search)
+        layout.addWidget(self.open_only_check)
+
+        # Hits, one per page
+        self.results_list = QListWidget()
+        self.results_list.setWordWrap(True)
+        self.results_list.itemActivated.connect(self.open_hit)
+        layout.addWidget(self.results_list)
+
+        self.status_label = QLabel()
+        layout.addWidget(self.status_label)
+
+        self.setLayout(layout)
+
+        self.search_timer = QTimer(self)
+        self.search_timer.setSingleShot(True)
+        self.search_timer.timeout.connect(self.run_search)
+
+        # Search again as background indexing catches up
+        self.indexing_timer = QTimer(self)
+        self.indexing_timer.timeout.connect(self.check_indexing)
+        self.indexing_timer.start(INDEXING_POLL)
+        self.was_indexing = False
+        self.check_indexing()
+
+    def check_indexing(self):
+        pending = self.indexer.pending
+        if pending:
+            self.status_label.setText(f"Indexing {pending} file(s)...")
+        elif self.was_indexing:
+            self.run_search()
+        self.was_indexing = bool(pending)
+
+    def run_search(self):
+        """Search for the current query and list the hits"""
+        text = self.query_edit.text()
+        started = time.perf_counter()
+        hits = self.index.search(text, paths=self.paths if self.open_only_check.isChecked() else None)
+        elapsed = (time.perf_counter() - started) * 1000
+
+        self.results_list.clear()
+        for hit in hits:
+            item = QListWidgetItem(f"{os.path.basename(hit.path)} - page {hit.page + 1}\n{hit.snippet}")
+            item.setData(Qt.ItemDataRole.UserRole, hit)
+            item.setToolTip(hit.path)
+            self.results_list.addItem(item)
+        if text.strip() and not self.indexer.pending:
+            self.status_label.setText(f"{len(hits)} hit(s) in {elapsed:.1f} ms")
+
+    def open_hit(self, item):
+        """Preview the file at the hit's page with the words marked"""
+        hit = item.data(Qt.ItemDataRole.UserRole)
+        highlights = self.index.highlights(hit, self.query_edit.text())
+        preview = PDFPreviewDialog(hit.path, self, page=hit.page, highlights=highlights,
+                                   store=self.store)
+        preview.exec()
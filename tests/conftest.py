@@ -0,0 +1,103 @@
+"""Shared fixtures: small PDFs generated with PyMuPDF"""
+import os
+import sys
+
+import fitz
+import pytest
+
+# The modules are run from the repository root rather than installed
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ocr.engine import OCR_ENGINES, OCREngine, OCRWord, PageData
+
+def make_pdf(path: str, pages: int = 3, label: str = 'Page', multi_stream: bool = False,
+             size=(595, 842), toc=None) -> str:
+    """
+    Write a PDF whose pages read "<label> <n>".
+
+    With multi_stream, each page gets a second text run in another font and
+    a rectangle, which PyMuPDF adds as separate content streams. toc is a
+    PyMuPDF table of contents: [level, title, 1-based page] entries.
+    """
+    doc = fitz.open()
+    for number in range(1, pages + 1):
+        page = doc.new_page(width=size[0], height=size[1])
+        page.insert_text((72, 72), f"{label} {number}", fontname='helv', fontsize=24)
+        if multi_stream:
+            page.insert_text((72, 120), f"{label} {number} again", fontname='cour')
+            page.draw_rect(fitz.Rect(50, 50, 150, 150))
+    if toc:
+        doc.set_toc(toc)
+    doc.save(path)
+    doc.close()
+    return path
+
+def make_scanned_pdf(path: str, kinds: str = 'ssts', rotate: int = 0) -> str:
+    """
+    Write a PDF with one page per letter of kinds.
+
+    's' is a scan: an image of text with no text layer; 't' is a page of
+    text; 'b' is blank. Page n of either kind shows "Page <n> ...".
+    """
+    doc = fitz.open()
+    for number, kind in enumerate(kinds, 1):
+        page = doc.new_page()
+        if kind == 'b':
+            continue
+        if kind == 't':
+            page.insert_text((72, 72), f"Page {number} has a text layer of its own")
+            continue
+        with fitz.open() as scratch:
+            scratch.new_page().insert_text((72, 72), f"Page {number} was scanned", fontsize=24)
+            pixmap = scratch[0].get_pixmap(dpi=72, colorspace=fitz.csGRAY)
+        page.insert_image(page.rect, pixmap=pixmap)
+        page.set_rotation(rotate)
+    doc.save(path)
+    doc.close()
+    return path
+
+def outline(path: str):
+    """Bookmarks as [level, title, 1-based page] entries"""
+    with fitz.open(path) as doc:
+        return [entry[:3] for entry in doc.get_toc()]
+
+def page_texts(path: str):
+    with fitz.open(path) as doc:
+        return [page.get_text().strip() for page in doc]
+
+@pytest.fixture
+def pdf_factory(tmp_path):
+    """Make PDFs in the test's temporary directory by name"""
+    def factory(name: str = 'doc.pdf', **kwargs) -> str:
+        return make_pdf(str(tmp_path / name), **kwargs)
+    return factory
+
+class FakeOCREngine(OCREngine):
+    """
+    Stands in for tesseract: every image reads as one word, "Scanned",
+    in a box over the top left of the image.
+
+    Images are recorded in calls; confidence maps an image to the word's
+    confidence.
+    """
+    name = 'fake'
+    calls = []
+    confidence = staticmethod(lambda image: 90.0)
+
+    def text(self, image) -> str:
+        self.calls.append(image.size)
+        return "Scanned\n"
+
+    def data(self, image) -> PageData:
+        self.calls.append(image.size)
+        width, height = image.size
+        word = OCRWord('Scanned', self.confidence(image), width // 10, height // 10,
+                       width // 4, height // 20, (1, 1, 1))
+        return PageData([word], image.size)
+
+@pytest.fixture
+def fake_ocr(monkeypatch):
+    """Register FakeOCREngine as the 'fake' OCR engine, with no calls recorded"""
+    monkeypatch.setitem(OCR_ENGINES, 'fake', FakeOCREngine)
+    monkeypatch.setattr(FakeOCREngine, 'calls', [])
+    return FakeOCREngine
@@ -0,0 +1,104 @@
+import os
+
+import pytest
+
+from batch.jobs import BatchOperation, run_operation
+from batch.journal import JobJournal
+from operations.append import append_pdfs, compact_pdf, count_updates
+from tests.conftest import outline, page_texts
+
+def _run(operation):
+    return run_operation(operation, lambda name, percent: None, lambda: False)
+
+def test_append_keeps_existing_bytes_and_bookmarks(pdf_factory):
+    target = pdf_factory('target.pdf', pages=2, label='A', toc=[[1, 'A', 1]])
+    addition = pdf_factory('b.pdf', pages=2, label='B', toc=[[1, 'B', 1], [2, 'B2', 2]])
+    with open(target, 'rb') as f:
+        original = f.read()
+
+    report = append_pdfs(target, [addition])
+    assert (report.pages, report.incremental_updates) == (2, 1)
+    with open(target, 'rb') as f:
+        assert f.read().startswith(original)
+    assert page_texts(target) == ['A 1', 'A 2', 'B 1', 'B 2']
+    assert outline(target) == [[1, 'A', 1], [1, 'B', 3], [2, 'B2', 4]]
+    assert count_updates(target) == 1
+
+def test_append_page_ranges(pdf_factory):
+    target = pdf_factory('target.pdf', pages=1, label='A')
+    addition = pdf_factory('b.pdf', pages=3, label='B')
+    append_pdfs(target, [addition], pages=[[2, 0]])
+    assert page_texts(target) == ['A 1', 'B 3', 'B 1']
+
+def test_cancelled_append_restores_the_file(pdf_factory):
+    target = pdf_factory('target.pdf', pages=1)
+    size = os.path.getsize(target)
+    assert append_pdfs(target, [pdf_factory('b.pdf')], is_cancelled=lambda: True) is None
+    assert os.path.getsize(target) == size
+
+def test_failed_append_restores_the_file(pdf_factory, tmp_path):
+    target = pdf_factory('target.pdf', pages=1)
+    size = os.path.getsize(target)
+    with pytest.raises(Exception):
+        append_pdfs(target, [pdf_factory('b.pdf'), str(tmp_path / 'missing.pdf')])
+    assert os.path.getsize(target) == size
+    assert page_texts(target) == ['Page 1']
+
+def test_compact_after(pdf_factory):
+    target = pdf_factory('target.pdf', pages=1, label='A')
+    addition = pdf_factory('b.pdf', pages=1, label='B')
+    append_pdfs(target, [addition])
+    report = append_pdfs(target, [addition], compact_after=2)
+    assert report.compacted and count_updates(target) == 0
+    assert page_texts(target) == ['A 1', 'B 1', 'B 1']
+
+def _journaled_append(tmp_path, target, files, **settings):
+    journal = JobJournal(str(tmp_path / 'journal.db'))
+    operation = BatchOperation('combine', files, os.path.dirname(target),
+                               dict(settings, append_to=os.path.basename(target)))
+    journal.add(operation)
+    return journal, operation
+
+def test_resume_after_interrupted_append(pdf_factory, tmp_path):
+    target = pdf_factory('target.pdf', pages=1, label='A')
+    addition = pdf_factory('b.pdf', pages=1, label='B')
+    journal, operation = _journaled_append(tmp_path, target, [addition])
+    # The first run recorded the original length, then died halfway through writing
+    journal.mark_unit(operation.journal_id, f"append_base:{os.path.getsize(target)}")
+    with open(target, 'ab') as f:
+        f.write(b"1 0 obj\n<< /Partial")
+
+    [resumed] = journal.unfinished()
+    assert _run(resumed)
+    assert page_texts(target) == ['A 1', 'B 1']
+    assert count_updates(target) == 1
+
+def test_resume_after_compaction(pdf_factory, tmp_path):
+    target = pdf_factory('target.pdf', pages=1, label='A')
+    addition = pdf_factory('b.pdf', pages=2, label='B')
+    journal, operation = _journaled_append(tmp_path, target, [addition], compact_after=1)
+    base_size = os.path.getsize(target)
+    journal.mark_unit(operation.journal_id, f"append_base:{base_size}")
+    # The first run appended and compacted, then died before recording the output
+    append_pdfs(target, [addition])
+    journal.mark_unit(operation.journal_id, 'appended')
+    compact_pdf(target)
+    assert os.path.getsize(target) > base_size
+
+    [resumed] = journal.unfinished()
+    assert _run(resumed)
+    assert page_texts(target) == ['A 1', 'B 1', 'B 2']
+    assert resumed.outputs == [target]
+
+def test_append_job_creates_then_extends(pdf_factory, tmp_path):
+    addition = pdf_factory('b.pdf', pages=1, label='B')
+    out = str(tmp_path / 'out')
+    for _ in range(3):
+        assert _run(BatchOperation('combine', [addition], out, {'append_to': 'grow.pdf', 'compact_after': 3}))
+    target = os.path.join(out, 'grow.pdf')
+    assert page_texts(target) == ['B 1'] * 3
+    assert count_updates(target) == 2
+    operation = BatchOperation('combine', [addition], out, {'append_to': 'grow.pdf', 'compact_after': 3})
+    assert _run(operation)
+    assert operation.report['compacted'] and count_updates(target) == 0
+    assert page_texts(target) == ['B 1'] * 4
@@ -0,0 +1,52 @@
+import json
+
+import pytest
+
+from pdfcombiner import SpecError, job_to_operation, load_job_spec, main
+from tests.conftest import page_texts
+
+def test_load_json_and_yaml_specs(tmp_path):
+    job = {'type': 'split', 'files': ['a.pdf']}
+    (tmp_path / 'jobs.json').write_text(json.dumps({'jobs': [job]}))
+    (tmp_path / 'jobs.yaml').write_text("- type: split\n  files: [a.pdf]\n")
+    assert load_job_spec(str(tmp_path / 'jobs.json')) == [job]
+    assert load_job_spec(str(tmp_path / 'jobs.yaml')) == [job]
+
+@pytest.mark.parametrize('name, text', [
+    ('bad.yaml', "jobs: [unclosed\n"),
+    ('bad.json', "{not json"),
+    ('scalar.yaml', "just text\n"),
+])
+def test_unreadable_spec(tmp_path, capsys, name, text):
+    spec = tmp_path / name
+    spec.write_text(text)
+    with pytest.raises(SpecError):
+        load_job_spec(str(spec))
+    assert main(['run', str(spec), '-q']) == 2
+    assert capsys.readouterr().err.startswith('pdfcombiner: ')
+
+def test_job_to_operation_resolves_paths(tmp_path):
+    operation = job_to_operation({'type': 'watermark', 'files': ['in/a.pdf'], 'output_dir': 'out',
+                                  'settings': {'watermark_file': 'mark.pdf'}}, 0, str(tmp_path))
+    assert operation.files == [str(tmp_path / 'in' / 'a.pdf')]
+    assert operation.output_dir == str(tmp_path / 'out')
+    assert operation.settings['watermark_file'] == str(tmp_path / 'mark.pdf')
+    with pytest.raises(SpecError):
+        job_to_operation({'type': 'bogus', 'files': ['a.pdf']}, 0, str(tmp_path))
+    with pytest.raises(SpecError):
+        job_to_operation({'type': 'split', 'files': []}, 0, str(tmp_path))
+
+def test_run_writes_manifest(pdf_factory, tmp_path):
+    pdf_factory('a.pdf', pages=2)
+    spec = tmp_path / 'jobs.json'
+    spec.write_text(json.dumps([
+        {'id': 'split', 'type': 'split', 'files': ['a.pdf'], 'output_dir': 'out'},
+        {'id': 'missing', 'type': 'split', 'files': ['missing.pdf'], 'output_dir': 'out'},
+    ]))
+    manifest_path = tmp_path / 'manifest.json'
+    assert main(['run', str(spec), '-q', '-w', '1', '-m', str(manifest_path)]) == 1
+    manifest = json.loads(manifest_path.read_text())
+    assert manifest['summary'] == {'completed': 1, 'failed': 1}
+    split, missing = manifest['jobs']
+    assert [page_texts(path) for path in split['outputs']] == [['Page 1'], ['Page 2']]
+    assert 'missing.pdf' in missing['error']
@@ -0,0 +1,44 @@
+import os
+
+import fitz
+import pytest
+
+from operations.merge import streaming_merge
+from tests.conftest import page_texts
+
+@pytest.fixture
+def invoices(tmp_path):
+    """Invoices that embed the same logo, each with its own text"""
+    logo = fitz.Pixmap(fitz.csRGB, 64, 64, os.urandom(64 * 64 * 3), False).tobytes('png')
+    paths = []
+    for n in range(4):
+        doc = fitz.open()
+        page = doc.new_page()
+        page.insert_image(fitz.Rect(400, 40, 500, 140), stream=logo)
+        page.insert_text((72, 72), f"Invoice {n}")
+        paths.append(str(tmp_path / f'invoice{n}.pdf'))
+        doc.save(paths[-1])
+        doc.close()
+    return paths
+
+def test_dedup_writes_shared_objects_once(invoices, tmp_path):
+    plain = str(tmp_path / 'plain.pdf')
+    deduped = str(tmp_path / 'deduped.pdf')
+    assert streaming_merge(invoices, plain).dedup_objects is None
+    report = streaming_merge(invoices, deduped, dedup=True)
+
+    assert report.dedup_objects['Image'] == 3
+    assert report.dedup_bytes_saved['Image'] > 3 * 64 * 64
+    assert os.path.getsize(plain) - os.path.getsize(deduped) >= report.dedup_bytes_saved['Image']
+    assert page_texts(deduped) == [f'Invoice {n}' for n in range(4)]
+    with fitz.open(deduped) as doc:
+        images = {page.get_images()[0][0] for page in doc}
+    assert len(images) == 1
+
+def test_distinct_pages_are_never_collapsed(pdf_factory, tmp_path):
+    # Byte-identical inputs still give one page each
+    same = [pdf_factory('a.pdf', pages=1), pdf_factory('b.pdf', pages=1)]
+    output = str(tmp_path / 'out.pdf')
+    report = streaming_merge(same, output, dedup=True)
+    assert report.pages == 2
+    assert page_texts(output) == ['Page 1', 'Page 1']
@@ -0,0 +1,67 @@
+import os
+
+from batch.jobs import BatchOperation, run_operation
+from batch.journal import Checkpoint, JobJournal
+from tests.conftest import page_texts
+
+def test_unfinished_operations_reload_from_disk(tmp_path):
+    path = str(tmp_path / 'journal.db')
+    journal = JobJournal(path)
+    done, failed, pending = (BatchOperation('split', [f'{name}.pdf'], 'out', {'every': 2}, job_id=name)
+                             for name in ('done', 'failed', 'pending'))
+    for operation in (done, failed, pending):
+        journal.add(operation)
+    journal.set_status(done, 'completed')
+    journal.set_status(failed, 'failed: broken')
+    journal.mark_unit(pending.journal_id, 'chunk:1', 'out/pending_1.pdf')
+    journal.close()
+
+    journal = JobJournal(path)
+    assert [operation.job_id for operation in journal.unfinished()] == ['failed', 'pending']
+    [resumed] = journal.unfinished(include_failed=False)
+    assert resumed.settings == {'every': 2}
+    assert resumed.journal_id == pending.journal_id
+    assert resumed.outputs == ['out/pending_1.pdf']
+    journal.close()
+
+def test_unit_is_done_only_while_its_output_exists(tmp_path):
+    journal = JobJournal(str(tmp_path / 'journal.db'))
+    operation = BatchOperation('split', ['a.pdf'], 'out', {})
+    journal.add(operation)
+    output = tmp_path / 'chunk.pdf'
+    output.write_bytes(b'%PDF')
+    checkpoint = Checkpoint(journal, operation.journal_id)
+    checkpoint.mark('chunk', str(output))
+    checkpoint.mark('file:a.pdf')
+    output.unlink()
+
+    checkpoint = Checkpoint(journal, operation.journal_id)
+    assert checkpoint.is_done('file:a.pdf')
+    assert not checkpoint.is_done('chunk')
+    assert not Checkpoint().is_done('file:a.pdf')
+    journal.close()
+
+def test_interrupted_split_resumes_after_finished_files(pdf_factory, tmp_path):
+    first = pdf_factory('a.pdf', pages=2, label='A')
+    second = pdf_factory('b.pdf', pages=2, label='B')
+    journal = JobJournal(str(tmp_path / 'journal.db'))
+    operation = BatchOperation('split', [first, second], str(tmp_path / 'out'), {})
+    journal.add(operation)
+
+    # Stop partway through the second file
+    split = []
+    def progress(name, percentage):
+        split.append(name)
+    assert not run_operation(operation, progress, lambda: any(name.startswith('b.pdf') for name in split))
+
+    [resumed] = journal.unfinished()
+    assert [page_texts(path) for path in resumed.outputs] == [['A 1'], ['A 2'], ['B 1']]
+    written = os.path.getmtime(resumed.outputs[-1])
+    # A finished input is not opened again
+    os.remove(first)
+    assert run_operation(resumed, lambda name, percentage: None, lambda: False)
+    assert [page_texts(path) for path in resumed.outputs] == [['A 1'], ['A 2'], ['B 1'], ['B 2']]
+    assert os.path.getmtime(resumed.outputs[2]) == written
+    journal.set_status(resumed)
+    assert journal.unfinished() == []
+    journal.close()
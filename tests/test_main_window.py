@@ -0,0 +1,100 @@
+"""Main window flows, run on Qt's offscreen platform"""
+import os
+
+import pytest
+
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+QtWidgets = pytest.importorskip('PyQt6.QtWidgets')
+
+from tests.conftest import page_texts
+
+@pytest.fixture(scope='module')
+def app():
+    return QtWidgets.QApplication.instance() or QtWidgets.QApplication([])
+
+@pytest.fixture
+def window(app, tmp_path, monkeypatch):
+    monkeypatch.setenv('PDFCOMBINER_SEARCH_INDEX', str(tmp_path / 'search.db'))
+    monkeypatch.setenv('PDFCOMBINER_THUMBNAIL_CACHE_DIR', str(tmp_path / 'thumbnails'))
+    # Errors fail the test instead of waiting on a dialog
+    def critical(parent, title, text, *args, **kwargs):
+        raise AssertionError(text)
+    monkeypatch.setattr(QtWidgets.QMessageBox, 'critical', critical)
+    import main
+    window = main.PDFCombiner()
+    yield window
+    window.thumbnail_loader.cancel_all()
+    window.thumbnail_loader.wait()
+    window.search_indexer.stop()
+    window.deleteLater()
+
+def settle(app, window):
+    """Let tiles be created and thumbnails load"""
+    while window.pending_files or window.thumbnail_loader.pending:
+        app.processEvents()
+        window.thumbnail_loader.wait(10)
+    app.processEvents()
+
+def tiles(window):
+    return [window.thumbnail_layout.itemAt(i).widget() for i in range(window.thumbnail_layout.count())]
+
+def save_to(monkeypatch, path, reply=None):
+    monkeypatch.setattr(QtWidgets.QFileDialog, 'getSaveFileName', lambda *args, **kwargs: (path, ''))
+    if reply is not None:
+        monkeypatch.setattr(QtWidgets.QMessageBox, 'question', lambda *args, **kwargs: reply)
+
+def test_combine_and_append(app, window, pdf_factory, tmp_path, monkeypatch):
+    first = pdf_factory('a.pdf', pages=2, label='A')
+    second = pdf_factory('b.pdf', pages=1, label='B')
+    window.add_files([first, second])
+    settle(app, window)
+    output = str(tmp_path / 'combined.pdf')
+
+    save_to(monkeypatch, output)
+    window.combine_pdfs()
+    assert page_texts(output) == ['A 1', 'A 2', 'B 1']
+
+    # Choosing the existing file offers to append to it
+    save_to(monkeypatch, output, QtWidgets.QMessageBox.StandardButton.Yes)
+    window.combine_pdfs()
+    assert page_texts(output) == ['A 1', 'A 2', 'B 1', 'A 1', 'A 2', 'B 1']
+
+    save_to(monkeypatch, output, QtWidgets.QMessageBox.StandardButton.No)
+    window.combine_pdfs()
+    assert page_texts(output) == ['A 1', 'A 2', 'B 1']
+
+def test_cancelled_save_writes_nothing(app, window, pdf_factory, tmp_path, monkeypatch):
+    window.add_files([pdf_factory()])
+    settle(app, window)
+    save_to(monkeypatch, '')
+    window.combine_pdfs()
+    assert not (tmp_path / 'combined.pdf').exists()
+
+def test_page_ranges_survive_undo_and_refresh(app, window, pdf_factory, tmp_path, monkeypatch):
+    first = pdf_factory('a.pdf', pages=3, label='A')
+    second = pdf_factory('b.pdf', pages=2, label='B')
+    window.add_files([first, second])
+    settle(app, window)
+    monkeypatch.setattr(QtWidgets.QInputDialog, 'getText', lambda *args, **kwargs: ('2-last', True))
+    window.set_page_range(tiles(window)[0])
+    assert window.get_page_ranges() == ['2-last', None]
+
+    window.remove_thumbnail(tiles(window)[1])
+    settle(app, window)
+    window.undo_action()
+    settle(app, window)
+    assert window.file_list() == [(first, '2-last'), (second, None)]
+    assert tiles(window)[0].filename_label.text() == 'a.pdf\n(pages 2-last)'
+
+    window.update_thumbnails()
+    settle(app, window)
+    assert window.get_page_ranges() == ['2-last', None]
+    output = str(tmp_path / 'combined.pdf')
+    save_to(monkeypatch, output)
+    window.combine_pdfs()
+    assert page_texts(output) == ['A 2', 'A 3', 'B 1', 'B 2']
+
+    # Undoing the range itself brings back every page
+    window.undo_action()
+    settle(app, window)
+    assert window.get_page_ranges() == [None, None]
@@ -0,0 +1,77 @@
+import fitz
+import pytest
+
+from operations.merge import (MERGE_BACKENDS, compare_backends, default_merge_backend, describe_pdf,
+                              get_merge_backend, resolve_page_ranges)
+from pdfcombiner import main
+from tests.conftest import outline, page_texts
+from utils.utils import PageRangeError
+
+TOC = [[1, 'Start', 1], [2, 'Intro', 2], [2, 'Body', 3], [3, 'Detail', 3], [1, 'End', 4]]
+
+@pytest.fixture
+def inputs(pdf_factory):
+    return [pdf_factory('a.pdf', pages=4, label='A', toc=TOC),
+            pdf_factory('b.pdf', pages=2, label='B', toc=[[1, 'B start', 1]])]
+
+@pytest.mark.parametrize('backend', list(MERGE_BACKENDS))
+def test_backends_keep_pages_and_first_document_info(pdf_factory, tmp_path, backend):
+    first = pdf_factory('a.pdf', pages=1, label='A')
+    with fitz.open(first) as doc:
+        doc.set_metadata({'title': 'First', 'author': 'Someone'})
+        doc[0].set_rotation(90)
+        doc.saveIncr()
+    second = pdf_factory('b.pdf', pages=2, label='B', size=(300, 400))
+    output = str(tmp_path / 'out.pdf')
+    report = get_merge_backend(backend).merge([first, second], output)
+    assert (report.inputs, report.pages) == (2, 3)
+    description = describe_pdf(output)
+    assert description['pages'] == [(595.0, 842.0, 90), (300.0, 400.0, 0), (300.0, 400.0, 0)]
+    assert description['metadata']['/Title'] == 'First'
+    assert page_texts(output) == ['A 1', 'B 1', 'B 2']
+
+@pytest.mark.parametrize('backend', list(MERGE_BACKENDS))
+def test_cancelled_merge(inputs, tmp_path, backend):
+    assert get_merge_backend(backend).merge(inputs, str(tmp_path / 'out.pdf'),
+                                            is_cancelled=lambda: True) is None
+
+def test_get_merge_backend(monkeypatch):
+    assert default_merge_backend() == 'fitz'
+    assert get_merge_backend().name == 'fitz'
+    assert get_merge_backend('streaming', dedup=True).dedup
+    with pytest.raises(ValueError, match='Unknown'):
+        get_merge_backend('bogus')
+    # Without PyMuPDF the default falls back to PyPDF2
+    monkeypatch.setattr(MERGE_BACKENDS['fitz'], 'available', staticmethod(lambda: False))
+    assert default_merge_backend() == 'pypdf2'
+    with pytest.raises(ValueError, match='not available'):
+        get_merge_backend('fitz')
+
+@pytest.mark.parametrize('backend', ['pypdf2', 'fitz'])
+def test_page_ranges_drop_bookmarks_to_left_out_pages(inputs, tmp_path, backend):
+    output = str(tmp_path / 'out.pdf')
+    pages = resolve_page_ranges(inputs, ['2-3', 'last'])
+    report = get_merge_backend(backend).merge(inputs, output, pages=pages)
+    assert report.pages == 3
+    assert page_texts(output) == ['A 2', 'A 3', 'B 2']
+    # 'Start' (page 1) is gone and its children move up; 'B start' points at a left-out page
+    assert outline(output) == [[1, 'Intro', 1], [1, 'Body', 2], [2, 'Detail', 2]]
+
+@pytest.mark.parametrize('page_ranges', [None, ['2-3', 'last'], ['1,4', None], ['3-4', '1']])
+def test_backends_agree(inputs, page_ranges):
+    result = compare_backends(inputs, ['pypdf2', 'fitz'], resolve_page_ranges(inputs, page_ranges))
+    assert result['differences'] == []
+
+def test_parity_command(inputs, capsys):
+    assert main(['parity', *inputs, '-r', '2-3', '-r', 'all']) == 0
+    assert main(['parity', *inputs, '-r', '9']) == 2
+    assert 'Invalid page ranges' in capsys.readouterr().err
+
+def test_resolve_page_ranges(inputs):
+    assert resolve_page_ranges(inputs, None) is None
+    assert resolve_page_ranges(inputs, [None, '']) is None
+    assert resolve_page_ranges(inputs, ['2-last', None]) == [[1, 2, 3], None]
+    with pytest.raises(ValueError):
+        resolve_page_ranges(inputs, ['1'])
+    with pytest.raises(PageRangeError):
+        resolve_page_ranges(inputs, ['5', None])
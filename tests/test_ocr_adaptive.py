@@ -0,0 +1,40 @@
+import fitz
+
+from ocr.adaptive import DPI_TIERS, choose_dpi, next_tier, tier_report
+from ocr.ocr_processor import OCRProcessor
+from tests.conftest import make_scanned_pdf
+
+def text_page(doc, fontsize):
+    page = doc.new_page()
+    for line in range(10):
+        page.insert_text((36, 36 + fontsize * 2 * (line + 1)), "Some words set in one size", fontsize=fontsize)
+    return page
+
+def test_small_text_gets_a_higher_resolution():
+    with fitz.open() as doc:
+        small = choose_dpi(text_page(doc, 6), default=300)
+        large = choose_dpi(text_page(doc, 24), default=300)
+        blank = choose_dpi(doc.new_page(), default=300)
+    assert small in DPI_TIERS and large in DPI_TIERS
+    assert small > large
+    assert blank == 300
+
+def test_next_tier():
+    assert next_tier(150) == 200
+    assert next_tier(DPI_TIERS[-1]) is None
+
+def test_unsure_pages_are_ocred_again_a_tier_up(fake_ocr, monkeypatch, tmp_path):
+    # A letter-size page is wider than 3000 pixels from 400 dpi up
+    monkeypatch.setattr(fake_ocr, 'confidence', staticmethod(lambda image: 90.0 if image.width > 3000 else 50.0))
+    path = make_scanned_pdf(str(tmp_path / 'scan.pdf'), 's')
+    processor = OCRProcessor()
+    processor.ocr_engine = 'fake'
+    processor.ocr_workers = 1
+    processor.ocr_adaptive = True
+    [page] = processor.recognize_pages(path)
+    assert page.text == "Scanned\n"
+    # Too few lines to measure, so the page starts at the quality setting's 300 dpi
+    assert len(fake_ocr.calls) == 2
+    report = tier_report(processor.dpi_tiers)
+    assert (report['300']['pages'], report['300']['reruns']) == (1, 0)
+    assert (report['400']['pages'], report['400']['reruns']) == (0, 1)
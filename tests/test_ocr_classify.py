@@ -0,0 +1,55 @@
+import fitz
+
+from ocr.classify import PAGE_BLANK, PAGE_IMAGE, PAGE_MIXED, PAGE_TEXT, classify_pages
+from ocr.ocr_processor import OCRProcessor
+from tests.conftest import make_pdf, make_scanned_pdf
+
+def test_classify_pages(tmp_path):
+    path = make_scanned_pdf(str(tmp_path / 'scan.pdf'), 'stbs')
+    with fitz.open(path) as doc:
+        # A scan that was OCRed before: its text lies over the image
+        doc[3].insert_text((72, 72), "Page 4 was scanned and read already", render_mode=3)
+        # A text page with a large picture above the text
+        page = doc.new_page()
+        page.insert_image(fitz.Rect(0, 0, page.rect.width, page.rect.height / 2),
+                          pixmap=doc[0].get_pixmap(dpi=20))
+        page.insert_text((72, 700), "Caption text under a picture of a page")
+        doc.saveIncr()
+    pages = classify_pages(path)
+    assert [page.kind for page in pages] == [PAGE_IMAGE, PAGE_TEXT, PAGE_BLANK, PAGE_TEXT, PAGE_MIXED]
+    assert [page.needs_ocr for page in pages] == [True, False, False, False, True]
+    assert pages[0].image_coverage == 1.0
+    assert 'text layer of its own' in pages[1].text
+    assert [page.index for page in classify_pages(path, [4, 0])] == [4, 0]
+
+def test_short_text_pages_are_text(tmp_path):
+    path = make_pdf(str(tmp_path / 'numbers.pdf'), pages=2)
+    pages = classify_pages(path)
+    assert [page.kind for page in pages] == [PAGE_TEXT, PAGE_TEXT]
+    assert pages[1].text.strip() == 'Page 2'
+
+def processor():
+    processor = OCRProcessor()
+    processor.ocr_engine = 'fake'
+    processor.ocr_workers = 1
+    return processor
+
+def test_hybrid_ocr_reads_text_layers(fake_ocr, tmp_path):
+    path = make_scanned_pdf(str(tmp_path / 'scan.pdf'), 'stsb')
+    pages = list(processor().recognize_pages(path))
+    assert [(page.index, page.source) for page in pages] == [(0, 'ocr'), (1, 'native'), (2, 'ocr'), (3, 'native')]
+    assert pages[0].text == "Scanned\n" and 'text layer of its own' in pages[1].text
+    assert len(fake_ocr.calls) == 2
+
+def test_without_hybrid_every_page_is_ocred(fake_ocr, tmp_path):
+    path = make_scanned_pdf(str(tmp_path / 'scan.pdf'), 'stsb')
+    ocr = processor()
+    ocr.ocr_hybrid = False
+    assert {page.source for page in ocr.recognize_pages(path)} == {'ocr'}
+    assert len(fake_ocr.calls) == 4
+
+def test_short_text_pages_are_not_ocred(fake_ocr, tmp_path):
+    path = make_pdf(str(tmp_path / 'numbers.pdf'), pages=2)
+    pages = list(processor().recognize_pages(path))
+    assert [(page.source, page.text.strip()) for page in pages] == [('native', 'Page 1'), ('native', 'Page 2')]
+    assert fake_ocr.calls == []
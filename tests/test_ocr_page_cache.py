@@ -0,0 +1,54 @@
+import fitz
+
+from ocr.ocr_processor import OCRProcessor
+from ocr.page_cache import PageCache, page_digests
+from tests.conftest import make_scanned_pdf
+
+def processor(cache_dir):
+    processor = OCRProcessor()
+    processor.ocr_engine = 'fake'
+    processor.ocr_workers = 1
+    processor.ocr_cache_dir = cache_dir
+    return processor
+
+def test_pages_are_recognized_once(fake_ocr, tmp_path):
+    cache_dir = str(tmp_path / 'cache')
+    path = make_scanned_pdf(str(tmp_path / 'scan.pdf'), 'sts')
+    first = processor(cache_dir).perform_ocr(path)
+    assert len(fake_ocr.calls) == 2
+    assert processor(cache_dir).perform_ocr(path) == first
+    assert len(fake_ocr.calls) == 2
+
+    # Other settings read the pages again
+    other = processor(cache_dir)
+    other.ocr_quality = 3
+    other.perform_ocr(path)
+    assert len(fake_ocr.calls) == 4
+
+def test_copied_pages_hit_the_cache(fake_ocr, tmp_path):
+    cache_dir = str(tmp_path / 'cache')
+    path = make_scanned_pdf(str(tmp_path / 'scan.pdf'), 'ss')
+    processor(cache_dir).perform_ocr(path)
+    combined = str(tmp_path / 'combined.pdf')
+    with fitz.open() as doc, fitz.open(path) as source:
+        doc.new_page().insert_text((72, 72), "A cover page with enough text on it")
+        doc.insert_pdf(source)
+        doc.save(combined)
+    assert list(page_digests(combined, [1, 2]).values()) == list(page_digests(path, [0, 1]).values())
+    calls = len(fake_ocr.calls)
+    pages = list(processor(cache_dir).recognize_pages(combined))
+    assert [page.text for page in pages[1:]] == ["Scanned\n"] * 2
+    assert len(fake_ocr.calls) == calls
+
+def test_least_recently_used_pages_are_evicted(tmp_path):
+    cache = PageCache(str(tmp_path / 'cache'), max_bytes=10)
+    cache.put('a', 'aaaa')
+    cache.put('b', 'bbbb')
+    assert cache.get('a') == 'aaaa'
+    cache.put('c', 'cccc')
+    assert cache.get('b') is None
+    assert cache.get('a') == 'aaaa' and cache.get('c') == 'cccc'
+    stats = cache.stats()
+    assert (stats['entries'], stats['size'], stats['evictions']) == (2, 8, 1)
+    assert (stats['hits'], stats['misses']) == (3, 1)
+    cache.close()
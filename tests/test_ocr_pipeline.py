@@ -0,0 +1,50 @@
+import pytest
+
+from ocr import pipeline
+from ocr.pipeline import OCRPipeline
+from ocr.pool import OCRPool
+
+@pytest.fixture
+def released(monkeypatch):
+    """Names of the shared memory blocks freed"""
+    names = []
+    release = pipeline._release
+    monkeypatch.setattr(pipeline, '_release', lambda shm: names.append(shm.name) or release(shm))
+    return names
+
+@pytest.fixture
+def pool(fake_ocr):
+    with OCRPool(1, engine='fake') as pool:
+        yield pool
+
+def test_pages_come_back_in_order_with_stage_metrics(pool, pdf_factory, released):
+    path = pdf_factory(pages=5)
+    run = OCRPipeline(pool, 'data', {'clean': True})
+    results = list(run.run(path, [4, 0, 2], dpi=lambda page: 50 + page.number))
+    assert [(index, info['dpi']) for index, _, info in results] == [(4, (54, 54)), (0, (50, 50)), (2, (52, 52))]
+    widths = [result.size[0] for _, result, _ in results]
+    assert widths[0] > widths[2] > widths[1]
+    metrics = run.metrics.to_dict()
+    assert [metrics[stage]['pages'] for stage in run.metrics.STAGES] == [3, 3, 3, 3]
+    assert metrics['bottleneck'] in run.metrics.STAGES
+    assert len(released) == 3
+
+def test_stopping_early_frees_every_page(pool, pdf_factory, released):
+    path = pdf_factory(pages=8)
+    run = OCRPipeline(pool)
+    results = run.run(path, range(8), dpi=30)
+    next(results)
+    results.close()
+    assert len(released) == run.metrics.render.pages >= 1
+    assert run.metrics.assemble.pages == 1
+
+def test_cancelled_run_stops_submitting(pool, fake_ocr, pdf_factory, released):
+    path = pdf_factory(pages=8)
+    run = OCRPipeline(pool)
+    results = list(run.run(path, range(8), dpi=30, is_cancelled=lambda: len(fake_ocr.calls) >= 2))
+    assert len(results) == 2
+    assert len(released) == run.metrics.render.pages
+
+def test_render_errors_reach_the_caller(pool, tmp_path):
+    with pytest.raises(Exception):
+        list(OCRPipeline(pool).run(str(tmp_path / 'missing.pdf'), [0]))
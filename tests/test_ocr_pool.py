@@ -0,0 +1,61 @@
+import os
+
+import pytest
+from PIL import Image
+
+from ocr import pool as ocr_pool
+from ocr.engine import OCR_ENGINES, create_engine
+from ocr.pool import OCRPool, threads_per_worker
+
+def images(count):
+    return (Image.new('L', (10 + n, 10)) for n in range(count))
+
+def test_single_worker_keeps_one_engine_in_process(fake_ocr, monkeypatch):
+    created = []
+    monkeypatch.setattr(fake_ocr, 'close', lambda self: created.remove(self))
+    monkeypatch.setattr(fake_ocr, '__init__', lambda self, *args: created.append(self) or None)
+    with OCRPool(1, engine='fake') as pool:
+        assert list(pool.map(images(5))) == ["Scanned\n"] * 5
+        assert [data.size for data in pool.map(images(2), 'data')] == [(10, 10), (11, 10)]
+        assert len(created) == 1
+    assert created == []
+    assert fake_ocr.calls == [(10 + n, 10) for n in range(5)] + [(10, 10), (11, 10)]
+
+def test_map_stops_when_cancelled(fake_ocr):
+    with OCRPool(1, engine='fake') as pool:
+        results = pool.map(images(5), is_cancelled=lambda: len(fake_ocr.calls) >= 2)
+        assert len(list(results)) == 2
+
+def test_create_engine_errors(fake_ocr, monkeypatch):
+    assert isinstance(create_engine(name='fake'), fake_ocr)
+    with pytest.raises(ValueError, match='Unknown'):
+        create_engine(name='bogus')
+    monkeypatch.setattr(fake_ocr, 'available', staticmethod(lambda: False))
+    with pytest.raises(ValueError, match='not installed'):
+        create_engine(name='fake')
+
+def test_pool_warns_when_falling_back_to_pytesseract(fake_ocr, monkeypatch, caplog):
+    monkeypatch.setitem(OCR_ENGINES, 'pytesseract', fake_ocr)
+    monkeypatch.setattr(ocr_pool, 'preferred_engine', lambda: 'pytesseract')
+    with OCRPool(1, engine='fake'):
+        pass
+    assert not caplog.records
+    with OCRPool(1):
+        pass
+    assert 'tesseract for every page' in caplog.text
+
+def engine_identity(n, engine=None):
+    """Where a page would be recognized, run on a pool worker"""
+    return os.getpid(), id(ocr_pool._engine), os.environ['OMP_THREAD_LIMIT']
+
+def test_workers_keep_their_engine_between_pages():
+    # Creating a pytesseract engine does not need the tesseract executable
+    pytest.importorskip('pytesseract')
+    with OCRPool(2, engine='pytesseract') as pool:
+        results = [pool.submit(engine_identity, n).result() for n in range(8)]
+    engines = {}
+    for pid, engine, threads in results:
+        engines.setdefault(pid, set()).add(engine)
+        assert threads == str(threads_per_worker(2))
+    assert 1 <= len(engines) <= 2
+    assert all(len(ids) == 1 for ids in engines.values())
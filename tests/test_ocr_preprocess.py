@@ -0,0 +1,48 @@
+import fitz
+import numpy as np
+import pytest
+from PIL import Image
+
+from ocr.preprocess import despeckle, estimate_skew, otsu_threshold, pil_preprocess, preprocess
+from ocr.raster import render_page
+
+@pytest.fixture
+def page():
+    """A page image with lines of text to level"""
+    with fitz.open() as doc:
+        page = doc.new_page()
+        for line in range(20):
+            page.insert_text((72, 72 + 30 * line), f"Line {line} of a page with some words on every line")
+        return render_page(page, 100)
+
+def dark(image):
+    return np.asarray(image) == 0
+
+@pytest.mark.parametrize('contrast, brightness, threshold', [(1.0, 1.0, 128), (1.4, 0.9, 100), (0.8, 1.2, 200)])
+def test_fused_pass_matches_pil(page, contrast, brightness, threshold):
+    expected = pil_preprocess(page, contrast, brightness, threshold).convert('L')
+    assert np.array_equal(np.asarray(preprocess(page, contrast, brightness, threshold)), np.asarray(expected))
+
+def test_otsu_threshold_splits_two_levels():
+    hist = np.zeros(256)
+    hist[40] = 100
+    hist[210] = 900
+    assert 40 < otsu_threshold(hist) <= 210
+    result = preprocess(Image.fromarray(np.array([[40, 210], [210, 40]], dtype=np.uint8)))
+    assert np.asarray(result).tolist() == [[0, 255], [255, 0]]
+
+def test_clean_removes_specks_only():
+    mask = np.zeros((20, 20), dtype=bool)
+    mask[5, 5] = True
+    mask[10:13, 2:18] = True
+    cleaned = despeckle(mask)
+    assert not cleaned[5, 5]
+    assert cleaned[10:13, 2:18].all()
+
+@pytest.mark.parametrize('angle', [-3.0, 2.0])
+def test_deskew_levels_the_text(page, angle):
+    tilted = page.rotate(angle, resample=Image.Resampling.NEAREST, expand=True, fillcolor=255)
+    assert estimate_skew(dark(preprocess(tilted))) == pytest.approx(-angle, abs=0.3)
+    level = preprocess(tilted, deskew=True)
+    assert abs(estimate_skew(dark(level))) < 0.3
+    assert abs(estimate_skew(dark(preprocess(page)))) <= 0.1
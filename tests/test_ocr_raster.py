@@ -0,0 +1,36 @@
+from ocr import raster
+from ocr.ocr_processor import OCRProcessor
+from ocr.raster import render_pages, selected_pages
+from tests.conftest import make_scanned_pdf
+
+def test_pages_render_only_as_consumed(pdf_factory, monkeypatch):
+    path = pdf_factory(pages=5)
+    rendered = []
+    render_page = raster.render_page
+    monkeypatch.setattr(raster, 'render_page',
+                        lambda page, *args: rendered.append(page.number) or render_page(page, *args))
+    pages = render_pages(path, 50, [3, 1, 9])
+    assert rendered == []
+    index, image = next(pages)
+    assert (index, rendered) == (3, [3])
+    assert image.mode == 'L' and image.info['dpi'] == (50, 50) and 'render_seconds' in image.info
+    assert [index for index, _ in pages] == [1]
+    # A resolution chosen per page
+    assert [image.info['dpi'] for _, image in render_pages(path, lambda page: 20 + page.number, [0, 2])] \
+        == [(20, 20), (22, 22)]
+
+def test_selected_pages():
+    assert selected_pages(3) == [0, 1, 2]
+    assert selected_pages(3, [2, 5, 0, -1]) == [2, 0]
+
+def test_ocr_renders_only_the_page_range(fake_ocr, tmp_path):
+    path = make_scanned_pdf(str(tmp_path / 'scan.pdf'), 'ssss')
+    processor = OCRProcessor()
+    processor.ocr_engine = 'fake'
+    processor.ocr_workers = 1
+    processor.ocr_page_range = [3, 1]
+    text = processor.perform_ocr(path)
+    assert text.startswith("--- Page 4 (ocr) ---\nScanned")
+    assert "--- Page 2 (ocr) ---" in text and "Page 1" not in text
+    assert len(fake_ocr.calls) == 2
+    assert processor.pipeline_metrics.render.pages == 2
@@ -0,0 +1,72 @@
+import json
+import os
+import xml.etree.ElementTree as ElementTree
+
+import fitz
+import pytest
+
+from ocr.ocr_processor import OCRProcessor
+from ocr.sinks import CHECKPOINT_SUFFIX
+from tests.conftest import make_scanned_pdf
+
+def processor():
+    processor = OCRProcessor()
+    processor.ocr_engine = 'fake'
+    processor.ocr_workers = 1
+    return processor
+
+@pytest.fixture
+def scan(tmp_path):
+    return make_scanned_pdf(str(tmp_path / 'scan.pdf'), 'ssts')
+
+def stop_after(fake_ocr, pages):
+    return lambda: len(fake_ocr.calls) >= pages
+
+@pytest.mark.parametrize('output_format', ['text', 'pdf'])
+def test_interrupted_output_resumes_at_the_first_missing_page(fake_ocr, scan, tmp_path, output_format):
+    expected = processor().write_output(scan, str(tmp_path / f'expected.{output_format}'), output_format)
+    fake_ocr.calls.clear()
+
+    output = str(tmp_path / f'out.{output_format}')
+    # Cancelled while the second page is in hand, so only the first is written
+    assert processor().write_output(scan, output, output_format, stop_after(fake_ocr, 2)) is None
+    assert os.path.exists(output + CHECKPOINT_SUFFIX)
+    assert len(fake_ocr.calls) == 2
+
+    assert processor().write_output(scan, output, output_format) == output
+    assert not os.path.exists(output + CHECKPOINT_SUFFIX)
+    assert len(fake_ocr.calls) == 4
+    if output_format == 'text':
+        assert open(output, encoding='utf-8').read() == open(expected, encoding='utf-8').read()
+    else:
+        with fitz.open(output) as resumed, fitz.open(expected) as whole:
+            assert [page.get_text() for page in resumed] == [page.get_text() for page in whole]
+
+def test_other_settings_start_over(fake_ocr, scan, tmp_path):
+    output = str(tmp_path / 'out.txt')
+    processor().write_output(scan, output, 'text', stop_after(fake_ocr, 2))
+    other = processor()
+    other.ocr_quality = 1
+    other.write_output(scan, output, 'text')
+    assert len(fake_ocr.calls) == 5
+    assert open(output, encoding='utf-8').read().count('--- Page') == 4
+
+def test_layout_formats(fake_ocr, scan, tmp_path):
+    ocr = processor()
+    records = [json.loads(line) for line in open(ocr.write_output(scan, str(tmp_path / 'out.jsonl'), 'jsonl'))]
+    assert [(record['page'], record['source']) for record in records] == \
+        [(1, 'ocr'), (2, 'ocr'), (3, 'native'), (4, 'ocr')]
+    hocr = ElementTree.parse(ocr.write_output(scan, None, 'hocr')).getroot()
+    words = hocr.findall(".//{http://www.w3.org/1999/xhtml}span[@class='ocrx_word']")
+    assert [word.text for word in words] == ['Scanned'] * 3
+    assert words[0].get('title').endswith('x_wconf 90')
+    alto = ElementTree.parse(ocr.write_output(scan, None, 'alto')).getroot()
+    strings = alto.findall('.//{http://www.loc.gov/standards/alto/ns-v4#}String')
+    # The text page has its lines but no positions
+    assert [string.get('CONTENT') for string in strings] == \
+        ['Scanned', 'Scanned', 'Page 3 has a text layer of its own', 'Scanned']
+    assert strings[2].get('HPOS') is None and strings[3].get('WC') == '0.90'
+
+def test_unknown_format(scan):
+    with pytest.raises(ValueError, match='Unknown OCR output format'):
+        processor().write_output(scan, None, 'docx')
@@ -0,0 +1,39 @@
+import fitz
+import pytest
+
+from ocr.engine import PageData
+from ocr.ocr_processor import OCRProcessor
+from ocr.text_layer import add_text_layer
+from tests.conftest import make_scanned_pdf
+
+@pytest.mark.parametrize('rotate', [0, 90])
+def test_searchable_pdf_keeps_pages_and_places_words(fake_ocr, tmp_path, rotate):
+    source = make_scanned_pdf(str(tmp_path / 'scan.pdf'), 'st', rotate=rotate)
+    processor = OCRProcessor()
+    processor.ocr_engine = 'fake'
+    processor.ocr_workers = 1
+    output = processor.save_searchable_pdf(source, str(tmp_path / 'searchable.pdf'))
+    assert output == str(tmp_path / 'searchable.pdf')
+
+    with fitz.open(source) as before, fitz.open(output) as after:
+        assert after.page_count == 2
+        for old, new in zip(before, after):
+            # The text is invisible: the pages look exactly as they did
+            assert new.get_pixmap(dpi=30).samples == old.get_pixmap(dpi=30).samples
+            assert new.rotation == old.rotation
+        [word] = after[0].get_text('words')
+        assert word[4] == 'Scanned'
+        # The fake engine's box: a quarter of the width, a tenth in from the top left as shown.
+        # Words come back in unrotated page coordinates
+        box = fitz.Rect(word[:4]) * after[0].rotation_matrix
+        rect = after[0].rect
+        assert box.x0 == pytest.approx(rect.width / 10, abs=3)
+        assert box.x1 == pytest.approx(rect.width * 0.35, abs=3)
+        assert rect.height * 0.05 < box.y0 < box.y1 < rect.height * 0.2
+        assert 'text layer of its own' in after[1].get_text()
+
+def test_no_words_write_nothing():
+    with fitz.open() as doc:
+        page = doc.new_page()
+        assert add_text_layer(page, PageData()) == 0
+        assert page.get_text() == ''
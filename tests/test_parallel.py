@@ -0,0 +1,64 @@
+import os
+
+from batch.jobs import BatchOperation
+from batch.parallel import ParallelExecutor
+from tests.conftest import page_texts
+
+def split_of(path, output_dir, **kwargs):
+    return BatchOperation('split', [path], output_dir, {}, **kwargs)
+
+def run(executor, operations, is_cancelled=lambda: False):
+    finished, retried, errors, progress = [], [], [], []
+    left = executor.run(operations, lambda name, percentage: progress.append(name),
+                        is_cancelled, lambda operation, success: finished.append((operation, success)),
+                        retried.append, errors.append)
+    return left, finished, retried, errors, progress
+
+def test_operations_run_in_workers(pdf_factory, tmp_path):
+    out = str(tmp_path / 'out')
+    operations = [split_of(pdf_factory(f'{name}.pdf', pages=2, label=name), out) for name in 'abc']
+    left, finished, retried, errors, progress = run(ParallelExecutor(2), operations)
+    assert left == [] and retried == [] and errors == []
+    assert sorted(operation.files[0] for operation, success in finished if success) == \
+        sorted(operation.files[0] for operation in operations)
+    # Results come back from the workers onto the caller's operations
+    for operation in operations:
+        assert operation.status == 'completed'
+        assert [page_texts(path) for path in operation.outputs] == [
+            [f'{os.path.basename(operation.files[0])[0]} {n}'] for n in (1, 2)]
+    assert progress
+
+def test_failed_operation_is_retried_then_reported(tmp_path):
+    operation = split_of(str(tmp_path / 'missing.pdf'), str(tmp_path / 'out'), max_retries=1)
+    left, finished, retried, errors, _ = run(ParallelExecutor(2), [operation])
+    assert left == []
+    assert retried == [operation] and operation.retry_count == 1
+    assert finished == [(operation, False)]
+    assert len(errors) == 2 and 'missing.pdf' in errors[0]
+    assert operation.status.startswith('failed')
+
+def test_cancelled_run_returns_unstarted_operations(pdf_factory, tmp_path):
+    operations = [split_of(pdf_factory(), str(tmp_path / 'out'))]
+    left, finished, *_ = run(ParallelExecutor(2), operations, is_cancelled=lambda: True)
+    assert left == operations and finished == []
+
+class RecordingExecutor:
+    def __init__(self):
+        self.submitted = []
+
+    def submit(self, function, operation):
+        self.submitted.append(operation)
+        return object()
+
+def test_conflicting_operations_wait(tmp_path):
+    shared = str(tmp_path / 'a.pdf')
+    compress = BatchOperation('compress', [shared], str(tmp_path), {})
+    split = split_of(shared, str(tmp_path / 'out'))
+    other = split_of(str(tmp_path / 'b.pdf'), str(tmp_path / 'out'))
+    pending = [compress, split, other]
+    executor = RecordingExecutor()
+    running = {}
+    ParallelExecutor(4)._submit_ready(executor, pending, running)
+    # The split reads the file being compressed in place; the unrelated one may overtake it
+    assert executor.submitted == [compress, other]
+    assert pending == [split]
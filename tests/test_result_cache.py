@@ -0,0 +1,59 @@
+import os
+
+from batch.jobs import BatchOperation, run_operation
+from batch.result_cache import ResultCache
+from tests.conftest import page_texts
+
+def _run(operation):
+    assert run_operation(operation, lambda name, percent: None, lambda: False)
+    return operation
+
+def test_key_ignores_volatile_settings(pdf_factory, tmp_path):
+    cache = ResultCache(str(tmp_path / 'cache'))
+    source = pdf_factory()
+    key = cache.make_key('split', [source], {'split_mode': 'every', 'split_every': 2})
+    assert key == cache.make_key('split', [source], {'split_mode': 'every', 'split_every': 2,
+                                                     'split_workers': 4})
+    size = {'split_mode': 'size', 'split_max_mb': 1}
+    assert cache.make_key('split', [source], size) == cache.make_key('split', [source], dict(size, split_workers=4))
+    assert key != cache.make_key('split', [source], {'split_mode': 'every', 'split_every': 3})
+
+def test_key_follows_content_not_path(pdf_factory, tmp_path):
+    cache = ResultCache(str(tmp_path / 'cache'))
+    first = pdf_factory('a.pdf')
+    with open(first, 'rb') as src, open(tmp_path / 'b.pdf', 'wb') as dst:
+        dst.write(src.read())
+    assert cache.make_key('compress', [first], {}) == cache.make_key('compress', [str(tmp_path / 'b.pdf')], {})
+    other = pdf_factory('c.pdf', label='Other')
+    assert cache.make_key('compress', [first], {}) != cache.make_key('compress', [other], {})
+
+def test_split_job_reuses_cached_outputs(pdf_factory, tmp_path):
+    source = pdf_factory(pages=2)
+    cache_dir = str(tmp_path / 'cache')
+    first = _run(BatchOperation('split', [source], str(tmp_path / 'one'), {}, cache_dir=cache_dir))
+    second = _run(BatchOperation('split', [source], str(tmp_path / 'two'), {}, cache_dir=cache_dir))
+    assert [os.path.basename(path) for path in second.outputs] == [os.path.basename(path) for path in first.outputs]
+    assert [page_texts(path) for path in second.outputs] == [['Page 1'], ['Page 2']]
+    stats = ResultCache(cache_dir).stats()
+    assert (stats['hits'], stats['stores']) == (1, 1)
+
+def test_damaged_entry_is_a_miss(pdf_factory, tmp_path):
+    cache = ResultCache(str(tmp_path / 'cache'))
+    output = pdf_factory('out.pdf')
+    cache.put('key', 'compress', [output])
+    [(stored, name)] = cache.get('key')
+    assert name == 'out.pdf'
+    with open(stored, 'ab') as f:
+        f.write(b'garbage')
+    assert cache.get('key') is None
+    assert cache.stats()['entries'] == 0
+
+def test_prune_evicts_least_recently_used(pdf_factory, tmp_path):
+    cache = ResultCache(str(tmp_path / 'cache'))
+    output = pdf_factory('out.pdf')
+    for key in ('old', 'new'):
+        cache.put(key, 'compress', [output])
+    cache.get('new')
+    evicted, freed = cache.prune(max_bytes=os.path.getsize(output))
+    assert (evicted, freed) == (1, os.path.getsize(output))
+    assert [entry['key'] for entry in cache.entries()] == ['new']
@@ -0,0 +1,86 @@
+import json
+import os
+import shutil
+
+import pytest
+
+from ocr.ocr_processor import OCRProcessor
+from pdfcombiner import main
+from search.index import BackgroundIndexer, SearchIndex, fts_query
+from tests.conftest import make_pdf, make_scanned_pdf
+
+@pytest.fixture
+def index(tmp_path):
+    index = SearchIndex(str(tmp_path / 'search.db'))
+    yield index
+    index.close()
+
+def test_fts_query_quotes_words_and_completes_the_last():
+    assert fts_query('annual "report" OR') == '"annual" "report" "OR"*'
+    assert fts_query('  -- ') == ''
+
+def test_search_text_layers(index, pdf_factory):
+    path = pdf_factory('report.pdf', pages=3, label='Quarterly figures page')
+    assert index.index_file(path)
+    assert not index.index_file(path)
+    assert index.is_current(path)
+    hits = index.search('figures page 2')
+    assert [(hit.page, hit.source) for hit in hits] == [(1, 'native')]
+    assert hits[0].snippet == 'Quarterly [figures] [page] [2]'
+    # Search as you type
+    assert len(index.search('quart')) == 3
+    assert index.search('figures missing') == []
+    assert index.search('figures', paths=[]) == []
+
+def test_copies_share_text_and_edits_are_reindexed(index, pdf_factory, tmp_path):
+    path = pdf_factory('a.pdf', pages=1, label='Original words')
+    copy = str(tmp_path / 'copy.pdf')
+    shutil.copy(path, copy)
+    assert index.index_file(path)
+    # Same content: nothing is extracted again
+    assert not index.index_file(copy)
+    assert sorted(hit.path for hit in index.search('original')) == sorted([path, copy])
+
+    make_pdf(path, pages=1, label='Rewritten words')
+    assert not index.is_current(path)
+    assert index.index_file(path)
+    assert [hit.path for hit in index.search('original')] == [copy]
+    index.forget(copy)
+    assert index.search('original') == []
+    assert index.stats()['documents'] == 1
+
+def test_ocr_text_is_indexed_with_word_boxes(index, fake_ocr, tmp_path):
+    path = make_scanned_pdf(str(tmp_path / 'scan.pdf'), 'st')
+    assert index.index_file(path)
+    assert index.search('scanned') == []
+    processor = OCRProcessor()
+    processor.ocr_engine = 'fake'
+    processor.ocr_workers = 1
+    processor.search_index = index
+    processor.save_searchable_pdf(path, str(tmp_path / 'searchable.pdf'))
+    [hit] = index.search('scanned')
+    assert (hit.page, hit.source) == (0, 'ocr')
+    [box] = index.highlights(hit, 'scanned')
+    # The fake engine's box on an A4 page
+    assert box[0] == pytest.approx(595 / 10, abs=1) and box[2] == pytest.approx(595 * 0.35, abs=1)
+    [native] = index.search('layer')
+    assert len(index.highlights(native, 'layer')) == 1
+
+def test_background_indexer_reports_errors(index, pdf_factory, tmp_path):
+    errors = []
+    indexer = BackgroundIndexer(index, on_error=lambda path, e: errors.append(path))
+    indexer.enqueue([pdf_factory(label='Indexed in the background'), str(tmp_path / 'missing.pdf')])
+    indexer.wait()
+    indexer.stop()
+    assert errors == [str(tmp_path / 'missing.pdf')]
+    assert len(index.search('background')) == 3
+
+def test_index_and_search_commands(pdf_factory, tmp_path, capsys):
+    database = str(tmp_path / 'search.db')
+    path = pdf_factory(pages=2, label='Command line')
+    assert main(['index', path, str(tmp_path / 'missing.pdf'), '-i', database]) == 1
+    capsys.readouterr()
+    assert main(['search', 'command', 'line', '2', '-i', database]) == 0
+    [hit] = json.loads(capsys.readouterr().out)
+    assert (hit['path'], hit['page']) == (os.path.abspath(path), 2)
+    assert main(['search', 'nowhere', '-i', database]) == 1
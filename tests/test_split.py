@@ -0,0 +1,73 @@
+import os
+
+import pytest
+from PyPDF2 import PdfReader, PdfWriter
+from PyPDF2.generic import DictionaryObject, NameObject
+
+from batch.split import plan_split, split_pdf, _used_names
+from utils.utils import PageRangeError, page_content, parse_page_range
+from tests.conftest import page_texts
+
+def test_parse_page_range():
+    assert parse_page_range("1-3,5,3") == [0, 1, 2, 4]
+    assert parse_page_range("2-last", max_pages=4) == [1, 2, 3]
+    for bad in ("", "5-2", "0", "a", "1-9"):
+        with pytest.raises(PageRangeError):
+            parse_page_range(bad, max_pages=4)
+
+def test_plan_split_modes(tmp_path):
+    out = str(tmp_path)
+    every = plan_split('in.pdf', out, 5, {'split_mode': 'every', 'split_every': 2})
+    assert [chunk.pages for chunk in every] == [[0, 1], [2, 3], [4]]
+    ranges = plan_split('in.pdf', out, 5, {'split_mode': 'ranges', 'split_ranges': '1-2,3-last'})
+    assert [chunk.pages for chunk in ranges] == [[0, 1], [2, 3, 4]]
+    with pytest.raises(ValueError):
+        plan_split('in.pdf', out, 5, {'split_mode': 'bogus'})
+    with pytest.raises(ValueError):
+        plan_split('in.pdf', out, 5, {'split_mode': 'size', 'split_max_mb': 0})
+
+def test_split_pages(pdf_factory, tmp_path):
+    source = pdf_factory(pages=3)
+    outputs = split_pdf(source, str(tmp_path / 'out'), {})
+    assert [os.path.basename(path) for path in outputs] == ['doc_page1.pdf', 'doc_page2.pdf', 'doc_page3.pdf']
+    assert [page_texts(path) for path in outputs] == [['Page 1'], ['Page 2'], ['Page 3']]
+
+def test_split_skips_completed_outputs(pdf_factory, tmp_path):
+    source = pdf_factory(pages=2)
+    out = str(tmp_path / 'out')
+    first = split_pdf(source, out, {})
+    stamp = os.stat(first[0]).st_mtime_ns
+    written = []
+    assert split_pdf(source, out, {}, completed={first[0]}, on_output=written.append) == first
+    assert written == [first[1]]
+    assert os.stat(first[0]).st_mtime_ns == stamp
+
+def test_split_by_size_ignores_worker_count(pdf_factory, tmp_path):
+    source = pdf_factory(pages=8)
+    settings = {'split_mode': 'size', 'split_max_mb': 0.001}
+    planned = [chunk.pages for chunk in plan_split(source, str(tmp_path), 8, settings)]
+    assert len(planned) > 1 and sum(planned, []) == list(range(8))
+    for workers in (1, 2, 3):
+        out = str(tmp_path / f'out{workers}')
+        outputs = split_pdf(source, out, settings, max_workers=workers)
+        assert [len(page_texts(path)) for path in outputs] == [len(pages) for pages in planned]
+        assert [text for path in outputs for text in page_texts(path)] == [f"Page {n}" for n in range(1, 9)]
+
+def test_multi_stream_pages_are_pruned(pdf_factory, tmp_path):
+    reader = PdfReader(pdf_factory(pages=1, multi_stream=True))
+    page = reader.pages[0]
+    assert b'/helv' in page_content(page) and b'/cour' in page_content(page)
+    fonts = page['/Resources']['/Font']
+    used = _used_names(page)
+    assert used is not None and {name[1:].encode() for name in fonts} <= used
+
+    # A font the content never names is dropped from the split output
+    writer = PdfWriter()
+    writer.add_page(page)
+    writer.pages[0]['/Resources']['/Font'][NameObject('/Unused')] = DictionaryObject()
+    padded = str(tmp_path / 'padded.pdf')
+    with open(padded, 'wb') as f:
+        writer.write(f)
+    [output] = split_pdf(padded, str(tmp_path / 'out'), {})
+    kept = PdfReader(output).pages[0]['/Resources']['/Font']
+    assert '/Unused' not in kept and set(kept) == set(fonts)
@@ -0,0 +1,74 @@
+import os
+
+import pytest
+from PyPDF2 import PdfReader, PdfWriter
+
+from batch.jobs import BatchOperation, run_operation
+from operations.stamp import PdfPageStamp, StampEngine, TextStamp
+from tests.conftest import page_texts
+
+def _forms(path):
+    """Stamp forms referenced by each page, by object number"""
+    reader = PdfReader(path)
+    return [{ref.idnum for name, ref in page['/Resources']['/XObject'].items() if name.startswith('/PdfcStamp')}
+            for page in reader.pages]
+
+@pytest.mark.parametrize('fit', [False, True])
+def test_pdf_page_stamp_with_several_content_streams(pdf_factory, tmp_path, fit):
+    source = pdf_factory('in.pdf', pages=3)
+    mark = pdf_factory('mark.pdf', pages=1, label='Mark', multi_stream=True, size=(300, 300))
+    output = str(tmp_path / 'out.pdf')
+    assert StampEngine(PdfPageStamp(mark, fit=fit)).stamp_pdf(source, output)
+
+    for number, text in enumerate(page_texts(output), 1):
+        assert f"Page {number}" in text and "Mark 1 again" in text
+    # One form shared by every page
+    forms = _forms(output)
+    assert len(set().union(*forms)) == 1 and all(forms)
+
+def test_text_stamp_follows_rotation_and_page_size(pdf_factory, tmp_path):
+    source = pdf_factory('in.pdf', pages=2, size=(300, 500))
+    writer = PdfWriter()
+    for page in PdfReader(source).pages:
+        writer.add_page(page)
+    writer.pages[1].rotate(90)
+    rotated = str(tmp_path / 'rotated.pdf')
+    with open(rotated, 'wb') as f:
+        writer.write(f)
+    output = str(tmp_path / 'out.pdf')
+    StampEngine(TextStamp("DRAFT")).stamp_pdf(rotated, output)
+    assert all("DRAFT" in text for text in page_texts(output))
+    # Upright and rotated pages have different display sizes, so each gets its own form
+    assert len(set().union(*_forms(output))) == 2
+
+def test_stamp_pdf_cancelled_writes_nothing(pdf_factory, tmp_path):
+    source = pdf_factory('in.pdf')
+    output = str(tmp_path / 'out.pdf')
+    assert not StampEngine(TextStamp("DRAFT")).stamp_pdf(source, output, is_cancelled=lambda: True)
+    assert not os.path.exists(output)
+
+def test_watermark_job(pdf_factory, tmp_path):
+    sources = [pdf_factory(f"in{n}.pdf", pages=2) for n in range(2)]
+    mark = pdf_factory('mark.pdf', pages=1, label='Mark', multi_stream=True)
+    operation = BatchOperation('watermark', sources, str(tmp_path / 'out'), {'watermark_file': mark})
+    assert run_operation(operation, lambda name, percent: None, lambda: False)
+    assert [os.path.basename(path) for path in operation.outputs] == ['watermarked_in0.pdf', 'watermarked_in1.pdf']
+    assert all("Mark 1" in text for path in operation.outputs for text in page_texts(path))
+
+def test_cancelled_watermark_job_leaves_no_output(pdf_factory, tmp_path):
+    sources = [pdf_factory(f"in{n}.pdf", pages=2) for n in range(2)]
+    mark = pdf_factory('mark.pdf', pages=1, label='Mark')
+    operation = BatchOperation('watermark', sources, str(tmp_path / 'out'), {'watermark_file': mark})
+    polls = []
+    # The first poll lets the job start; the next one cancels while the first output is being written
+    assert not run_operation(operation, lambda name, percent: None, lambda: polls.append(1) or len(polls) > 1)
+    assert operation.status == 'cancelled' and operation.outputs == []
+    assert os.listdir(tmp_path / 'out') == []
+
+def test_missing_watermark_file(pdf_factory, tmp_path):
+    with pytest.raises(FileNotFoundError):
+        PdfPageStamp(str(tmp_path / 'missing.pdf'))
+    operation = BatchOperation('watermark', [pdf_factory()], str(tmp_path / 'out'), {})
+    with pytest.raises(ValueError):
+        run_operation(operation, lambda name, percent: None, lambda: False)
+    assert operation.status.startswith('failed')
@@ -0,0 +1,61 @@
+import os
+
+import fitz
+import pytest
+
+from batch.jobs import BatchOperation, run_operation
+from operations import merge
+from operations.merge import streaming_merge
+from tests.conftest import page_texts
+
+@pytest.fixture
+def inputs(pdf_factory):
+    return [pdf_factory(f'{n}.pdf', pages=2, label=f'Doc{n}', multi_stream=n % 2 == 0) for n in range(6)]
+
+def test_streaming_merge_holds_a_bounded_window(inputs, tmp_path, monkeypatch):
+    loads = []
+    load = merge._load
+    monkeypatch.setattr(merge, '_load', lambda path: loads.append(path) or load(path))
+    in_memory = []
+    output = str(tmp_path / 'out.pdf')
+    report = streaming_merge(inputs, output, max_open_inputs=2,
+                             progress=lambda done, total: in_memory.append(len(loads) - done))
+    assert report.inputs == 6 and report.pages == 12 and report.max_open_inputs == 2
+    assert report.bytes_written > 0
+    # Only the input being written and the one read ahead are ever loaded but not written
+    assert max(in_memory) <= 1
+    assert page_texts(output) == [f'Doc{n} {page}' + (f'\nDoc{n} {page} again' if n % 2 == 0 else '')
+                                  for n in range(6) for page in (1, 2)]
+
+def test_streaming_merge_page_ranges(inputs, tmp_path):
+    output = str(tmp_path / 'out.pdf')
+    report = streaming_merge(inputs[1:3], output, pages=[[1], None])
+    assert report.pages == 3
+    assert page_texts(output)[0] == 'Doc1 2'
+
+def test_cancelled_streaming_merge(inputs, tmp_path):
+    output = tmp_path / 'out.pdf'
+    assert streaming_merge(inputs, str(output), is_cancelled=lambda: True) is None
+    assert not output.exists()
+
+def test_encrypted_input_is_rejected(inputs, tmp_path):
+    encrypted = str(tmp_path / 'encrypted.pdf')
+    with fitz.open(inputs[0]) as doc:
+        doc.save(encrypted, encryption=fitz.PDF_ENCRYPT_RC4_128, owner_pw='owner', user_pw='user')
+    with pytest.raises(ValueError, match='encrypted'):
+        streaming_merge([inputs[1], encrypted], str(tmp_path / 'out.pdf'))
+
+def test_streaming_combine_job(inputs, tmp_path):
+    operation = BatchOperation('combine', inputs[:2], str(tmp_path / 'out'),
+                               {'streaming': True, 'max_open_inputs': 1})
+    assert run_operation(operation, lambda name, percentage: None, lambda: False)
+    assert operation.report['backend'] == 'streaming'
+    assert len(page_texts(operation.outputs[0])) == 4
+
+@pytest.mark.parametrize('backend', ['streaming', 'pypdf2', 'fitz'])
+def test_cancelled_combine_job_leaves_no_output(inputs, tmp_path, backend):
+    done = []
+    operation = BatchOperation('combine', inputs, str(tmp_path / 'out'), {'merge_backend': backend})
+    assert not run_operation(operation, lambda name, percentage: done.append(name), lambda: bool(done))
+    assert done and operation.status == 'cancelled'
+    assert os.listdir(tmp_path / 'out') == []
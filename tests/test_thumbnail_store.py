@@ -0,0 +1,49 @@
+import os
+
+import pytest
+
+from ui.thumbnail_store import ThumbnailStore, ZOOM_LEVELS, render_samples, zoom_level
+
+@pytest.fixture
+def store(tmp_path):
+    store = ThumbnailStore(str(tmp_path / 'thumbnails'))
+    yield store
+    store.close()
+
+def test_zoom_level():
+    assert zoom_level(0.1) == 0.2
+    assert zoom_level(0.5) == 0.5
+    assert zoom_level(0.7) == 1.0
+    assert zoom_level(5.0) == ZOOM_LEVELS[-1]
+
+def test_pages_render_once_per_zoom_level(store, pdf_factory):
+    path = pdf_factory(pages=2)
+    width, height, samples = store.load(path, 1, 0.3)
+    assert (width, height, samples) == render_samples(path, 1, 0.5)
+    assert store.load(path, 1, 0.4) == (width, height, samples)
+    store.load(path, 1, 1.0)
+    stats = store.stats()
+    assert (stats['hits'], stats['misses'], stats['stores'], stats['entries']) == (1, 2, 2, 2)
+
+def test_an_edited_file_renders_again(store, pdf_factory):
+    path = pdf_factory(pages=1)
+    key = ThumbnailStore.make_key(path)
+    store.load(path)
+    pdf_factory(pages=1, size=(300, 300))
+    os.utime(path, ns=(0, 0))
+    assert ThumbnailStore.make_key(path) != key
+    assert store.load(path)[:2] == (60, 60)
+    assert store.stats()['misses'] == 2
+
+def test_least_recently_used_images_are_evicted(store):
+    first = (4, 4, b'\x01' * 48)
+    store.put('a', *first)
+    store.put('b', 4, 4, b'\x02' * 48)
+    size = store.stats()['size']
+    assert store.get('a') == first
+    store.max_bytes = size
+    store.put('c', 4, 4, b'\x03' * 48)
+    assert store.get('b') is None and store.get('a') == first
+    assert store.stats()['evictions'] == 1
+    assert [entry['key'] for entry in store.entries()][0] == 'a'
+    assert store.clear() == 2 and store.stats()['entries'] == 0
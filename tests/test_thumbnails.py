@@ -0,0 +1,90 @@
+"""Thumbnail loading, run on Qt's offscreen platform"""
+import os
+
+import pytest
+
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+QtGui = pytest.importorskip('PyQt6.QtGui')
+
+from ui.thumbnails import PixmapCache, ThumbnailLoader
+
+@pytest.fixture(scope='module')
+def app():
+    return QtGui.QGuiApplication.instance() or QtGui.QGuiApplication([])
+
+@pytest.fixture
+def loader(app):
+    loader = ThumbnailLoader()
+    loaded, failed = [], []
+    loader.loaded.connect(lambda key, pixmap: loaded.append((key, pixmap.size())))
+    loader.failed.connect(lambda key, message: failed.append((key, message)))
+    loader.results = loaded, failed
+    yield loader
+    loader.cancel_all()
+    loader.wait()
+
+def settle(app, loader):
+    while loader.pending:
+        loader.wait(10)
+        app.processEvents()
+    app.processEvents()
+
+def test_pages_load_off_the_gui_thread_then_from_memory(app, loader, pdf_factory):
+    path = pdf_factory(pages=2)
+    loaded, failed = loader.results
+    loader.request('first', path)
+    loader.request('second', path, page=1)
+    assert loaded == []
+    settle(app, loader)
+    assert sorted(key for key, _ in loaded) == ['first', 'second'] and failed == []
+    # A 595 x 842 page at the thumbnail scale
+    assert dict(loaded)['first'].width() == 119
+    assert len(loader.pixmaps) == 2
+
+    # Handed back at once, without a worker
+    loaded.clear()
+    loader.request('again', path)
+    assert [key for key, _ in loaded] == ['again'] and loader.pending == 0
+
+def test_replaced_and_cancelled_requests_drop_their_result(app, loader, pdf_factory):
+    first = pdf_factory('a.pdf')
+    second = pdf_factory('b.pdf', size=(300, 300))
+    loaded, _ = loader.results
+    loader.request('tile', first)
+    loader.request('tile', second)
+    loader.request('gone', first, page=2)
+    loader.cancel('gone')
+    settle(app, loader)
+    assert [(key, size.width()) for key, size in loaded] == [('tile', 60)]
+
+def test_missing_and_broken_files_fail(app, loader, tmp_path):
+    _, failed = loader.results
+    loader.request('missing', str(tmp_path / 'missing.pdf'))
+    broken = tmp_path / 'broken.pdf'
+    broken.write_bytes(b'not a pdf')
+    loader.request('broken', str(broken))
+    settle(app, loader)
+    assert [key for key, _ in failed] == ['missing', 'broken']
+
+def test_visible_tiles_load_first(app, pdf_factory):
+    loader = ThumbnailLoader(max_threads=1)
+    order = []
+    loader.loaded.connect(lambda key, pixmap: order.append(key))
+    paths = [pdf_factory(f'{n}.pdf', pages=1) for n in range(6)]
+    for n, path in enumerate(paths):
+        loader.request(n, path)
+    loader.prioritize([5])
+    settle(app, loader)
+    # The first may already be running; the visible one is next
+    assert 5 in order[:2]
+
+def test_pixmap_cache_keeps_a_byte_budget(app):
+    pixmap = QtGui.QPixmap(10, 10)
+    size = PixmapCache._bytes(pixmap)
+    cache = PixmapCache(max_bytes=size * 2)
+    for key in 'abc':
+        if key == 'c':
+            cache.get('a')
+        cache.put(key, pixmap)
+    assert cache.get('b') is None and cache.get('a') is not None
+    assert (len(cache), cache.size) == (2, size * 2)
@@ -0,0 +1,42 @@
+import os
+
+import pytest
+
+from operations.merge import tree_merge
+from tests.conftest import outline, page_texts
+
+@pytest.fixture
+def inputs(pdf_factory):
+    return [pdf_factory(f'{n}.pdf', pages=2, label=f'Doc{n}', toc=[[1, f'Doc {n}', 1]]) for n in range(7)]
+
+def spilled(tmp_path):
+    return [name for name in os.listdir(tmp_path) if name.startswith('.merge-')]
+
+def test_tree_merge_keeps_order_and_bookmarks(inputs, tmp_path):
+    output = str(tmp_path / 'out.pdf')
+    done = []
+    report = tree_merge(inputs, output, 'fitz', workers=2, fan_in=2,
+                        progress=lambda inputs_done, total: done.append(inputs_done))
+    assert report.merge_levels > 2 and report.workers == 2
+    assert (report.inputs, report.pages) == (7, 14)
+    assert page_texts(output) == [f'Doc{n} {page}' for n in range(7) for page in (1, 2)]
+    assert outline(output) == [[1, f'Doc {n}', 2 * n + 1] for n in range(7)]
+    assert done == sorted(done) and done[-1] == 7
+    assert spilled(tmp_path) == []
+
+def test_tree_merge_page_ranges(inputs, tmp_path):
+    output = str(tmp_path / 'out.pdf')
+    pages = [[1]] + [None] * 6
+    report = tree_merge(inputs, output, 'pypdf2', workers=2, fan_in=4, pages=pages)
+    assert report.pages == 13
+    assert page_texts(output)[:2] == ['Doc0 2', 'Doc1 1']
+
+def test_cancelled_tree_merge_cleans_up(inputs, tmp_path):
+    output = str(tmp_path / 'out.pdf')
+    assert tree_merge(inputs, output, 'fitz', workers=2, fan_in=2, is_cancelled=lambda: True) is None
+    assert not os.path.exists(output)
+    assert spilled(tmp_path) == []
+
+def test_unknown_backend_fails_before_spawning(inputs, tmp_path):
+    with pytest.raises(ValueError):
+        tree_merge(inputs, str(tmp_path / 'out.pdf'), 'bogus', workers=2, fan_in=2)
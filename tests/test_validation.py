@@ -0,0 +1,57 @@
+import fitz
+import pytest
+
+from batch.validation import PDFValidator
+
+@pytest.fixture
+def validator(tmp_path):
+    return PDFValidator(cache_path=str(tmp_path / 'validation.db'))
+
+def resave(source, path, **options):
+    with fitz.open(source) as doc:
+        doc.save(path, **options)
+    return path
+
+def test_quick_check_decides_well_formed_files(pdf_factory, tmp_path):
+    plain = pdf_factory()
+    assert PDFValidator.quick_check(plain) == (True, "PDF is valid")
+    # Cross-reference stream instead of a classic table
+    stream = resave(plain, str(tmp_path / 'stream.pdf'), use_objstms=1)
+    assert PDFValidator.quick_check(stream) == (True, "PDF is valid")
+    encrypted = resave(plain, str(tmp_path / 'encrypted.pdf'),
+                       encryption=fitz.PDF_ENCRYPT_AES_256, owner_pw='owner', user_pw='user')
+    assert PDFValidator.quick_check(encrypted) == (False, "PDF is encrypted")
+    text = tmp_path / 'notes.pdf'
+    text.write_text('not a pdf')
+    assert PDFValidator.quick_check(str(text)) == (False, "Not a valid PDF file")
+
+def test_damaged_tail_falls_back_to_a_full_parse(pdf_factory, tmp_path, validator):
+    path = tmp_path / 'damaged.pdf'
+    # startxref points past the end of the file
+    path.write_bytes(open(pdf_factory(), 'rb').read().replace(b'startxref\n', b'startxref\n9'))
+    assert PDFValidator.quick_check(str(path)) is None
+    # PdfReader finds the cross-references anyway
+    assert validator.validate_pdf(str(path)) == (True, "PDF is valid")
+    path.write_bytes(b'%PDF-1.7\ngarbage')
+    assert not validator.validate_pdf(str(path))[0]
+
+def test_results_are_cached_until_the_file_changes(pdf_factory, tmp_path, validator, monkeypatch):
+    path = pdf_factory()
+    assert validator.validate_pdf(path)[0]
+    checks = []
+    monkeypatch.setattr(PDFValidator, 'quick_check', staticmethod(lambda path: checks.append(path)))
+    monkeypatch.setattr(PDFValidator, 'full_check', staticmethod(lambda path: (False, 'checked')))
+    assert validator.validate_pdf(path) == (True, "PDF is valid")
+    assert checks == []
+    with open(path, 'ab') as f:
+        f.write(b'\n')
+    assert validator.validate_pdf(path) == (False, 'checked')
+
+def test_validate_many(pdf_factory, tmp_path, validator):
+    good = [pdf_factory(f'{n}.pdf') for n in range(4)]
+    missing = str(tmp_path / 'missing.pdf')
+    results = validator.validate_many(good + [missing, good[0]])
+    assert list(results) == good + [missing]
+    assert all(results[path][0] for path in good)
+    valid, message = results[missing]
+    assert not valid and message.startswith("Validation error")
@@ -0,0 +1,204 @@
+"""On-disk cache of rendered page images for thumbnails and previews"""
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import zlib
+
+import fitz
+
+# Bump when a change to rendering makes stored images stale
+THUMBNAIL_CACHE_VERSION = 1
+
+DEFAULT_MAX_BYTES = 256 * 1024 ** 2
+
+# Render scales pages are cached at; a request is served from the smallest level at least as large
+ZOOM_LEVELS = (0.2, 0.5, 1.0, 2.0)
+
+# Fast zlib level: pages are mostly background, and decompressing must stay cheaper than rendering
+COMPRESSION = 1
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS images (
+    key TEXT PRIMARY KEY,
+    width INTEGER NOT NULL,
+    height INTEGER NOT NULL,
+    data BLOB NOT NULL,
+    size INTEGER NOT NULL,
+    created TEXT NOT NULL,
+    last_access TEXT NOT NULL,
+    hits INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS stats (
+    name TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+"""
+
+def default_thumbnail_cache_dir() -> str:
+    return os.environ.get('PDFCOMBINER_THUMBNAIL_CACHE_DIR',
+                          os.path.join(os.path.expanduser('~'), '.cache', 'pdfcombiner', 'thumbnails'))
+
+def zoom_level(scale: float) -> float:
+    """The cached level a render at scale is served from"""
+    return next((level for level in ZOOM_LEVELS if level >= scale), ZOOM_LEVELS[-1])
+
+def render_samples(pdf_path: str, page: int = 0, scale: float = ZOOM_LEVELS[0]) -> Tuple[int, int, bytes]:
+    """
+    Render a page to packed RGB samples.
+
+    Returns:
+        Tuple of (width, height, samples) with rows of width * 3 bytes
+    """
+    with fitz.open(pdf_path) as doc:
+        pix = doc.load_page(page).get_pixmap(matrix=fitz.Matrix(scale, scale), alpha=False)
+        if pix.stride == pix.width * 3:
+            return pix.width, pix.height, pix.samples
+        rows = pix.samples_mv
+        return pix.width, pix.height, b''.join(
+            rows[y * pix.stride:y * pix.stride + pix.width * 3] for y in range(pix.height))
+
+class ThumbnailStore:
+    """
+    Rendered page images keyed by file, page and zoom level.
+
+    A file is identified by path, size and modification time, so an
+    edited file renders again without reading its content. Images are
+    kept as zlib-compressed RGB samples in SQLite, ready to wrap in a
+    QImage without an image codec. The store is bounded by max_bytes
+    with least-recently-used eviction.
+    """
+    def __init__(self, cache_dir: Optional[str] = None, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.cache_dir = os.path.abspath(cache_dir or default_thumbnail_cache_dir())
+        self.max_bytes = max_bytes
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(os.path.join(self.cache_dir, 'thumbnails.db'),
+                                     timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(SCHEMA)
+        self._conn.commit()
+
+    def _execute(self, sql: str, params: tuple = ()) -> List[tuple]:
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+            self._conn.commit()
+            return rows
+
+    def _count(self, name: str, amount: int = 1):
+        self._execute(
+            "INSERT INTO stats (name, value) VALUES (?, ?) "
+            "ON CONFLICT(name) DO UPDATE SET value = value + excluded.value",
+            (name, amount)
+        )
+
+    @staticmethod
+    def make_key(pdf_path: str, page: int = 0, scale: float = ZOOM_LEVELS[0]) -> str:
+        """
+        Build the key of one page image.
+
+        Args:
+            pdf_path: PDF the page is in
+            page: 0-based page index
+            scale: Render scale, snapped to its zoom level
+        """
+        stat = os.stat(pdf_path)
+        payload = {'version': THUMBNAIL_CACHE_VERSION, 'path': os.path.abspath(pdf_path),
+                   'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns,
+                   'page': page, 'level': zoom_level(scale)}
+        return hashlib.sha256(json.dumps(payload, sort_keys=True).encode('utf-8')).hexdigest()
+
+    def get(self, key: str) -> Optional[Tuple[int, int, bytes]]:
+        """Get (width, height, RGB samples) for a key, or None on a miss"""
+        rows = self._execute("SELECT width, height, data FROM images WHERE key = ?", (key,))
+        if rows:
+            self._execute("UPDATE images SET last_access = ?, hits = hits + 1 WHERE key = ?",
+                          (datetime.now().isoformat(), key))
+            self._count('hits')
+            width, height, data = rows[0]
+            return width, height, zlib.decompress(data)
+        self._count('misses')
+        return None
+
+    def put(self, key: str, width: int, height: int, samples: bytes):
+        """Store a page image and enforce the size budget"""
+        data = zlib.compress(samples, COMPRESSION)
+        now = datetime.now().isoformat()
+        self._execute(
+            "INSERT OR REPLACE INTO images (key, width, height, data, size, created, last_access, hits) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, 0)",
+            (key, width, height, data, len(data), now, now)
+        )
+        self._count('stores')
+        self.prune()
+
+    def load(self, pdf_path: str, page: int = 0, scale: float = ZOOM_LEVELS[0]) -> Tuple[int, int, bytes]:
+        """Get a page image at the zoom level for scale, rendering and storing it on a miss"""
+        key = self.make_key(pdf_path, page, scale)
+        cached = self.get(key)
+        if cached:
+            return cached
+        width, height, samples = render_samples(pdf_path, page, zoom_level(scale))
+        self.put(key, width, height, samples)
+        return width, height, samples
+
+    def prune(self, max_bytes: Optional[int] = None) -> Tuple[int, int]:
+        """
+        Evict least-recently-used images until the store fits the budget.
+
+        Returns:
+            Tuple of (images evicted, bytes freed)
+        """
+        budget = self.max_bytes if max_bytes is None else max_bytes
+        total = self._execute("SELECT COALESCE(SUM(size), 0) FROM images")[0][0]
+        if total <= budget:
+            return 0, 0
+        evicted = freed = 0
+        for key, size in self._execute("SELECT key, size FROM images ORDER BY last_access"):
+            if total <= budget:
+                break
+            self._execute("DELETE FROM images WHERE key = ?", (key,))
+            total -= size
+            evicted += 1
+            freed += size
+        if evicted:
+            self._count('evictions', evicted)
+        return evicted, freed
+
+    def clear(self) -> int:
+        """Delete every image; returns the number removed"""
+        evicted, _ = self.prune(max_bytes=0)
+        return evicted
+
+    def stats(self) -> Dict[str, object]:
+        """Get hit/miss counters and the current store size"""
+        counters = dict(self._execute("SELECT name, value FROM stats"))
+        entries, size = self._execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM images")[0]
+        hits = counters.get('hits', 0)
+        misses = counters.get('misses', 0)
+        return {
+            'cache_dir': self.cache_dir,
+            'entries': entries,
+            'size': size,
+            'max_bytes': self.max_bytes,
+            'hits': hits,
+            'misses': misses,
+            'hit_rate': round(hits / (hits + misses), 4) if hits + misses else 0.0,
+            'stores': counters.get('stores', 0),
+            'evictions': counters.get('evictions', 0),
+        }
+
+    def entries(self) -> List[dict]:
+        """List images, most recently used first"""
+        rows = self._execute(
+            "SELECT key, width, height, size, created, last_access, hits FROM images ORDER BY last_access DESC"
+        )
+        return [dict(zip(('key', 'width', 'height', 'size', 'created', 'last_access', 'hits'), row))
+                for row in rows]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,200 @@
+"""Page thumbnails rendered off the GUI thread and cached in memory and on disk"""
+from collections import OrderedDict
+from typing import Dict, Iterable, Optional
+import os
+
+from PyQt6.QtCore import QObject, QRunnable, QThreadPool, pyqtSignal
+from PyQt6.QtGui import QImage, QPixmap
+
+from ui.thumbnail_store import ThumbnailStore, render_samples, zoom_level, ZOOM_LEVELS
+
+# Render scale of tiles (0.2 = 14.4 dpi), the smallest zoom level
+THUMBNAIL_SCALE = ZOOM_LEVELS[0]
+# QThreadPool priorities; higher runs first, equal ones in request order
+VISIBLE_PRIORITY = 1
+HIDDEN_PRIORITY = 0
+# PyMuPDF keeps the GIL while it renders, so more threads would only contend with the GUI for it
+MAX_THREADS = 1
+# Budget of decoded pixmaps kept for redrawing tiles without touching the disk
+MEMORY_MAX_BYTES = 96 * 1024 ** 2
+
+def page_image(pdf_path: str, page: int = 0, scale: float = THUMBNAIL_SCALE,
+               store: Optional[ThumbnailStore] = None) -> QImage:
+    """
+    Get a page as a QImage built straight from RGB samples.
+
+    With a store, the page comes from it at the zoom level for scale
+    and is rendered and kept there on a miss; without one, it is
+    rendered at scale.
+    """
+    if store:
+        width, height, samples = store.load(pdf_path, page, scale)
+    else:
+        width, height, samples = render_samples(pdf_path, page, scale)
+    # Copy so the image owns its pixels once samples goes away
+    return QImage(samples, width, height, width * 3, QImage.Format.Format_RGB888).copy()
+
+class PixmapCache:
+    """Least-recently-used pixmaps up to a byte budget; GUI thread only"""
+    def __init__(self, max_bytes: int = MEMORY_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._pixmaps: 'OrderedDict[str, QPixmap]' = OrderedDict()
+
+    @staticmethod
+    def _bytes(pixmap: QPixmap) -> int:
+        return pixmap.width() * pixmap.height() * pixmap.depth() // 8
+
+    def get(self, key: str) -> Optional[QPixmap]:
+        pixmap = self._pixmaps.get(key)
+        if pixmap is not None:
+            self._pixmaps.move_to_end(key)
+        return pixmap
+
+    def put(self, key: str, pixmap: QPixmap):
+        if key in self._pixmaps:
+            self.size -= self._bytes(self._pixmaps.pop(key))
+        self._pixmaps[key] = pixmap
+        self.size += self._bytes(pixmap)
+        while self.size > self.max_bytes and len(self._pixmaps) > 1:
+            _, evicted = self._pixmaps.popitem(last=False)
+            self.size -= self._bytes(evicted)
+
+    def clear(self):
+        self._pixmaps.clear()
+        self.size = 0
+
+    def __len__(self) -> int:
+        return len(self._pixmaps)
+
+class _Signals(QObject):
+    finished = pyqtSignal(object, QImage)
+    failed = pyqtSignal(object, str)
+
+class ThumbnailTask(QRunnable):
+    """Loads one page image; a cancelled task that is already running drops its result"""
+    def __init__(self, key, pdf_path: str, page: int, scale: float, cache_key: str,
+                 store: Optional[ThumbnailStore], signals: _Signals):
+        super().__init__()
+        # Kept alive by the loader, so it can be taken back out of the queue and re-queued
+        self.setAutoDelete(False)
+        self.key = key
+        self.pdf_path = pdf_path
+        self.page = page
+        self.scale = scale
+        self.cache_key = cache_key
+        self.store = store
+        self.signals = signals
+        self.cancelled = False
+        self.priority = HIDDEN_PRIORITY
+
+    def run(self):
+        if self.cancelled:
+            return
+        try:
+            image = page_image(self.pdf_path, self.page, self.scale, self.store)
+        except Exception as e:
+            if not self.cancelled:
+                self.signals.failed.emit(self, str(e))
+            return
+        if not self.cancelled:
+            self.signals.finished.emit(self, image)
+
+class ThumbnailLoader(QObject):
+    """
+    Loads page thumbnails on a QThreadPool and hands them back on the GUI thread.
+
+    Requests are keyed by the tile that shows them. A page already in the
+    in-memory cache is handed back at once; otherwise a worker reads it
+    from the on-disk store, rendering it only on a miss there. Visible
+    tiles jump the queue through prioritize(); cancel() takes a queued
+    load out of the queue, or makes a running one drop its result.
+    loaded and failed are emitted on the thread the loader lives on,
+    with the key.
+    """
+    loaded = pyqtSignal(object, QPixmap)
+    failed = pyqtSignal(object, str)
+
+    def __init__(self, parent=None, max_threads: int = MAX_THREADS,
+                 store: Optional[ThumbnailStore] = None, memory_bytes: int = MEMORY_MAX_BYTES):
+        super().__init__(parent)
+        self.pool = QThreadPool(self)
+        self.pool.setMaxThreadCount(max(1, min(max_threads, os.cpu_count() or 1)))
+        self.store = store
+        self.pixmaps = PixmapCache(memory_bytes)
+        self._signals = _Signals()
+        self._signals.finished.connect(self._on_finished)
+        self._signals.failed.connect(self._on_failed)
+        self._tasks: Dict[object, ThumbnailTask] = {}
+
+    def request(self, key, pdf_path: str, visible: bool = False, page: int = 0,
+                scale: float = THUMBNAIL_SCALE):
+        """
+        Load a page of pdf_path for key, replacing any earlier request.
+
+        Args:
+            key: Tile the image is for, passed back with it
+            pdf_path: PDF to show
+            visible: Whether the tile is on screen, to load it first
+            page: 0-based page index
+            scale: Render scale, served from its zoom level
+        """
+        self.cancel(key)
+        try:
+            cache_key = ThumbnailStore.make_key(pdf_path, page, scale)
+        except OSError as e:
+            self.failed.emit(key, str(e))
+            return
+        pixmap = self.pixmaps.get(cache_key)
+        if pixmap is not None:
+            self.loaded.emit(key, pixmap)
+            return
+        task = ThumbnailTask(key, pdf_path, page, zoom_level(scale), cache_key, self.store, self._signals)
+        task.priority = VISIBLE_PRIORITY if visible else HIDDEN_PRIORITY
+        self._tasks[key] = task
+        self.pool.start(task, task.priority)
+
+    def cancel(self, key):
+        task = self._tasks.pop(key, None)
+        if task:
+            task.cancelled = True
+            self.pool.tryTake(task)
+
+    def cancel_all(self):
+        for key in list(self._tasks):
+            self.cancel(key)
+
+    def prioritize(self, visible_keys: Iterable):
+        """Move the queued loads of visible_keys ahead of the rest, and the rest back"""
+        visible = set(visible_keys)
+        for key, task in self._tasks.items():
+            priority = VISIBLE_PRIORITY if key in visible else HIDDEN_PRIORITY
+            if task.priority != priority and self.pool.tryTake(task):
+                task.priority = priority
+                self.pool.start(task, priority)
+
+    @property
+    def pending(self) -> int:
+        """Loads queued or running"""
+        return len(self._tasks)
+
+    def wait(self, msecs: int = -1) -> bool:
+        return self.pool.waitForDone(msecs)
+
+    def _take(self, task: ThumbnailTask) -> bool:
+        # A result can arrive after its request was cancelled or replaced
+        if self._tasks.get(task.key) is not task or task.cancelled:
+            return False
+        del self._tasks[task.key]
+        return True
+
+    def _on_finished(self, task: ThumbnailTask, image: QImage):
+        # Kept even if the tile was replaced meanwhile; its successor asks for the same page
+        pixmap = QPixmap.fromImage(image)
+        self.pixmaps.put(task.cache_key, pixmap)
+        if self._take(task):
+            self.loaded.emit(task.key, pixmap)
+
+    def _on_failed(self, task: ThumbnailTask, message: str):
+        if self._take(task):
+            self.failed.emit(task.key, message)
@@ -0,0 +1,48 @@
+"""Qt-free status reporting for running operations without a main window"""
+from typing import List, Optional, Callable
+
+# Receives one JSON-serializable event dict per status or progress update
+EventCallback = Callable[[dict], None]
+
+class StatusReporter:
+    """
+    Drop-in replacement for the main window passed as parent_window.
+
+    Operation classes only call show_status_message, update_status_label,
+    show_progress and hide_progress on their parent window, so passing a
+    StatusReporter lets them run headless. Every update is forwarded to an
+    optional callback and the status messages are kept for error reporting.
+    """
+    def __init__(self, callback: Optional[EventCallback] = None,
+                 is_cancelled: Optional[Callable[[], bool]] = None):
+        self.callback = callback
+        self._is_cancelled = is_cancelled
+        self.messages: List[str] = []
+
+    def _emit(self, event: dict):
+        if self.callback:
+            self.callback(event)
+
+    def show_status_message(self, message: str, timeout: int = 5000):
+        """Record a status message"""
+        self.messages.append(message)
+        self._emit({'event': 'status', 'message': message})
+
+    def update_status_label(self, text: str):
+        """Report the current activity"""
+        self._emit({'event': 'label', 'message': text})
+
+    def show_progress(self, value: int, maximum: int = 100):
+        """Report progress"""
+        self._emit({'event': 'progress', 'value': value, 'maximum': maximum})
+
+    def hide_progress(self):
+        """Report that progress reporting has finished"""
+        self._emit({'event': 'progress_done'})
+
+    def is_cancelled(self) -> bool:
+        return bool(self._is_cancelled and self._is_cancelled())
+
+    @property
+    def last_message(self) -> str:
+        return self.messages[-1] if self.messages else ""
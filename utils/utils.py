@@ -1,11 +1,75 @@
 import os
-from typing import List, Optional, Tuple
-from PyQt6.QtWidgets import QMessageBox
+import sys
+from contextlib import contextmanager
+from typing import Iterator, List, Optional, Tuple
 
 class PageRangeError(Exception):
     """Custom exception for page range validation errors"""
     pass
 
+class OutputCancelled(Exception):
+    """Raised inside atomic_output to discard the output instead of committing it"""
+    pass
+
+def parse_page_range(page_range: str, max_pages: Optional[int] = None) -> List[int]:
+    """
+    Parse a page range string into a list of page numbers.
+
+    Args:
+        page_range: String containing page ranges (e.g., "1-3,5,7-9");
+            "last" stands for the last page when max_pages is given
+        max_pages: Optional maximum number of pages to validate against
+
+    Returns:
+        Sorted list of zero-based page numbers
+
+    Raises:
+        PageRangeError: If the range is malformed or exceeds max_pages
+    """
+    if not page_range.strip():
+        raise PageRangeError("Page range cannot be empty")
+
+    pages = set()  # Use set to avoid duplicates
+    parts = [p.strip() for p in page_range.split(',')]
+
+    for part in parts:
+        if not part:
+            raise PageRangeError("Empty range specified")
+
+        if 'last' in part.lower():
+            if not max_pages:
+                raise PageRangeError("'last' needs the document length")
+            part = part.lower().replace('last', str(max_pages))
+
+        if '-' in part:
+            try:
+                start, end = map(int, part.split('-'))
+            except ValueError:
+                raise PageRangeError(f"Invalid range format: {part}")
+
+            if start < 1:
+                raise PageRangeError(f"Page numbers must be positive: {start}")
+            if end < start:
+                raise PageRangeError(f"End page must be greater than start page: {part}")
+            if max_pages and end > max_pages:
+                raise PageRangeError(f"Page number {end} exceeds document length ({max_pages})")
+
+            pages.update(range(start - 1, end))
+        else:
+            try:
+                page = int(part)
+            except ValueError:
+                raise PageRangeError(f"Invalid page number: {part}")
+
+            if page < 1:
+                raise PageRangeError(f"Page numbers must be positive: {page}")
+            if max_pages and page > max_pages:
+                raise PageRangeError(f"Page number {page} exceeds document length ({max_pages})")
+
+            pages.add(page - 1)
+
+    return sorted(list(pages))
+
 def validate_page_range(page_range: str, max_pages: Optional[int] = None) -> Optional[List[int]]:
     """
     Validate and parse a page range string into a list of page numbers.
@@ -23,45 +87,11 @@ def validate_page_range(page_range: str, max_pages: Optional[int] = None) -> Opt
         >>> validate_page_range("1-3,5", max_pages=4)
         None  # Because 5 exceeds max_pages
     """
-    try:
-        if not page_range.strip():
-            raise PageRangeError("Page range cannot be empty")
-
-        pages = set()  # Use set to avoid duplicates
-        parts = [p.strip() for p in page_range.split(',')]
-
-        for part in parts:
-            if not part:
-                raise PageRangeError("Empty range specified")
-
-            if '-' in part:
-                try:
-                    start, end = map(int, part.split('-'))
-                except ValueError:
-                    raise PageRangeError(f"Invalid range format: {part}")
+    # Imported here so the rest of this module stays usable without PyQt6
+    from PyQt6.QtWidgets import QMessageBox
 
-                if start < 1:
-                    raise PageRangeError(f"Page numbers must be positive: {start}")
-                if end < start:
-                    raise PageRangeError(f"End page must be greater than start page: {part}")
-                if max_pages and end > max_pages:
-                    raise PageRangeError(f"Page number {end} exceeds document length ({max_pages})")
-
-                pages.update(range(start - 1, end))
-            else:
-                try:
-                    page = int(part)
-                except ValueError:
-                    raise PageRangeError(f"Invalid page number: {part}")
-
-                if page < 1:
-                    raise PageRangeError(f"Page numbers must be positive: {page}")
-                if max_pages and page > max_pages:
-                    raise PageRangeError(f"Page number {page} exceeds document length ({max_pages})")
-
-                pages.add(page - 1)
-
-        return sorted(list(pages))
+    try:
+        return parse_page_range(page_range, max_pages)
 
     except PageRangeError as e:
         msg = QMessageBox()
@@ -79,6 +109,45 @@ def validate_page_range(page_range: str, max_pages: Optional[int] = None) -> Opt
         msg.exec()
         return None
 
+def process_events() -> None:
+    """Let a running Qt GUI repaint during long operations; no-op when headless"""
+    # Only touch Qt if the GUI already imported it, so headless callers never load PyQt6
+    widgets = sys.modules.get('PyQt6.QtWidgets')
+    if widgets is not None and widgets.QApplication.instance() is not None:
+        widgets.QApplication.processEvents()
+
+def page_content(page) -> bytes:
+    """
+    Get the decoded content of a PyPDF2 page.
+
+    A page may split its content over an array of streams; they are joined
+    with newlines, as PDF readers concatenate them.
+    """
+    contents = page.get('/Contents')
+    if contents is None:
+        return b''
+    contents = contents.get_object()
+    streams = contents if isinstance(contents, list) else [contents]
+    return b'\n'.join(stream.get_object().get_data() for stream in streams)
+
+@contextmanager
+def atomic_output(path: str) -> Iterator[str]:
+    """
+    Write an output file atomically.
+
+    Yields a temporary path next to path; the file is moved into place only
+    if the block completes, so a crash never leaves a truncated output. A
+    block that is cancelled part-way raises OutputCancelled, which discards
+    the temporary file like any other error.
+    """
+    temp_path = f"{path}.part"
+    try:
+        yield temp_path
+        os.replace(temp_path, path)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
 def validate_output_directory(directory: str) -> Tuple[bool, str]:
     """
     Validate and create output directory if it doesn't exist.